@@ -8,6 +8,8 @@ from aws_cdk import (
     aws_iam as iam,
     aws_cognito as cognito,
     aws_s3 as s3,
+    aws_events as events,
+    aws_events_targets as targets,
     Duration,
     RemovalPolicy
 )
@@ -26,6 +28,17 @@ class LanguageLearningStack(Stack):
                 allowed_origins=["*"],
                 allowed_headers=["*"]
             )],
+            lifecycle_rules=[
+                # Content-addressed Polly cache; entries are re-synthesized on demand
+                s3.LifecycleRule(prefix="tts/", expiration=Duration.days(30)),
+                # Audio and transcripts of async transcription jobs are deleted when
+                # the job ends; this catches any whose cleanup never ran
+                s3.LifecycleRule(prefix="transcription-jobs/", expiration=Duration.days(2)),
+                s3.LifecycleRule(prefix="transcripts/", expiration=Duration.days(2)),
+                # History exports and uploaded imports hold personal data; keep them briefly
+                s3.LifecycleRule(prefix="history/", expiration=Duration.days(7),
+                                 abort_incomplete_multipart_upload_after=Duration.days(1))
+            ],
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True
         )
@@ -47,6 +60,29 @@ class LanguageLearningStack(Stack):
             removal_policy=RemovalPolicy.DESTROY
         )
 
+        # Sparse index over shareable lesson variants (only those with a cacheKey)
+        lessons_table.add_global_secondary_index(
+            index_name="LessonCacheIndex",
+            partition_key=dynamodb.Attribute(name="cacheKey", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="createdAt", type=dynamodb.AttributeType.STRING),
+            projection_type=dynamodb.ProjectionType.ALL
+        )
+
+        # A user's lessons by creation time, for history export. CloudFormation
+        # creates at most one GSI per table per stack update, so a stack that
+        # doesn't have LessonCacheIndex yet needs two deploys:
+        #   cdk deploy -c userLessonsIndex=false   # adds LessonCacheIndex
+        #   cdk deploy                             # adds UserLessonsIndex
+        # Until the second deploy, history export leaves lessons out.
+        user_lessons_index = str(self.node.try_get_context("userLessonsIndex") or "true").lower() != "false"
+        if user_lessons_index:
+            lessons_table.add_global_secondary_index(
+                index_name="UserLessonsIndex",
+                partition_key=dynamodb.Attribute(name="userId", type=dynamodb.AttributeType.STRING),
+                sort_key=dynamodb.Attribute(name="createdAt", type=dynamodb.AttributeType.STRING),
+                projection_type=dynamodb.ProjectionType.KEYS_ONLY
+            )
+
         vocabulary_table = dynamodb.Table(
             self, "VocabularyTable",
             table_name="language-learning-vocabulary", 
@@ -56,6 +92,53 @@ class LanguageLearningStack(Stack):
             removal_policy=RemovalPolicy.DESTROY
         )
 
+        # Sparse index of scheduled words by due time, so "what's due" is one range query
+        vocabulary_table.add_global_secondary_index(
+            index_name="DueIndex",
+            partition_key=dynamodb.Attribute(name="userId", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="nextReviewAt", type=dynamodb.AttributeType.STRING),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["word", "translation", "masteryLevel"]
+        )
+
+        # Normalized search terms per word ("<term>#<wordId>") for prefix typeahead
+        vocabulary_search_table = dynamodb.Table(
+            self, "VocabularySearchTable",
+            table_name="language-learning-vocabulary-search",
+            partition_key=dynamodb.Attribute(name="userId", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="term", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        translation_cache_table = dynamodb.Table(
+            self, "TranslationCacheTable",
+            table_name="language-learning-translation-cache",
+            partition_key=dynamodb.Attribute(name="cacheKey", type=dynamodb.AttributeType.STRING),
+            time_to_live_attribute="expiresAt",
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        transcriptions_table = dynamodb.Table(
+            self, "TranscriptionsTable",
+            table_name="language-learning-transcriptions",
+            partition_key=dynamodb.Attribute(name="jobId", type=dynamodb.AttributeType.STRING),
+            time_to_live_attribute="expiresAt",
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Validated quiz questions per language pair and level, keyed by skill and content hash
+        question_bank_table = dynamodb.Table(
+            self, "QuestionBankTable",
+            table_name="language-learning-question-bank",
+            partition_key=dynamodb.Attribute(name="bankKey", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="questionId", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
         # Cognito User Pool
         user_pool = cognito.UserPool(
             self, "UserPool",
@@ -97,6 +180,19 @@ class LanguageLearningStack(Stack):
             ]
         )
 
+        # NumPy for audio preprocessing and pronunciation scoring, e.g. the AWS
+        # SDK for pandas managed layer (its version differs by region):
+        #   cdk deploy -c numpyLayerArn=arn:aws:lambda:<region>:336392948345:layer:AWSSDKPandas-Python311:<version>
+        # Without it WAV uploads would skip preprocessing and scoring would be
+        # off, so synthesis stops instead of deploying that silently.
+        numpy_layer_arn = self.node.try_get_context("numpyLayerArn")
+        if not numpy_layer_arn:
+            raise ValueError(
+                "The numpyLayerArn context value is required (a Lambda layer providing NumPy "
+                "for Python 3.11, e.g. AWSSDKPandas-Python311): cdk deploy -c numpyLayerArn=<layer version ARN>"
+            )
+        audio_layers = [_lambda.LayerVersion.from_layer_version_arn(self, "NumpyLayer", numpy_layer_arn)]
+
         # Lambda Functions with latest runtime
         user_manager = _lambda.Function(
             self, "UserManager",
@@ -119,7 +215,8 @@ class LanguageLearningStack(Stack):
             timeout=Duration.seconds(60),
             environment={
                 "USERS_TABLE": users_table.table_name,
-                "LESSONS_TABLE": lessons_table.table_name
+                "LESSONS_TABLE": lessons_table.table_name,
+                "MEDIA_BUCKET": media_bucket.bucket_name
             }
         )
 
@@ -129,7 +226,10 @@ class LanguageLearningStack(Stack):
             handler="quiz_generator.handler",
             code=_lambda.Code.from_asset("lambda"),
             role=lambda_role,
-            timeout=Duration.seconds(30)
+            timeout=Duration.seconds(30),
+            environment={
+                "QUESTION_BANK_TABLE": question_bank_table.table_name
+            }
         )
 
         vocabulary_manager = _lambda.Function(
@@ -140,7 +240,8 @@ class LanguageLearningStack(Stack):
             role=lambda_role,
             timeout=Duration.seconds(15),
             environment={
-                "VOCABULARY_TABLE": vocabulary_table.table_name
+                "VOCABULARY_TABLE": vocabulary_table.table_name,
+                "VOCABULARY_SEARCH_TABLE": vocabulary_search_table.table_name
             }
         )
 
@@ -150,9 +251,11 @@ class LanguageLearningStack(Stack):
             handler="voice_processor.handler",
             code=_lambda.Code.from_asset("lambda"),
             role=lambda_role,
+            layers=audio_layers,
             timeout=Duration.seconds(60),
             environment={
-                "MEDIA_BUCKET": media_bucket.bucket_name
+                "MEDIA_BUCKET": media_bucket.bucket_name,
+                "TRANSCRIPTIONS_TABLE": transcriptions_table.table_name
             }
         )
 
@@ -162,9 +265,11 @@ class LanguageLearningStack(Stack):
             handler="voice_transcriber.handler",
             code=_lambda.Code.from_asset("lambda"),
             role=lambda_role,
+            layers=audio_layers,
             timeout=Duration.seconds(60),
             environment={
-                "MEDIA_BUCKET": media_bucket.bucket_name
+                "MEDIA_BUCKET": media_bucket.bucket_name,
+                "TRANSCRIPTIONS_TABLE": transcriptions_table.table_name
             }
         )
 
@@ -180,13 +285,61 @@ class LanguageLearningStack(Stack):
             }
         )
 
+        transcription_events = _lambda.Function(
+            self, "TranscriptionEvents",
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            handler="transcription_events.handler",
+            code=_lambda.Code.from_asset("lambda"),
+            role=lambda_role,
+            timeout=Duration.seconds(30),
+            environment={
+                "MEDIA_BUCKET": media_bucket.bucket_name,
+                "TRANSCRIPTIONS_TABLE": transcriptions_table.table_name
+            }
+        )
+
+        # Record asynchronous transcription results as Transcribe finishes them
+        events.Rule(
+            self, "TranscriptionJobStateRule",
+            event_pattern=events.EventPattern(
+                source=["aws.transcribe"],
+                detail_type=["Transcribe Job State Change"],
+                detail={
+                    "TranscriptionJobStatus": ["COMPLETED", "FAILED"],
+                    "TranscriptionJobName": [{"prefix": "async-"}]
+                }
+            ),
+            targets=[targets.LambdaFunction(transcription_events)]
+        )
+
         translator = _lambda.Function(
             self, "Translator",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="translator.handler",
             code=_lambda.Code.from_asset("lambda"),
             role=lambda_role,
-            timeout=Duration.seconds(30)
+            timeout=Duration.seconds(30),
+            environment={
+                "TRANSLATION_CACHE_TABLE": translation_cache_table.table_name
+            }
+        )
+
+        # Export/import of a learner's history, run as an asynchronous self-invocation
+        history_transfer = _lambda.Function(
+            self, "HistoryTransfer",
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            handler="history_transfer.handler",
+            code=_lambda.Code.from_asset("lambda"),
+            role=lambda_role,
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            environment={
+                "MEDIA_BUCKET": media_bucket.bucket_name,
+                "VOCABULARY_TABLE": vocabulary_table.table_name,
+                "VOCABULARY_SEARCH_TABLE": vocabulary_search_table.table_name,
+                "LESSONS_TABLE": lessons_table.table_name,
+                "USER_LESSONS_INDEX": "UserLessonsIndex" if user_lessons_index else ""
+            }
         )
 
         # API Gateway with CORS
@@ -194,6 +347,8 @@ class LanguageLearningStack(Stack):
             self, "LanguageLearningAPI",
             rest_api_name="Language Learning Service",
             description="AI-powered language learning platform",
+            # Raw audio responses and binary-safe uploads
+            binary_media_types=["audio/*", "image/*", "multipart/form-data"],
             default_cors_preflight_options=apigw.CorsOptions(
                 allow_origins=apigw.Cors.ALL_ORIGINS,
                 allow_methods=apigw.Cors.ALL_METHODS,
@@ -207,6 +362,7 @@ class LanguageLearningStack(Stack):
         users_resource.add_method("POST", apigw.LambdaIntegration(user_manager))
 
         lessons_resource = api.root.add_resource("lessons")
+        lessons_resource.add_method("GET", apigw.LambdaIntegration(lesson_generator))
         lessons_resource.add_method("POST", apigw.LambdaIntegration(lesson_generator))
 
         quiz_resource = api.root.add_resource("quiz")
@@ -217,9 +373,11 @@ class LanguageLearningStack(Stack):
         vocabulary_resource.add_method("POST", apigw.LambdaIntegration(vocabulary_manager))
 
         voice_resource = api.root.add_resource("voice")
+        voice_resource.add_method("GET", apigw.LambdaIntegration(voice_processor))
         voice_resource.add_method("POST", apigw.LambdaIntegration(voice_processor))
 
         voice_transcribe_resource = api.root.add_resource("voice-transcribe")
+        voice_transcribe_resource.add_method("GET", apigw.LambdaIntegration(voice_transcriber))
         voice_transcribe_resource.add_method("POST", apigw.LambdaIntegration(voice_transcriber))
 
         objects_resource = api.root.add_resource("objects")
@@ -228,16 +386,42 @@ class LanguageLearningStack(Stack):
         translate_resource = api.root.add_resource("translate")
         translate_resource.add_method("POST", apigw.LambdaIntegration(translator))
 
+        history_resource = api.root.add_resource("history")
+        history_resource.add_method("GET", apigw.LambdaIntegration(history_transfer))
+        history_resource.add_method("POST", apigw.LambdaIntegration(history_transfer))
+
         # Grant permissions
         users_table.grant_read_write_data(user_manager)
         users_table.grant_read_write_data(lesson_generator)
         lessons_table.grant_read_write_data(lesson_generator)
         vocabulary_table.grant_read_write_data(vocabulary_manager)
+        vocabulary_search_table.grant_read_write_data(vocabulary_manager)
+        vocabulary_table.grant_read_write_data(history_transfer)
+        vocabulary_search_table.grant_read_write_data(history_transfer)
+        lessons_table.grant_read_write_data(history_transfer)
+        translation_cache_table.grant_read_write_data(translator)
+        question_bank_table.grant_read_write_data(quiz_generator)
+        transcriptions_table.grant_read_write_data(voice_processor)
+        transcriptions_table.grant_read_write_data(voice_transcriber)
+        transcriptions_table.grant_read_write_data(transcription_events)
         
         # Grant S3 permissions
         media_bucket.grant_read_write(voice_processor)
         media_bucket.grant_read_write(voice_transcriber)
         media_bucket.grant_read_write(object_detector)
+        media_bucket.grant_read_write(transcription_events)
+        media_bucket.grant_read_write(lesson_generator)
+        media_bucket.grant_read_write(history_transfer)
+
+        # Streaming lessons and history transfers run as asynchronous self-invocations. The
+        # ARNs are built from the generated function names to avoid a role <-> function cycle.
+        lambda_role.add_to_policy(iam.PolicyStatement(
+            actions=["lambda:InvokeFunction"],
+            resources=[
+                f"arn:{self.partition}:lambda:{self.region}:{self.account}:function:{self.stack_name}-{name}*"
+                for name in ("LessonGenerator", "HistoryTransfer")
+            ]
+        ))
 
         # Outputs
         cdk.CfnOutput(self, "APIEndpoint", value=api.url)
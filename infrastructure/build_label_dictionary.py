@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Build step for the object detector's label dictionary.
+
+Translates the Rekognition label taxonomy into every language in
+LANGUAGE_CONFIG['SUPPORTED_LANGUAGES'] and writes one compact JSON file per
+language to lambda/label_translations/, which ships with the Lambda asset.
+The files are build output, not source: cdk.json runs this before every
+synth, with --strict so a deploy never ships a partial dictionary.
+
+The taxonomy file is the label list published by AWS (CSV with the label name
+in the first column, or one label per line); label_taxonomy.txt is the list
+the deploy builds. Translations go through model_router's label_translation
+task, so the build uses the same model tiers, retries and throttling fallback
+as the Lambdas. Labels already in a language's file are kept, so reruns only
+translate what is missing and a complete dictionary costs no model calls.
+
+    python3 build_label_dictionary.py label_taxonomy.txt --strict
+    python3 build_label_dictionary.py rekognition_labels.csv --languages ms es
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+import aws_clients  # noqa: E402
+import llm_json  # noqa: E402
+import model_router  # noqa: E402
+from language_config import LANGUAGE_CONFIG  # noqa: E402
+from label_dictionary import DICTIONARY_DIR  # noqa: E402
+
+
+def read_taxonomy(path):
+    """Read label names from the first column, skipping a header row"""
+    labels = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip():
+                continue
+            name = row[0].strip()
+            if name.lower() in ('label', 'label name', 'name'):
+                continue
+            labels.append(name)
+    return sorted(set(labels))
+
+
+def _parse_translations(text, labels):
+    """Validator: a JSON object translating most of the batch"""
+    parsed = llm_json.extract_json(text, '{')
+    if not isinstance(parsed, dict):
+        raise llm_json.LLMJSONError("Expected a JSON object of translations")
+    translations = {label: parsed[label].strip() for label in labels
+                    if isinstance(parsed.get(label), str) and parsed[label].strip()}
+    if len(translations) * 2 < len(labels):
+        raise llm_json.LLMJSONError(f"Only {len(translations)} of {len(labels)} labels translated")
+    return translations
+
+
+def translate_batch(labels, language_name):
+    prompt = (
+        f"Translate each of these object names to {language_name}: {json.dumps(labels)}\n"
+        "Return ONLY a JSON object mapping each original name to its translation, "
+        "no explanation."
+    )
+    translations, _ = model_router.converse(
+        'label_translation',
+        validate=lambda text, final: _parse_translations(text, labels),
+        messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+        inferenceConfig={'maxTokens': 64 + 32 * len(labels)}
+    )
+    return translations
+
+
+def build_language(code, labels, batch_size, output_dir=DICTIONARY_DIR):
+    """Fill in ``code``'s missing translations; returns how many labels are still missing"""
+    path = os.path.join(output_dir, f"{code}.json")
+    existing = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            existing = json.load(f)
+
+    language_name = LANGUAGE_CONFIG['SUPPORTED_LANGUAGES'][code]
+    todo = [label for label in labels if label not in existing]
+    for i in range(0, len(todo), batch_size):
+        batch = todo[i:i + batch_size]
+        try:
+            existing.update(translate_batch(batch, language_name))
+        except Exception as e:
+            print(f"  {code}: batch {i // batch_size} failed: {e}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(existing, ensure_ascii=False, separators=(',', ':'), sort_keys=True))
+        f.write('\n')
+    missing = sum(1 for label in labels if label not in existing)
+    print(f"  {code}: {len(existing)} labels written, {missing} missing")
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('taxonomy', help='Rekognition label list (CSV or one label per line)')
+    parser.add_argument('--languages', nargs='*', help='Language codes to build (default: all supported)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--output', default=DICTIONARY_DIR, help='Directory to write the language files to')
+    parser.add_argument('--strict', action='store_true', help='Exit non-zero if any label is left untranslated')
+    args = parser.parse_args(argv)
+
+    codes = args.languages or list(LANGUAGE_CONFIG['SUPPORTED_LANGUAGES'])
+    unknown = [code for code in codes if code not in LANGUAGE_CONFIG['SUPPORTED_LANGUAGES']]
+    if unknown:
+        parser.error(f"Unsupported language codes: {', '.join(unknown)}")
+
+    labels = read_taxonomy(args.taxonomy)
+    print(f"Translating {len(labels)} labels into {len(codes)} languages")
+
+    os.makedirs(args.output, exist_ok=True)
+    aws_clients.BEDROCK_REGION = args.region
+    missing = 0
+    for code in codes:
+        # English is the source taxonomy language
+        if code == 'en':
+            continue
+        missing += build_language(code, labels, args.batch_size, args.output)
+
+    if missing and args.strict:
+        print(f"{missing} translations are missing; rerun to fill them in", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# audio_preprocessing.py
+# Prepares recorded audio before it is uploaded for transcription:
+#   - sniffs the real container instead of trusting the browser's filename
+#   - decodes PCM/float WAV, downmixes to mono and resamples to 16 kHz
+#   - trims leading/trailing silence with an energy-based voice activity check
+#   - rejects clips that contain no speech at all
+# Compressed containers (webm, ogg, mp3, mp4, flac) cannot be decoded without a
+# codec in the Lambda runtime; they are passed through with the correct
+# MediaFormat and Content-Type so Transcribe can decode them itself.
+import struct
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy ships in a layer; without it WAV is passed through untouched
+    np = None
+    print("NumPy is not available (is the NumPy layer attached?); WAV uploads are passed through without preprocessing")
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+PADDING_SECONDS = 0.2
+MIN_SPEECH_SECONDS = 0.1
+# Frames quieter than this (relative to full scale) are always treated as silence
+ABSOLUTE_ENERGY_FLOOR = 10 ** (-45 / 20)
+NOISE_FLOOR_MULTIPLIER = 3.0
+# A frame within 20 dB of the loudest frame is voiced whatever the noise
+# estimate says, so clips with no pause at all aren't mistaken for silence
+PEAK_RELATIVE_THRESHOLD = 10 ** (-20 / 20)
+
+PreparedAudio = namedtuple('PreparedAudio', ['data', 'media_format', 'content_type', 'duration'])
+
+
+class EmptyAudioError(ValueError):
+    """Raised when a clip contains no detectable speech"""
+
+
+def sniff_format(data):
+    """Return (media_format, content_type) for the container in ``data``"""
+    head = bytes(data[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav', 'audio/wav'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm', 'audio/webm'
+    if head[:4] == b'OggS':
+        return 'ogg', 'audio/ogg'
+    if head[:4] == b'fLaC':
+        return 'flac', 'audio/flac'
+    if head[4:8] == b'ftyp':
+        return 'mp4', 'audio/mp4'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3', 'audio/mpeg'
+    raise ValueError("Unsupported or unrecognized audio format")
+
+
+def _read_wav(data):
+    """Decode a WAV file into (float32 samples [frames, channels], sample rate)"""
+    view = memoryview(data)
+    pos = 12
+    fmt = None
+    samples = None
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        chunk_size = struct.unpack('<I', view[pos + 4:pos + 8])[0]
+        body = view[pos + 8:pos + 8 + chunk_size]
+        if chunk_id == b'fmt ':
+            format_tag, channels, sample_rate = struct.unpack('<HHI', body[:8])
+            bits = struct.unpack('<H', body[14:16])[0]
+            if format_tag == 0xFFFE and len(body) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: the real format tag leads the subformat GUID
+                format_tag = struct.unpack('<H', body[24:26])[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b'data':
+            samples = body
+            break
+        # Chunks are padded to an even length
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+    if fmt is None or samples is None:
+        raise ValueError("Malformed WAV file")
+
+    format_tag, channels, sample_rate, bits = fmt
+    width = bits // 8
+    usable = len(samples) - len(samples) % (width * channels)
+    samples = samples[:usable]
+
+    if format_tag == 3 and bits == 32:
+        pcm = np.frombuffer(samples, dtype='<f4')
+    elif format_tag == 1 and bits == 8:
+        pcm = (np.frombuffer(samples, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif format_tag == 1 and bits == 16:
+        pcm = np.frombuffer(samples, dtype='<i2').astype(np.float32) / 32768.0
+    elif format_tag == 1 and bits == 24:
+        raw = np.frombuffer(samples, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        pcm = ints.astype(np.float32) / 8388608.0
+    elif format_tag == 1 and bits == 32:
+        pcm = np.frombuffer(samples, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV encoding (format {format_tag}, {bits} bits)")
+
+    return pcm.reshape(-1, channels), sample_rate
+
+
+def _resample(mono, source_rate, target_rate=TARGET_SAMPLE_RATE):
+    if source_rate == target_rate or len(mono) == 0:
+        return mono
+    ratio = source_rate / target_rate
+    if ratio > 1:
+        # Box low-pass before decimating to limit aliasing
+        width = int(np.ceil(ratio))
+        mono = np.convolve(mono, np.full(width, 1.0 / width, dtype=np.float32), mode='same')
+    target_length = int(len(mono) / ratio)
+    positions = np.arange(target_length, dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def _speech_bounds(mono, sample_rate=TARGET_SAMPLE_RATE):
+    """Return (start, end) sample indices of the voiced region, or None if silent"""
+    frame = int(sample_rate * FRAME_SECONDS)
+    frame_count = len(mono) // frame
+    if frame_count == 0:
+        return None
+
+    frames = mono[:frame_count * frame].reshape(frame_count, frame)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+    # The quietest frames estimate the noise floor when the clip has pauses.
+    # A clip voiced end to end has no such frames, and its 10th percentile is
+    # speech, so the threshold is capped relative to the peak.
+    noise_threshold = float(np.percentile(energy, 10)) * NOISE_FLOOR_MULTIPLIER
+    peak_threshold = float(energy.max()) * PEAK_RELATIVE_THRESHOLD
+    threshold = max(ABSOLUTE_ENERGY_FLOOR, min(noise_threshold, peak_threshold))
+    voiced = np.flatnonzero(energy > threshold)
+    if len(voiced) * FRAME_SECONDS < MIN_SPEECH_SECONDS:
+        return None
+
+    padding = int(PADDING_SECONDS * sample_rate)
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(mono), (voiced[-1] + 1) * frame + padding)
+    return start, end
+
+
+def _encode_wav(mono, sample_rate=TARGET_SAMPLE_RATE):
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767.0).astype('<i2').tobytes()
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + len(pcm), b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', len(pcm)
+    )
+    return header + pcm
+
+
+def prepare(data):
+    """
+    Return PreparedAudio ready for upload to S3 and Transcribe.
+    Raises EmptyAudioError for clips with no speech and ValueError for unknown formats.
+    """
+    if not data:
+        raise EmptyAudioError("Empty audio clip")
+
+    media_format, content_type = sniff_format(data)
+    if media_format != 'wav' or np is None:
+        return PreparedAudio(bytes(data), media_format, content_type, None)
+
+    channels, sample_rate = _read_wav(data)
+    mono = _resample(channels.mean(axis=1, dtype=np.float32), sample_rate)
+
+    bounds = _speech_bounds(mono)
+    if bounds is None:
+        raise EmptyAudioError("No speech detected in audio clip")
+    start, end = bounds
+    trimmed = mono[start:end]
+
+    return PreparedAudio(_encode_wav(trimmed), 'wav', 'audio/wav', len(trimmed) / TARGET_SAMPLE_RATE)
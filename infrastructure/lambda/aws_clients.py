@@ -0,0 +1,125 @@
+# aws_clients.py
+# Shared AWS clients for every Lambda module. Clients are created on first use
+# (so a cold start only pays for the services the invocation touches) and are
+# reused across warm invocations. Each service gets its own botocore Config:
+# connection pool size, connect/read timeouts sized to the calls we make, and
+# adaptive retries.
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION')
+
+# service: (connect timeout s, read timeout s, pool size, max attempts)
+SERVICE_SETTINGS = {
+    # Generation can legitimately take tens of seconds; anything longer is hung.
+    # Throttling retries are handled by bedrock_invoke, not botocore.
+    'bedrock-runtime': (3, 50, 20, 1),
+    'dynamodb': (1, 5, 50, 4),
+    's3': (2, 15, 50, 4),
+    'polly': (2, 15, 20, 3),
+    'transcribe': (2, 10, 10, 4),
+    'rekognition': (2, 15, 10, 3),
+    'lambda': (2, 10, 10, 3),
+}
+DEFAULT_SETTINGS = (2, 15, 10, 3)
+
+# Callers with a deadline get a client whose read timeout fits the remaining
+# budget. Timeouts are rounded down to these steps so only a handful of
+# variants per service are ever built.
+TIMEOUT_STEPS = (1, 2, 3, 5, 8, 13, 20, 25, 30, 40)
+
+_session = None
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def config_for(service, read_timeout=None):
+    connect_timeout, default_read_timeout, pool_size, max_attempts = SERVICE_SETTINGS.get(service, DEFAULT_SETTINGS)
+    if read_timeout is not None:
+        # A deadline-bound call gets one attempt; the caller decides whether there's time to retry
+        connect_timeout = min(connect_timeout, read_timeout)
+        max_attempts = 1
+    return Config(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout or default_read_timeout,
+        max_pool_connections=pool_size,
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive', 'max_attempts': max_attempts}
+    )
+
+
+def timeout_step(service, timeout):
+    """The read timeout variant to use for ``timeout`` seconds, or None for the default client"""
+    if timeout is None:
+        return None
+    default_read_timeout = SERVICE_SETTINGS.get(service, DEFAULT_SETTINGS)[1]
+    if timeout >= default_read_timeout:
+        return None
+    fitting = [step for step in TIMEOUT_STEPS if step <= timeout]
+    return fitting[-1] if fitting else TIMEOUT_STEPS[0]
+
+
+def _region_for(service):
+    return BEDROCK_REGION if service == 'bedrock-runtime' and BEDROCK_REGION else None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def client(service, timeout=None):
+    """
+    The shared client for ``service``, created on first use. ``timeout``
+    (seconds) selects a variant that gives up within that time.
+    """
+    key = (service, timeout_step(service, timeout))
+    existing = _clients.get(key)
+    if existing is not None:
+        return existing
+    # Client creation isn't thread-safe on a shared session
+    with _lock:
+        if key not in _clients:
+            _clients[key] = _get_session().client(
+                service, region_name=_region_for(service), config=config_for(*key)
+            )
+        return _clients[key]
+
+
+def resource(service, timeout=None):
+    """The shared resource for ``service``, created on first use"""
+    key = (service, timeout_step(service, timeout))
+    existing = _resources.get(key)
+    if existing is not None:
+        return existing
+    with _lock:
+        if key not in _resources:
+            _resources[key] = _get_session().resource(
+                service, region_name=_region_for(service), config=config_for(*key)
+            )
+        return _resources[key]
+
+
+class _Lazy:
+    """Module-level stand-in that builds the real client on first attribute access"""
+
+    def __init__(self, factory, service):
+        self._factory = factory
+        self._service = service
+
+    def __getattr__(self, name):
+        return getattr(self._factory(self._service), name)
+
+
+def lazy_client(service):
+    return _Lazy(client, service)
+
+
+def lazy_resource(service):
+    return _Lazy(resource, service)
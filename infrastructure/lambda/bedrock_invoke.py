@@ -0,0 +1,204 @@
+# bedrock_invoke.py
+# Throttle-aware wrapper around Bedrock runtime calls. Throttling and
+# transient service errors are retried with decorrelated jitter, drawing on
+# the request's retry budget and never sleeping past its deadline; other
+# errors (validation, access) are raised at once. Sustained throttling of a
+# model opens a per-container circuit breaker, and calls then go straight to
+# the model's fallback until a single probe call after the cooldown gets
+# through: by default the cross-region inference profile for the same model,
+# or an explicit mapping from BEDROCK_FALLBACK_MODELS.
+import json
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+import aws_clients
+
+RETRYABLE_ERRORS = {
+    'ThrottlingException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+    'InternalServerException',
+    'TooManyRequestsException',
+}
+
+# Decorrelated jitter: sleep = min(cap, uniform(base, previous sleep * 3))
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_CAP_SECONDS = 4.0
+# Retries for a call made without a request deadline (and its retry budget)
+DEFAULT_RETRIES = 2
+# Time a call needs after a backoff for the retry to be worth making
+MIN_CALL_MS = 2000
+
+# Consecutive throttles before a model's breaker opens, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 20
+
+# e.g. "us" -> us.amazon.nova-pro-v1:0; empty to disable profile fallback
+FALLBACK_PROFILE_PREFIX = os.environ.get('BEDROCK_FALLBACK_PROFILE_PREFIX', 'us')
+FALLBACK_MODELS = json.loads(os.environ.get('BEDROCK_FALLBACK_MODELS') or '{}')
+
+bedrock = aws_clients.lazy_client('bedrock-runtime')
+
+
+class BedrockUnavailable(Exception):
+    """Every candidate model is throttled, unavailable or behind an open breaker"""
+
+
+class _Breaker:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        # When the half-open probe was let through, or 0 when none is in flight
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if not self.open_until:
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            # After the cooldown a single probe goes through and everyone else
+            # keeps failing fast until its outcome closes or re-opens the
+            # breaker. A probe that never reports back is replaced after a cooldown.
+            if self.probe_started and now < self.probe_started + BREAKER_COOLDOWN_SECONDS:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.open_until = 0.0
+            self.probe_started = 0.0
+
+    def record_throttle(self):
+        """Count a throttle; True if it opened (or re-opened) the breaker"""
+        with self.lock:
+            self.failures += 1
+            if self.probe_started:
+                self._reopen()
+                return True
+            if self.failures >= BREAKER_THRESHOLD and not self.open_until:
+                self._reopen()
+                return True
+            return False
+
+    def record_refusal(self):
+        """The model answered but refused the request (e.g. validation): it is reachable"""
+        with self.lock:
+            if self.probe_started:
+                self.failures = 0
+                self.open_until = 0.0
+                self.probe_started = 0.0
+
+    def record_failure(self):
+        """A call failed without a throttle (e.g. timed out); a failed probe re-opens the breaker"""
+        with self.lock:
+            if self.probe_started:
+                self._reopen()
+
+    def _reopen(self):
+        self.open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+        self.probe_started = 0.0
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker(model_id):
+    with _breakers_lock:
+        return _breakers.setdefault(model_id, _Breaker())
+
+
+def fallback_for(model_id):
+    if model_id in FALLBACK_MODELS:
+        return FALLBACK_MODELS[model_id]
+    if FALLBACK_PROFILE_PREFIX and model_id.count('.') == 1:
+        # Plain model id (provider.model); profiles already carry a region prefix
+        return f"{FALLBACK_PROFILE_PREFIX}.{model_id}"
+    return None
+
+
+def is_retryable(error):
+    return (isinstance(error, ClientError)
+            and error.response.get('Error', {}).get('Code') in RETRYABLE_ERRORS)
+
+
+def _call_with_retries(operation, model_id, deadline, request):
+    breaker = _breaker(model_id)
+    retries_left = DEFAULT_RETRIES
+    sleep = BACKOFF_BASE_SECONDS
+    while True:
+        client = deadline.client('bedrock-runtime') if deadline else bedrock
+        try:
+            response = getattr(client, operation)(modelId=model_id, **request)
+        except ClientError as e:
+            if not is_retryable(e):
+                breaker.record_refusal()
+                raise
+            if breaker.record_throttle():
+                print(f"Circuit opened for {model_id} after repeated throttling")
+                raise
+            sleep = min(BACKOFF_CAP_SECONDS, random.uniform(BACKOFF_BASE_SECONDS, sleep * 3))
+            if deadline is not None:
+                can_retry = deadline.has(sleep * 1000 + MIN_CALL_MS) and deadline.take_retry()
+            else:
+                can_retry = retries_left > 0
+                retries_left -= 1
+            if not can_retry:
+                raise
+            print(f"Bedrock {e.response['Error']['Code']} on {model_id}; retrying in {sleep:.2f}s")
+            time.sleep(sleep)
+            continue
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return response
+
+
+def invoke(operation, deadline=None, **request):
+    """
+    Call ``operation`` ('converse' or 'converse_stream') on the request's
+    model, falling back to its secondary when the primary stays throttled.
+    Returns (response, model_id actually used).
+    """
+    model_id = request.pop('modelId')
+    candidates = [model_id]
+    fallback = fallback_for(model_id)
+    if fallback:
+        candidates.append(fallback)
+
+    last_error = None
+    for candidate in candidates:
+        if not _breaker(candidate).allow():
+            print(f"Circuit open for {candidate}; skipping")
+            continue
+        try:
+            return _call_with_retries(operation, candidate, deadline, request), candidate
+        except ClientError as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+            if candidate != candidates[-1]:
+                print(f"Failing over from {candidate}: {e}")
+    raise BedrockUnavailable(f"Bedrock is busy: {last_error or 'circuit open'}")
+
+
+def busy_response():
+    return {
+        'statusCode': 503,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Retry-After': str(BREAKER_COOLDOWN_SECONDS)
+        },
+        'body': json.dumps({'error': 'The service is busy right now. Please try again shortly.', 'retryable': True})
+    }
@@ -0,0 +1,63 @@
+# bedrock_usage.py
+# Shared pieces for Bedrock converse calls. Static instructions go in the
+# system prompt followed by a cache point, so Bedrock can reuse the processed
+# prefix across requests and only the short per-request message is new.
+# Token usage (including cache reads/writes) and latency are logged per
+# endpoint as CloudWatch Embedded Metric Format records.
+import json
+import time
+
+METRICS_NAMESPACE = 'LanguageLearning/Bedrock'
+CACHE_POINT = {'cachePoint': {'type': 'default'}}
+
+_USAGE_METRICS = (
+    ('inputTokens', 'InputTokens'),
+    ('outputTokens', 'OutputTokens'),
+    ('cacheReadInputTokens', 'CacheReadInputTokens'),
+    ('cacheWriteInputTokens', 'CacheWriteInputTokens'),
+)
+
+
+def cached_system(prefix):
+    """System prompt blocks with a cache point after the static prefix"""
+    return [{'text': prefix}, CACHE_POINT]
+
+
+def user_message(text):
+    return [{'role': 'user', 'content': [{'text': text}]}]
+
+
+def log_usage(endpoint, model_id, usage, latency_ms=None, first_token_ms=None):
+    """Log token counts and timings for one model call"""
+    usage = usage or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Endpoint'], ['Endpoint', 'ModelId']],
+                'Metrics': []
+            }]
+        },
+        'Endpoint': endpoint,
+        'ModelId': model_id
+    }
+    metrics = record['_aws']['CloudWatchMetrics'][0]['Metrics']
+    for field, name in _USAGE_METRICS:
+        record[name] = int(usage.get(field, 0))
+        metrics.append({'Name': name, 'Unit': 'Count'})
+    for name, value in (('LatencyMs', latency_ms), ('FirstTokenMs', first_token_ms)):
+        if value is not None:
+            record[name] = int(value)
+            metrics.append({'Name': name, 'Unit': 'Milliseconds'})
+    print(json.dumps(record))
+
+
+def log_response(endpoint, model_id, response):
+    """Log usage from a converse response"""
+    log_usage(endpoint, model_id, response.get('usage'),
+              latency_ms=response.get('metrics', {}).get('latencyMs'))
+
+
+def response_text(response):
+    return response['output']['message']['content'][0]['text']
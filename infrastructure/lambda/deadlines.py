@@ -0,0 +1,99 @@
+# deadlines.py
+# Per-request time budget. A Deadline is created at the top of a handler from
+# the Lambda context and, for API requests, API Gateway's 29 s integration
+# limit (whichever ends first). It hands out AWS clients whose timeouts fit
+# the remaining budget, lets callers skip optional work when time is short,
+# and raises DeadlineExceeded so the handler can answer with a clear 504
+# instead of working on after the client has given up. It also carries the
+# request's budget of retries for throttled calls.
+import json
+import threading
+import time
+
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+import aws_clients
+
+API_GATEWAY_TIMEOUT_MS = 29000
+# Time kept back to build and return the response after the last call
+RESPONSE_MARGIN_MS = 750
+# Retries of throttled downstream calls allowed per request, across all calls
+RETRY_BUDGET = 3
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, operation):
+        super().__init__(f"Not enough time left for {operation}")
+        self.operation = operation
+
+
+# Errors that mean a request ran out of time rather than failed
+TIMEOUT_ERRORS = (DeadlineExceeded, ReadTimeoutError, ConnectTimeoutError)
+
+
+class Deadline:
+    def __init__(self, budget_ms):
+        self.expires_at = time.monotonic() + max(budget_ms, 0) / 1000
+        self.retries_left = RETRY_BUDGET
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_context(cls, context, api_gateway=True):
+        """Budget for this invocation; ``api_gateway`` caps it at the integration timeout"""
+        limits = []
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            limits.append(context.get_remaining_time_in_millis())
+        if api_gateway or not limits:
+            limits.append(API_GATEWAY_TIMEOUT_MS)
+        return cls(min(limits) - RESPONSE_MARGIN_MS)
+
+    def remaining_ms(self):
+        return max(0, int((self.expires_at - time.monotonic()) * 1000))
+
+    def remaining(self):
+        """Seconds left"""
+        return self.remaining_ms() / 1000
+
+    def has(self, needed_ms):
+        """True if at least ``needed_ms`` remain, e.g. before optional work"""
+        return self.remaining_ms() >= needed_ms
+
+    def check(self, operation, needed_ms=0):
+        if self.remaining_ms() <= needed_ms:
+            raise DeadlineExceeded(operation)
+
+    def take_retry(self):
+        """Spend one retry from the request's budget; False once it is used up"""
+        with self._lock:
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    def client(self, service):
+        """A client for ``service`` whose timeouts end before the deadline"""
+        self.check(service)
+        return aws_clients.client(service, timeout=self.remaining())
+
+    def resource(self, service):
+        self.check(service)
+        return aws_clients.resource(service, timeout=self.remaining())
+
+    def sleep(self, seconds):
+        time.sleep(min(seconds, self.remaining()))
+
+
+def timeout_response(error=None):
+    message = 'The request took too long to complete. Please try again.'
+    if isinstance(error, DeadlineExceeded):
+        print(f"Deadline exceeded: {error.operation}")
+    elif error is not None:
+        print(f"Downstream call timed out: {error}")
+    return {
+        'statusCode': 504,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message, 'timeout': True})
+    }
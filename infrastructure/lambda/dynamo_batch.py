@@ -0,0 +1,72 @@
+# dynamo_batch.py
+# BatchGetItem / BatchWriteItem helpers. Requests are split to the API's
+# per-call limits, and whatever DynamoDB hands back as unprocessed (under
+# throttling or partition pressure) is resent with exponential backoff
+# until it goes through or the attempts run out.
+import time
+
+import aws_clients
+
+WRITE_BATCH_SIZE = 25
+GET_BATCH_SIZE = 100
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_CAP_SECONDS = 2.0
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+
+class UnprocessedItemsError(Exception):
+    def __init__(self, table_name, count):
+        super().__init__(f"{count} items for {table_name} were still unprocessed after {MAX_ATTEMPTS} attempts")
+        self.count = count
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _backoff(attempt, deadline=None):
+    seconds = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    if deadline is not None:
+        deadline.check('batch retry', seconds * 1000)
+    time.sleep(seconds)
+
+
+def batch_write(table_name, items, deadline=None):
+    """Put ``items`` into ``table_name``, resending unprocessed items"""
+    service = deadline.resource('dynamodb') if deadline else dynamodb
+    for chunk in _chunks(list(items), WRITE_BATCH_SIZE):
+        request = {table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+        for attempt in range(MAX_ATTEMPTS):
+            response = service.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems') or {}
+            if not request or attempt == MAX_ATTEMPTS - 1:
+                break
+            _backoff(attempt, deadline)
+        if request:
+            raise UnprocessedItemsError(table_name, len(request.get(table_name, [])))
+
+
+def batch_get(table_name, keys, projection=None, deadline=None):
+    """Fetch the items for ``keys`` (missing ones are simply absent), resending unprocessed keys"""
+    service = deadline.resource('dynamodb') if deadline else dynamodb
+    found = []
+    for chunk in _chunks(list(keys), GET_BATCH_SIZE):
+        table_request = {'Keys': chunk}
+        if projection:
+            names = {f"#p{i}": name for i, name in enumerate(projection)}
+            table_request['ProjectionExpression'] = ', '.join(names)
+            table_request['ExpressionAttributeNames'] = names
+        request = {table_name: table_request}
+        for attempt in range(MAX_ATTEMPTS):
+            response = service.batch_get_item(RequestItems=request)
+            found.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys') or {}
+            if not request or attempt == MAX_ATTEMPTS - 1:
+                break
+            _backoff(attempt, deadline)
+        if request:
+            raise UnprocessedItemsError(table_name, len(request.get(table_name, {}).get('Keys', [])))
+    return found
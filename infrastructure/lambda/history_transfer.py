@@ -0,0 +1,393 @@
+# history_transfer.py
+# Export and import of a learner's history (vocabulary and lessons) as
+# gzip NDJSON in the media bucket. Both run as asynchronous self-invocations
+# and stream: the export pages through DynamoDB and writes each part of a
+# multipart upload as soon as it fills, and the import reads the object
+# line by line and writes fixed-size chunks with a small pool of parallel
+# batch writers. Memory stays flat however large the account is.
+#
+# POST /history {userId, action: "export"}                -> 202 {jobId}
+# POST /history {userId, action: "import"}                -> {jobId, uploadUrl} to PUT the file to
+# POST /history {userId, action: "import", jobId}         -> 202, starts importing the uploaded file
+# POST /history {userId, action: "import", sourceKey}     -> 202, imports an existing export
+# GET  /history?userId=...&jobId=...                      -> job status, with a download URL when done
+import gzip
+import json
+import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+import dynamo_batch
+import vocabulary_manager
+import vocabulary_search
+
+BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
+VOCABULARY_TABLE = os.environ.get('VOCABULARY_TABLE', 'language-learning-vocabulary')
+LESSONS_TABLE = os.environ.get('LESSONS_TABLE', 'language-learning-lessons')
+# KEYS_ONLY GSI on (userId, createdAt) over the lessons table; empty while
+# the index is still waiting for its own deploy, in which case exports
+# leave lessons out
+USER_LESSONS_INDEX = os.environ.get('USER_LESSONS_INDEX', 'UserLessonsIndex')
+
+FORMAT_VERSION = 1
+KEY_PREFIX = 'history'
+# S3 multipart parts must be at least 5 MB (except the last)
+PART_SIZE = 8 * 1024 * 1024
+# Items per import write chunk, and how many chunks are written at once
+IMPORT_CHUNK_SIZE = 500
+IMPORT_WORKERS = 8
+URL_EXPIRES_SECONDS = 3600
+
+# Attributes an imported row may carry; anything else in the file is dropped
+VOCABULARY_FIELDS = frozenset(vocabulary_manager.FIELDS)
+LESSON_FIELDS = frozenset((
+    'lessonId', 'sourceLessonId', 'targetLanguage', 'nativeLanguage', 'topic', 'difficultyLevel',
+    'createdAt', 'completed', 'status', 'lesson', 'method', 'error'
+))
+MAX_KEY_LENGTH = 256
+
+s3 = aws_clients.lazy_client('s3')
+dynamodb = aws_clients.lazy_resource('dynamodb')
+lambda_client = aws_clients.lazy_client('lambda')
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return int(o) if o == o.to_integral_value() else float(o)
+        if isinstance(o, set):
+            return sorted(o)
+        return super(DecimalEncoder, self).default(o)
+
+
+def _response(status, body):
+    return {
+        'statusCode': status,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
+
+
+def handler(event, context):
+    if 'transferJob' in event:
+        # Asynchronous self-invocation: do the actual export or import
+        return run_job(event['transferJob'])
+    try:
+        if event['httpMethod'] == 'GET':
+            params = event.get('queryStringParameters') or {}
+            if not params.get('userId') or not params.get('jobId'):
+                return _response(400, {'error': 'userId and jobId are required'})
+            return get_status(params['userId'], params['jobId'])
+        if event['httpMethod'] != 'POST':
+            return _response(405, {'error': 'Method not allowed'})
+
+        body = json.loads(event.get('body') or '{}')
+        user_id = body.get('userId')
+        action = body.get('action')
+        if not user_id or action not in ('export', 'import'):
+            return _response(400, {'error': "userId and an action of 'export' or 'import' are required"})
+        if action == 'export':
+            return start_job(context, {'action': 'export', 'userId': user_id, 'jobId': str(uuid.uuid4())})
+        return request_import(context, user_id, body)
+
+    except Exception as e:
+        print(f"History transfer error: {e}")
+        return _response(500, {'error': str(e)})
+
+
+def _job_key(user_id, job_id, name):
+    return f"{KEY_PREFIX}/{user_id}/{job_id}/{name}"
+
+
+def _write_status(job, status, **details):
+    record = {
+        'jobId': job['jobId'],
+        'action': job['action'],
+        'status': status,
+        'updatedAt': datetime.utcnow().isoformat(),
+        **details
+    }
+    s3.put_object(
+        Bucket=BUCKET_NAME,
+        Key=_job_key(job['userId'], job['jobId'], 'status.json'),
+        Body=json.dumps(record).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+
+def start_job(context, job):
+    _write_status(job, 'QUEUED')
+    lambda_client.invoke(
+        FunctionName=context.function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'transferJob': job})
+    )
+    return _response(202, {'jobId': job['jobId'], 'status': 'QUEUED'})
+
+
+def request_import(context, user_id, body):
+    if body.get('sourceKey'):
+        source_key = body['sourceKey']
+        # Only the caller's own exports can be imported by key
+        if not source_key.startswith(f"{KEY_PREFIX}/{user_id}/") or not source_key.endswith('.ndjson.gz'):
+            return _response(400, {'error': 'sourceKey must be one of your history exports'})
+        job_id = str(uuid.uuid4())
+    elif body.get('jobId'):
+        job_id = body['jobId']
+        source_key = _job_key(user_id, job_id, 'import.ndjson.gz')
+    else:
+        # First step: hand out a URL to upload the file to, then start with its jobId
+        job_id = str(uuid.uuid4())
+        upload_url = s3.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': BUCKET_NAME,
+                'Key': _job_key(user_id, job_id, 'import.ndjson.gz'),
+                'ContentType': 'application/gzip'
+            },
+            ExpiresIn=URL_EXPIRES_SECONDS
+        )
+        return _response(200, {'jobId': job_id, 'uploadUrl': upload_url})
+
+    return start_job(context, {'action': 'import', 'userId': user_id, 'jobId': job_id, 'sourceKey': source_key})
+
+
+def get_status(user_id, job_id):
+    try:
+        obj = s3.get_object(Bucket=BUCKET_NAME, Key=_job_key(user_id, job_id, 'status.json'))
+    except s3.exceptions.NoSuchKey:
+        return _response(404, {'error': 'Job not found'})
+    record = json.loads(obj['Body'].read())
+    if record.get('status') == 'COMPLETED' and record.get('exportKey'):
+        record['downloadUrl'] = s3.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': BUCKET_NAME, 'Key': record['exportKey']},
+            ExpiresIn=URL_EXPIRES_SECONDS
+        )
+    return _response(200, record)
+
+
+def run_job(job):
+    try:
+        _write_status(job, 'RUNNING')
+        if job['action'] == 'export':
+            details = export_history(job['userId'], _job_key(job['userId'], job['jobId'], 'export.ndjson.gz'))
+        else:
+            details = import_history(job['userId'], job['sourceKey'])
+        _write_status(job, 'COMPLETED', **details)
+    except Exception as e:
+        print(f"History {job['action']} {job['jobId']} failed: {e}")
+        _write_status(job, 'FAILED', error=str(e))
+
+
+class MultipartWriter:
+    """
+    Write-only file object over an S3 multipart upload. Bytes are buffered
+    up to PART_SIZE and then uploaded as a part, so memory is bounded by
+    one part whatever the object's final size.
+    """
+
+    def __init__(self, key, content_type):
+        self.key = key
+        self.upload_id = s3.create_multipart_upload(
+            Bucket=BUCKET_NAME, Key=key, ContentType=content_type
+        )['UploadId']
+        self.parts = []
+        self.buffer = bytearray()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        self.size += len(data)
+        if len(self.buffer) >= PART_SIZE:
+            self._upload_part()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self):
+        number = len(self.parts) + 1
+        response = s3.upload_part(
+            Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id,
+            PartNumber=number, Body=bytes(self.buffer)
+        )
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+        self.buffer = bytearray()
+
+    def complete(self):
+        # The last part may be smaller than the minimum, and may be the only part
+        if self.buffer or not self.parts:
+            self._upload_part()
+        s3.complete_multipart_upload(
+            Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+
+    def abort(self):
+        s3.abort_multipart_upload(Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id)
+
+
+def _query_pages(table, **kwargs):
+    while True:
+        response = table.query(**kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _vocabulary_items(user_id):
+    table = dynamodb.Table(VOCABULARY_TABLE)
+    for page in _query_pages(table, KeyConditionExpression=Key('userId').eq(user_id)):
+        yield from page
+
+
+def _lesson_items(user_id):
+    if not USER_LESSONS_INDEX:
+        return
+    # The index holds keys only; full lessons come from the table a page at a time
+    index_pages = _query_pages(
+        dynamodb.Table(LESSONS_TABLE),
+        IndexName=USER_LESSONS_INDEX,
+        KeyConditionExpression=Key('userId').eq(user_id),
+        Limit=dynamo_batch.GET_BATCH_SIZE
+    )
+    for page in index_pages:
+        keys = [{'lessonId': item['lessonId']} for item in page]
+        if keys:
+            yield from dynamo_batch.batch_get(LESSONS_TABLE, keys)
+
+
+def export_history(user_id, key):
+    """Stream a user's vocabulary and lessons into ``key`` as gzip NDJSON"""
+    writer = MultipartWriter(key, 'application/gzip')
+    counts = {'vocabulary': 0, 'lesson': 0}
+    try:
+        with gzip.GzipFile(fileobj=writer, mode='wb') as out:
+            header = {'type': 'header', 'version': FORMAT_VERSION, 'userId': user_id,
+                      'exportedAt': datetime.utcnow().isoformat()}
+            out.write((json.dumps(header) + '\n').encode('utf-8'))
+            for kind, items in (('vocabulary', _vocabulary_items(user_id)), ('lesson', _lesson_items(user_id))):
+                for item in items:
+                    line = json.dumps({'type': kind, 'item': item}, cls=DecimalEncoder, ensure_ascii=False)
+                    out.write((line + '\n').encode('utf-8'))
+                    counts[kind] += 1
+        writer.complete()
+    except Exception:
+        writer.abort()
+        raise
+    return {'exportKey': key, 'bytes': writer.size, 'vocabulary': counts['vocabulary'], 'lessons': counts['lesson'],
+            'lessonsIncluded': bool(USER_LESSONS_INDEX)}
+
+
+def _checked(item, allowed, key_fields, user_id):
+    """
+    A copy of an uploaded row limited to ``allowed`` attributes and owned by
+    ``user_id``. The file is client-supplied, so nothing in it (its header's
+    userId included) decides whose rows are written.
+    """
+    for field in key_fields:
+        value = item.get(field)
+        if not isinstance(value, str) or not value or len(value) > MAX_KEY_LENGTH or '#' in value:
+            raise ValueError(f"'{field}' must be a non-empty string")
+    return dict({k: v for k, v in item.items() if k in allowed}, userId=user_id)
+
+
+def _imported_word(item, user_id):
+    return _checked(item, VOCABULARY_FIELDS, ('wordId',), user_id)
+
+
+def _imported_lesson(item, user_id):
+    item = _checked(item, LESSON_FIELDS, ('lessonId',), user_id)
+    # Lesson ids are global, so every import gets its own id, derived from the
+    # importer and the original lesson (stable across re-imports, and never
+    # another account's row). cacheKey isn't an allowed field: an imported
+    # lesson is a private copy, never a shared cache variant.
+    source_id = item.get('sourceLessonId') or item['lessonId']
+    if not isinstance(source_id, str):
+        raise ValueError("'sourceLessonId' must be a string")
+    item['sourceLessonId'] = source_id
+    item['lessonId'] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_id}/{source_id}"))
+    return item
+
+
+def _write_chunk(kind, items):
+    if kind == 'vocabulary':
+        dynamo_batch.batch_write(VOCABULARY_TABLE, items)
+        vocabulary_search.index_words(items)
+    else:
+        dynamo_batch.batch_write(LESSONS_TABLE, items)
+    return len(items)
+
+
+def import_history(user_id, key):
+    """
+    Load an export into ``user_id``'s account. Words keep their ids and
+    lessons get ids derived from the importer, so re-running an import is safe.
+    """
+    body = s3.get_object(Bucket=BUCKET_NAME, Key=key)['Body']
+    counts = {'vocabulary': 0, 'lesson': 0}
+    chunks = {'vocabulary': [], 'lesson': []}
+    seen_header = False
+    in_flight = set()
+
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        def submit(kind):
+            # Bound the chunks held in memory: wait for a writer before queueing more
+            while len(in_flight) >= IMPORT_WORKERS * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    future.result()
+            in_flight.add(pool.submit(_write_chunk, kind, chunks[kind]))
+            chunks[kind] = []
+
+        for number, raw in enumerate(gzip.GzipFile(fileobj=body), start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw, parse_float=Decimal)
+            except ValueError:
+                raise ValueError(f"Line {number} is not valid JSON")
+            kind = record.get('type')
+            if kind == 'header':
+                if record.get('version') != FORMAT_VERSION:
+                    raise ValueError(f"Unsupported export version {record.get('version')}")
+                seen_header = True
+                continue
+            if kind not in chunks or not isinstance(record.get('item'), dict):
+                raise ValueError(f"Line {number} is not a vocabulary or lesson record")
+            if not seen_header:
+                raise ValueError('Export header is missing')
+
+            try:
+                if kind == 'vocabulary':
+                    item = _imported_word(record['item'], user_id)
+                else:
+                    item = _imported_lesson(record['item'], user_id)
+            except ValueError as e:
+                raise ValueError(f"Line {number}: {e}")
+            chunks[kind].append(item)
+            counts[kind] += 1
+            if len(chunks[kind]) >= IMPORT_CHUNK_SIZE:
+                submit(kind)
+
+        for kind in chunks:
+            if chunks[kind]:
+                submit(kind)
+        for future in in_flight:
+            future.result()
+
+    return {'sourceKey': key, 'vocabulary': counts['vocabulary'], 'lessons': counts['lesson']}
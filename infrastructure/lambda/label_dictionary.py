@@ -0,0 +1,51 @@
+# label_dictionary.py
+# Precomputed translations of the Rekognition label taxonomy, one compact JSON
+# file per target language under label_translations/. The files are build
+# output: infrastructure/build_label_dictionary.py writes them before each
+# synth (see cdk.json). They are loaded lazily on first lookup; without them
+# every label is a miss and goes to Bedrock.
+import json
+import os
+
+from language_config import LANGUAGE_CONFIG
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'label_translations')
+
+_NAME_TO_CODE = {name.lower(): code for code, name in LANGUAGE_CONFIG['SUPPORTED_LANGUAGES'].items()}
+_loaded = {}
+
+
+def _resolve_code(language: str):
+    """Accept either a language code ('ms') or a display name ('Malay')"""
+    if not language:
+        return None
+    language = language.strip()
+    if language.lower() in LANGUAGE_CONFIG['SUPPORTED_LANGUAGES']:
+        return language.lower()
+    return _NAME_TO_CODE.get(language.lower())
+
+
+def load(language: str) -> dict:
+    """Return the {label: translation} map for a language, loading it on first use"""
+    code = _resolve_code(language)
+    if code is None:
+        return {}
+    if code not in _loaded:
+        path = os.path.join(DICTIONARY_DIR, f"{code}.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                _loaded[code] = json.load(f)
+        except FileNotFoundError:
+            _loaded[code] = {}
+        except Exception as e:
+            print(f"Error loading label dictionary {path}: {e}")
+            _loaded[code] = {}
+    return _loaded[code]
+
+
+def lookup(label: str, language: str):
+    """Return the precomputed translation of a label, or None on a miss"""
+    # Rekognition labels are already English
+    if _resolve_code(language) == 'en':
+        return label
+    return load(language).get(label)
@@ -1,5 +1,11 @@
 # language_config.py
-from functools import lru_cache
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+import aws_clients
 
 LANGUAGE_ALIASES = {
     "english": "en", "en": "en",
@@ -8,11 +14,38 @@ LANGUAGE_ALIASES = {
 CODE_TO_NAME = {"en": "English", "ms": "Malay"}
 SUPPORTED_LANG_CODES = set(CODE_TO_NAME.keys())
 
-GLOBAL_USER_ID: str | None = None
-GLOBAL_NATIVE_LANGUAGE: str | None = None  # ISO code
-GLOBAL_TARGET_LANGUAGE: str | None = None  # ISO code
-GLOBAL_NATIVE_LANGUAGE_NAME: str | None = None  # Human-readable
-GLOBAL_TARGET_LANGUAGE_NAME: str | None = None
+USERS_TABLE = os.environ.get('USERS_TABLE', 'language-learning-users')
+# The cache is per container and clear_language_cache only reaches the
+# container that made a change; every other container (and every other
+# function) serves its cached context until it expires. The TTL is kept
+# short so a prefs change is seen everywhere within seconds, while a burst
+# of requests from one user still costs a single read.
+CONTEXT_TTL_SECONDS = int(os.environ.get('LANGUAGE_CONTEXT_TTL_SECONDS', '10'))
+CONTEXT_CACHE_SIZE = int(os.environ.get('LANGUAGE_CONTEXT_CACHE_SIZE', '1024'))
+# Everything a request needs from the user item, read in one projected get_item
+CONTEXT_ATTRIBUTES = 'userId, nativeLanguage, targetLanguage, proficiency, weakAreas, recentLessonVariants'
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+_contexts = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class LanguageContext:
+    """A user's language settings and learning profile, resolved once per request"""
+    user_id: str
+    native_language: str  # ISO code
+    target_language: str  # ISO code
+    native_language_name: str  # Human-readable
+    target_language_name: str
+    proficiency: str | None = None
+    weak_areas: tuple = ()
+    recent_lesson_variants: tuple = ()
+
+    def with_recent_lesson_variants(self, variants):
+        return replace(self, recent_lesson_variants=tuple(variants))
+
 
 def normalize_lang(lang: str) -> str:
     if not isinstance(lang, str):
@@ -22,43 +55,79 @@ def normalize_lang(lang: str) -> str:
         raise ValueError(f"Unsupported language: {lang!r}")
     return code
 
-@lru_cache(maxsize=1024)
-def _fetch_user_language_codes(user_id: str) -> tuple[str, str]:
-    from user_manager import get_user_language_prefs
-    native_raw, target_raw = get_user_language_prefs(user_id)
-    if not native_raw or not target_raw:
-        raise ValueError(f"User {user_id} missing language prefs.")
-    return normalize_lang(native_raw), normalize_lang(target_raw)
-
 def code_to_name(code: str) -> str:
     return CODE_TO_NAME.get(code, code)
 
-def refresh_language_globals(user_id: str) -> None:
+def context_from_item(item: dict) -> LanguageContext:
     """
-    MUST be called per-request with the current user_id.
+    Build a LanguageContext from a users-table item.
     No defaults; raises if prefs are missing.
     """
-    global GLOBAL_USER_ID, GLOBAL_NATIVE_LANGUAGE, GLOBAL_TARGET_LANGUAGE
-    global GLOBAL_NATIVE_LANGUAGE_NAME, GLOBAL_TARGET_LANGUAGE_NAME
-
+    native_raw, target_raw = item.get('nativeLanguage'), item.get('targetLanguage')
+    if not native_raw or not target_raw:
+        raise ValueError(f"User {item.get('userId')} missing language prefs.")
+    native, target = normalize_lang(native_raw), normalize_lang(target_raw)
+    return LanguageContext(
+        user_id=item['userId'],
+        native_language=native,
+        target_language=target,
+        native_language_name=code_to_name(native),
+        target_language_name=code_to_name(target),
+        proficiency=item.get('proficiency'),
+        weak_areas=tuple(item.get('weakAreas') or ()),
+        recent_lesson_variants=tuple(item.get('recentLessonVariants') or ()),
+    )
+
+def _cached_context(user_id: str):
+    with _lock:
+        entry = _contexts.get(user_id)
+        if entry is None:
+            return None
+        ctx, expires_at = entry
+        if expires_at <= time.monotonic():
+            del _contexts[user_id]
+            return None
+        _contexts.move_to_end(user_id)
+        return ctx
+
+def cache_language_context(ctx: LanguageContext) -> None:
+    """Remember a context, e.g. after this request changed the user's profile"""
+    with _lock:
+        _contexts[ctx.user_id] = (ctx, time.monotonic() + CONTEXT_TTL_SECONDS)
+        _contexts.move_to_end(ctx.user_id)
+        while len(_contexts) > CONTEXT_CACHE_SIZE:
+            _contexts.popitem(last=False)
+
+def get_language_context(user_id: str, deadline=None) -> LanguageContext:
+    """
+    MUST be called per-request with the current user_id; the result is
+    passed explicitly to whatever needs it. Served from a TTL-bounded cache,
+    otherwise read with a single projected get_item.
+    """
     if not user_id:
-        raise ValueError("user_id is required to refresh globals.")
-    native, target = _fetch_user_language_codes(user_id)
-
-    GLOBAL_USER_ID = user_id
-    GLOBAL_NATIVE_LANGUAGE = native
-    GLOBAL_TARGET_LANGUAGE = target
-    GLOBAL_NATIVE_LANGUAGE_NAME = code_to_name(native)
-    GLOBAL_TARGET_LANGUAGE_NAME = code_to_name(target)
+        raise ValueError("user_id is required to resolve language settings.")
+    ctx = _cached_context(user_id)
+    if ctx is not None:
+        return ctx
+
+    resource = deadline.resource('dynamodb') if deadline else dynamodb
+    item = resource.Table(USERS_TABLE).get_item(
+        Key={'userId': user_id},
+        ProjectionExpression=CONTEXT_ATTRIBUTES
+    ).get('Item')
+    if not item:
+        raise ValueError(f"User {user_id} not found.")
+    ctx = context_from_item(item)
+    cache_language_context(ctx)
+    return ctx
 
 def clear_language_cache(user_id: str | None = None) -> None:
-    if user_id is None:
-        _fetch_user_language_codes.cache_clear()
-    else:
-        try:
-            _fetch_user_language_codes.cache_pop(user_id)
-        except Exception:
-            _fetch_user_language_codes.cache_clear()
+    """Drop this container's cached contexts, e.g. after updating a user's prefs here"""
+    with _lock:
+        if user_id is None:
+            _contexts.clear()
+        else:
+            _contexts.pop(user_id, None)
 
 
 # Global language configuration for Lambda functions
@@ -0,0 +1,110 @@
+# lesson_cache.py
+# Cross-user reuse of generated lessons. A validated lesson is stored with a
+# cacheKey built from the language pair, level, canonical topic and a
+# normalized weak-area signature; the sparse LessonCacheIndex GSI on the
+# lessons table (cacheKey, createdAt) lets a request find fresh variants for
+# its bucket with a single query. Variants a user has recently been served
+# are skipped so learners rotate through them.
+import hashlib
+import random
+import re
+from datetime import datetime, timedelta
+
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+
+import llm_json
+
+LESSONS_TABLE = 'language-learning-lessons'
+USERS_TABLE = 'language-learning-users'
+INDEX_NAME = 'LessonCacheIndex'
+
+# Variants older than this are ignored and eventually regenerated
+FRESHNESS_DAYS = 30
+# Keep generating new variants until a bucket has this many fresh ones
+MIN_VARIANTS = 3
+MAX_VARIANTS = 10
+RECENT_VARIANTS_KEPT = 20
+
+TOPIC_ALIASES = {
+    'daily conversations': 'daily conversation',
+    'everyday conversation': 'daily conversation',
+    'greeting': 'greetings',
+    'food': 'food and drink',
+    'food and drinks': 'food and drink',
+    'transport': 'transportation',
+}
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+
+def canonical_topic(topic):
+    topic = re.sub(r'[^\w\s]', ' ', (topic or '').lower())
+    topic = ' '.join(topic.split())
+    return TOPIC_ALIASES.get(topic, topic)
+
+
+def weak_area_signature(weak_areas):
+    """Order-insensitive, case-insensitive digest of the learner's weak areas"""
+    areas = sorted({' '.join(str(a).lower().split()) for a in (weak_areas or []) if str(a).strip()})
+    if not areas:
+        return 'none'
+    return hashlib.sha256('|'.join(areas).encode('utf-8')).hexdigest()[:12]
+
+
+def cache_key(target_language, native_language, level, topic, weak_areas):
+    return '|'.join([
+        (target_language or '').lower(),
+        (native_language or '').lower(),
+        (level or '').lower(),
+        canonical_topic(topic),
+        weak_area_signature(weak_areas),
+    ])
+
+
+def is_cacheable(lesson):
+    """Only share lessons that have the structure the app relies on"""
+    errors, _ = llm_json.validate_lesson(lesson)
+    return not errors
+
+
+def find_variant(key, recently_served=()):
+    """
+    Return a fresh cached lesson item for this key that the user hasn't seen
+    recently, or None when the caller should generate a new variant.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=FRESHNESS_DAYS)).isoformat()
+    response = dynamodb.Table(LESSONS_TABLE).query(
+        IndexName=INDEX_NAME,
+        KeyConditionExpression=Key('cacheKey').eq(key) & Key('createdAt').gte(cutoff),
+        ScanIndexForward=False,
+        Limit=MAX_VARIANTS
+    )
+    variants = response.get('Items', [])
+    if len(variants) < MIN_VARIANTS:
+        return None
+
+    seen = set(recently_served)
+    unseen = [v for v in variants if v['lessonId'] not in seen]
+    if not unseen:
+        # Everything fresh has been served to this user; grow the pool if there's room
+        if len(variants) < MAX_VARIANTS:
+            return None
+        order = {lesson_id: i for i, lesson_id in enumerate(recently_served)}
+        return min(variants, key=lambda v: order.get(v['lessonId'], -1))
+    return random.choice(unseen)
+
+
+def remember_served(user_id, variant_id, recently_served):
+    """Record the variant in the user's rotation history and return the new history"""
+    history = ([v for v in recently_served if v != variant_id] + [variant_id])[-RECENT_VARIANTS_KEPT:]
+    try:
+        dynamodb.Table(USERS_TABLE).update_item(
+            Key={'userId': user_id},
+            UpdateExpression='SET recentLessonVariants = :history',
+            ExpressionAttributeValues={':history': history}
+        )
+    except Exception as e:
+        print(f"Error recording served lesson variant: {e}")
+    return history
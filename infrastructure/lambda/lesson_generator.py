@@ -1,15 +1,33 @@
-import json, boto3, uuid
+import json, time, uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-)
+import language_config
+from language_config import get_language_code
+import aws_clients
+import bedrock_invoke
+import bedrock_usage
+import deadlines
+import lesson_cache
+import llm_json
+import model_router
+import speech_cache
+import streaming_json
 
-dynamodb = boto3.resource('dynamodb')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+dynamodb = aws_clients.lazy_resource('dynamodb')
+lambda_client = aws_clients.lazy_client('lambda')
+
+# Bounded fan-out for pre-synthesizing lesson audio
+AUDIO_SYNTHESIS_WORKERS = 6
+
+# A full lesson is roughly 1.5-2.5k output tokens
+LESSON_MAX_TOKENS = 3000
+
+# Budgets (ms) below which a step is skipped or the request gives up
+LESSON_GENERATION_MIN_MS = 8000
+LESSON_REPAIR_MIN_MS = 6000
+AUDIO_SYNTHESIS_MIN_MS = 3000
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -18,40 +36,115 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(o)
 
 def handler(event, context):
+    # Background invocation that streams a lesson into its record
+    if 'streamLesson' in event:
+        return run_streaming_lesson(
+            event['streamLesson'], deadlines.Deadline.from_context(context, api_gateway=False)
+        )
+
+    deadline = deadlines.Deadline.from_context(context)
     try:
+        if event.get('httpMethod') == 'GET':
+            return get_lesson(event, deadline)
+
         body = json.loads(event['body'])
         user_id = body['userId']  # required; no defaults allowed
         topic = body.get('topic', 'daily conversation')
 
-        # IMPORTANT: set globals for *this* request's user
-        refresh_language_globals(user_id)
-
-        users_table = dynamodb.Table('language-learning-users')
-        user_response = users_table.get_item(Key={'userId': user_id})
-        item = user_response.get('Item') or {}
-        proficiency = (item.get('proficiency') or 'beginner')
+        # Language settings and learning profile for *this* request's user
+        ctx = language_config.get_language_context(user_id, deadline)
+        proficiency = ctx.proficiency or 'beginner'
+        weak_areas = list(ctx.weak_areas)
+        recently_served = list(ctx.recent_lesson_variants)
 
-        lesson = generate_bedrock_lesson(
-            target_language=GLOBAL_TARGET_LANGUAGE_NAME,
-            native_language=GLOBAL_NATIVE_LANGUAGE_NAME,
-            topic=topic,
-            level=proficiency,
-            weak_areas=item.get('weakAreas', []),
+        # Reuse a validated lesson from learners with the same profile when possible
+        cache_key = lesson_cache.cache_key(
+            ctx.target_language_name, ctx.native_language_name, proficiency, topic, weak_areas
         )
+        variant = None
+        if not body.get('fresh', False):
+            try:
+                variant = lesson_cache.find_variant(cache_key, recently_served)
+            except Exception as e:
+                print(f"Lesson cache lookup error: {e}")
 
         lesson_id = str(uuid.uuid4())
-        lessons_table = dynamodb.Table('language-learning-lessons')
-        lessons_table.put_item(Item={
+        lesson_item = {
             'lessonId': lesson_id,
             'userId': user_id,
-            'targetLanguage': GLOBAL_TARGET_LANGUAGE_NAME,
-            'nativeLanguage': GLOBAL_NATIVE_LANGUAGE_NAME,
+            'targetLanguage': ctx.target_language_name,
+            'nativeLanguage': ctx.native_language_name,
             'topic': topic,
             'difficultyLevel': proficiency,
-            'lesson': lesson,
             'createdAt': datetime.utcnow().isoformat(),
             'completed': False
-        })
+        }
+
+        if variant is not None:
+            lesson = variant['lesson']
+            variant_id = variant['lessonId']
+            lesson_item['sourceLessonId'] = variant_id
+            audio_urls = lesson_audio_urls(lesson, ctx.target_language, deadline)
+            method = 'lesson_cache'
+        elif body.get('stream', False):
+            # Return at once; sections are written to the record as the model produces them
+            lesson_item['status'] = 'GENERATING'
+            lesson_item['sections'] = {}
+            dynamodb.Table('language-learning-lessons').put_item(Item=lesson_item)
+            lambda_client.invoke(
+                FunctionName=context.function_name,
+                InvocationType='Event',
+                Payload=json.dumps({'streamLesson': {
+                    'lessonId': lesson_id,
+                    'userId': user_id,
+                    'targetLanguageCode': ctx.target_language,
+                    'targetLanguage': ctx.target_language_name,
+                    'nativeLanguage': ctx.native_language_name,
+                    'topic': topic,
+                    'level': proficiency,
+                    'weakAreas': weak_areas,
+                    'cacheKey': cache_key,
+                    'recentlyServed': recently_served,
+                    'preSynthesizeAudio': body.get('preSynthesizeAudio', True)
+                }}, cls=DecimalEncoder)
+            )
+            # The background run updates the rotation history; don't serve a stale copy
+            language_config.clear_language_cache(user_id)
+            return {
+                'statusCode': 202,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({
+                    'lessonId': lesson_id,
+                    'status': 'GENERATING',
+                    'userProficiency': proficiency,
+                    'targetLanguage': ctx.target_language_name,
+                    'method': 'stream',
+                }),
+            }
+        else:
+            deadline.check('lesson generation', LESSON_GENERATION_MIN_MS)
+            lesson, method = generate_bedrock_lesson(
+                target_language=ctx.target_language_name,
+                native_language=ctx.native_language_name,
+                topic=topic,
+                level=proficiency,
+                weak_areas=weak_areas,
+                deadline=deadline,
+            )
+            audio_urls = finalize_generated_lesson(
+                lesson, lesson_item, cache_key,
+                ctx.target_language,
+                body.get('preSynthesizeAudio', True),
+                deadline=deadline
+            )
+            variant_id = lesson_id
+
+        lesson_item['lesson'] = lesson
+        lessons_table = deadline.resource('dynamodb').Table('language-learning-lessons')
+        lessons_table.put_item(Item=lesson_item)
+        if 'cacheKey' in lesson_item or variant is not None:
+            history = lesson_cache.remember_served(user_id, variant_id, recently_served)
+            language_config.cache_language_context(ctx.with_recent_lesson_variants(history))
 
         return {
             'statusCode': 200,
@@ -59,11 +152,17 @@ def handler(event, context):
             'body': json.dumps({
                 'lessonId': lesson_id,
                 'lesson': lesson,
+                'audioUrls': audio_urls,
                 'userProficiency': proficiency,
-                'targetLanguage': GLOBAL_TARGET_LANGUAGE_NAME,
-                'method': 'amazon_nova_pro',
+                'targetLanguage': ctx.target_language_name,
+                'method': method,
             }, cls=DecimalEncoder),
         }
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
+    except bedrock_invoke.BedrockUnavailable as e:
+        print(f"Bedrock unavailable: {e}")
+        return bedrock_invoke.busy_response()
     except KeyError as e:
         return _bad_request(f"Missing required field: {e}")
     except ValueError as e:
@@ -83,25 +182,182 @@ def _bad_request(msg: str):
         'body': json.dumps({'error': msg})
     }
 
-def generate_bedrock_lesson(target_language, native_language, topic, level, weak_areas):
-    focus_areas = f"Pay special attention to: {', '.join(weak_areas)}" if weak_areas else ""
-    
-    prompt = f"""
-You are an expert {target_language} lesson designer for a mobile language learning app (like Duolingo).
-Design a CEFR-aligned lesson for a {level} learner whose native language is {native_language}.
+def finalize_generated_lesson(lesson, lesson_item, cache_key, language, pre_synthesize, deadline=None):
+    """Attach pre-synthesized audio and mark validated lessons as shareable variants"""
+    # Synthesize every vocab word and phrase up front so playback needs no round trips.
+    # It's optional: without time for it the app synthesizes on demand.
+    audio_urls = {}
+    if pre_synthesize and (deadline is None or deadline.has(AUDIO_SYNTHESIS_MIN_MS)):
+        audio_urls = attach_lesson_audio(lesson, language, deadline)
+
+    # Validated lessons become variants other learners can be served
+    if lesson_cache.is_cacheable(lesson):
+        lesson_item['cacheKey'] = cache_key
+    return audio_urls
+
+def run_streaming_lesson(job, deadline):
+    """Generate a lesson with converse_stream, persisting each section as it closes"""
+    lessons_table = dynamodb.Table('language-learning-lessons')
+    key = {'lessonId': job['lessonId']}
+    try:
+        lesson = model_id = None
+        for event in stream_bedrock_lesson(
+            target_language=job['targetLanguage'],
+            native_language=job['nativeLanguage'],
+            topic=job['topic'],
+            level=job['level'],
+            weak_areas=job['weakAreas'],
+            deadline=deadline,
+        ):
+            if event[0] == 'section':
+                _, name, value = event
+                value = json.loads(json.dumps(value), parse_float=Decimal)
+                lessons_table.update_item(
+                    Key=key,
+                    UpdateExpression='SET sections.#name = :value',
+                    ExpressionAttributeNames={'#name': name},
+                    ExpressionAttributeValues={':value': value}
+                )
+            elif event[0] == 'item':
+                _, name, _, value = event
+                value = json.loads(json.dumps(value), parse_float=Decimal)
+                lessons_table.update_item(
+                    Key=key,
+                    UpdateExpression='SET sections.#name = list_append(if_not_exists(sections.#name, :empty), :item)',
+                    ExpressionAttributeNames={'#name': name},
+                    ExpressionAttributeValues={':empty': [], ':item': [value]}
+                )
+            else:
+                _, lesson, model_id = event
+                lesson = json.loads(json.dumps(lesson), parse_float=Decimal)
+
+        lesson_item = {}
+        finalize_generated_lesson(
+            lesson, lesson_item, job['cacheKey'],
+            job['targetLanguageCode'], job['preSynthesizeAudio'],
+            deadline=deadline
+        )
+        update_expression = 'SET lesson = :lesson, #status = :status, #method = :method'
+        values = {':lesson': lesson, ':status': 'COMPLETED', ':method': model_id}
+        if 'cacheKey' in lesson_item:
+            update_expression += ', cacheKey = :cacheKey'
+            values[':cacheKey'] = lesson_item['cacheKey']
+        lessons_table.update_item(
+            Key=key,
+            UpdateExpression=update_expression + ' REMOVE sections',
+            ExpressionAttributeNames={'#status': 'status', '#method': 'method'},
+            ExpressionAttributeValues=values
+        )
+        if 'cacheKey' in lesson_item:
+            lesson_cache.remember_served(job['userId'], job['lessonId'], job['recentlyServed'])
+    except Exception as e:
+        print(f"Streaming lesson error: {e}")
+        lessons_table.update_item(
+            Key=key,
+            UpdateExpression='SET #status = :status, #error = :error',
+            ExpressionAttributeNames={'#status': 'status', '#error': 'error'},
+            ExpressionAttributeValues={':status': 'FAILED', ':error': 'Failed to generate lesson'}
+        )
+
+def get_lesson(event, deadline=None):
+    """Return a lesson, including the sections completed so far while it is generating"""
+    query = event.get('queryStringParameters') or {}
+    lesson_id = query['lessonId']
+    item = dynamodb.Table('language-learning-lessons').get_item(Key={'lessonId': lesson_id}).get('Item')
+    if not item or item.get('userId') != query.get('userId'):
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Lesson not found'}),
+        }
+
+    status = item.get('status', 'COMPLETED')
+    lesson = item.get('lesson') if status == 'COMPLETED' else item.get('sections', {})
+    audio_urls = {}
+    if status == 'COMPLETED' and lesson:
+        try:
+            language = language_config.normalize_lang(item.get('targetLanguage', ''))
+            audio_urls = lesson_audio_urls(lesson, language, deadline)
+        except ValueError:
+            pass
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'lessonId': lesson_id,
+            'status': status,
+            'lesson': lesson,
+            'audioUrls': audio_urls,
+            'targetLanguage': item.get('targetLanguage'),
+            'method': item.get('method', 'stream'),
+        }, cls=DecimalEncoder),
+    }
+
+def lesson_audio_urls(lesson, language, deadline=None):
+    """
+    Presigned URLs for a stored lesson's pre-synthesized items. The audio is
+    looked up by the item's text rather than its stored key, so audio the
+    cache has since expired is synthesized again.
+    """
+    if deadline is not None and not deadline.has(AUDIO_SYNTHESIS_MIN_MS):
+        # The app synthesizes on demand
+        return {}
+    return attach_lesson_audio(lesson, language, deadline, only_synthesized=True)
+
+def attach_lesson_audio(lesson, language, deadline=None, only_synthesized=False):
+    """
+    Pre-synthesize vocabulary words and phrases concurrently.
+    Each item gets a deterministic 'audioKey' (stored with the lesson); the
+    returned {audioKey: presigned URL} map is only valid for this response.
+    ``only_synthesized`` limits this to items that already have an audioKey.
+    """
+    voice_id = speech_cache.voice_for(language)
+    language_code = get_language_code(language)
+
+    items = []
+    for field, text_key in (('vocabulary', 'word'), ('phrases', 'phrase')):
+        for entry in lesson.get(field) or []:
+            if not isinstance(entry, dict) or not entry.get(text_key):
+                continue
+            if only_synthesized and not entry.get('audioKey'):
+                continue
+            items.append((entry, entry[text_key]))
+    if not items:
+        return {}
+
+    def synthesize(text):
+        try:
+            return speech_cache.synthesize(text, voice_id, language_code, deadline=deadline)
+        except Exception as e:
+            print(f"Audio synthesis error for {text!r}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(AUDIO_SYNTHESIS_WORKERS, len(items))) as pool:
+        results = list(pool.map(synthesize, [text for _, text in items]))
+
+    audio_urls = {}
+    for (entry, _), speech in zip(items, results):
+        if speech is not None:
+            entry['audioKey'] = speech['key']
+            audio_urls[speech['key']] = speech['url']
+        elif only_synthesized:
+            entry.pop('audioKey', None)
+    return audio_urls
+
+LESSON_SYSTEM_PROMPT = """
+You are an expert lesson designer for a mobile language learning app (like Duolingo).
+Each request gives the target language, the learner's native language, their level, the topic and any focus areas.
+Design a CEFR-aligned lesson for that learner.
 The lesson must be engaging, realistic, and PRACTICAL for mobile practice (short tasks, tap/drag/select, sentence completion, multiple choice). 
 Avoid tasks that are unrealistic for a phone (e.g., reading long books, filming vlogs). 
 
-Topic: {topic}
-Focus areas: {focus_areas}
-
 OUTPUT FORMAT (strict):
 Return ONLY a single valid JSON object with this EXACT structure and keys:
-{{
+{
   "title": "Engaging lesson title",
-  "content": "3–4 short learner-friendly paragraphs (max 5 sentences each) explaining the topic with examples by using {native_language}",
+  "content": "3–4 short learner-friendly paragraphs (max 5 sentences each) explaining the topic with examples, written in the learner's native language",
   "vocabulary": [
-    {{"word": "target word", "translation": "native translation", "pronunciation": "IPA or phonetic", "example": "short example sentence"}}
+    {"word": "target word", "translation": "native translation", "pronunciation": "IPA or phonetic", "example": "short example sentence"}
   ],
   "grammar_focus": "One key grammar point with 1–2 clear examples",
   "cultural_note": "Brief cultural insight directly tied to the topic",
@@ -111,9 +367,9 @@ Return ONLY a single valid JSON object with this EXACT structure and keys:
     "Mobile-friendly task 3"
   ],
   "phrases": [
-    {{"phrase": "useful phrase", "translation": "translation", "context": "when to use"}}
+    {"phrase": "useful phrase", "translation": "translation", "context": "when to use"}
   ]
-}}
+}
 
 QUANTITY RULES:
 - Vocabulary: 8–10 useful words tied to the Topic. Each has an example sentence the learner could realistically say.
@@ -132,7 +388,7 @@ LEVEL RULES:
 - C1: idiomatic, nuanced, formal/informal register awareness.
 
 PRONUNCIATION:
-- Always use IPA or the standard system for {target_language}.
+- Always use IPA or the standard system for the target language.
 - Show stress/tones if relevant.
 
 CULTURAL NOTE:
@@ -143,27 +399,97 @@ FINAL VALIDATION:
 - Ensure counts are correct: 8–10 vocabulary items, 5–6 phrases, 3 exercises, 3–4 short paragraphs.
 """
 
+def build_lesson_prompt(target_language, native_language, topic, level, weak_areas):
+    """Per-request part of the lesson prompt; the rules live in LESSON_SYSTEM_PROMPT"""
+    focus_areas = ', '.join(weak_areas) if weak_areas else 'none'
+    return f"""Target language: {target_language}
+Native language: {native_language}
+Level: {level}
+Topic: {topic}
+Focus areas: {focus_areas}"""
+
+def lesson_request(target_language, native_language, topic, level, weak_areas):
+    return {
+        'system': bedrock_usage.cached_system(LESSON_SYSTEM_PROMPT),
+        'messages': bedrock_usage.user_message(
+            build_lesson_prompt(target_language, native_language, topic, level, weak_areas)
+        ),
+        'inferenceConfig': {'maxTokens': LESSON_MAX_TOKENS}
+    }
+
+def generate_bedrock_lesson(target_language, native_language, topic, level, weak_areas, deadline=None):
+    """Returns (lesson, model id that generated it)"""
+    def parse(text, final):
+        # Repair locally where possible; only ask the model to fix what we can't,
+        # and only when there's time left for another call
+        repair = None
+        if final and (deadline is None or deadline.has(LESSON_REPAIR_MIN_MS)):
+            repair = lambda text, problem: _repair_json(text, problem, deadline)
+        return llm_json.parse_with_repair(
+            text.strip(), '{', llm_json.validate_lesson, repair=repair
+        )
+
     try:
-        response = bedrock.converse(
-            modelId='amazon.nova-pro-v1:0',
-            messages=[{
-                'role': 'user',
-                'content': [{'text': prompt}]
-            }]
+        return model_router.converse(
+            'lesson',
+            validate=parse,
+            deadline=deadline,
+            **lesson_request(target_language, native_language, topic, level, weak_areas)
         )
-        
-        lesson_content = response['output']['message']['content'][0]['text'].strip()
-        
-        # Clean JSON response
-        if lesson_content.startswith('```json'):
-            lesson_content = lesson_content[7:]
-        if lesson_content.endswith('```'):
-            lesson_content = lesson_content[:-3]
-        lesson_content = lesson_content.strip()
-        
-        lesson_data = json.loads(lesson_content)
-        return lesson_data
             
+    except (deadlines.TIMEOUT_ERRORS + (bedrock_invoke.BedrockUnavailable,)):
+        raise
     except Exception as e:
         print(f"Nova error: {e}")
         raise Exception(f"Failed to generate lesson: {str(e)}")
+
+def _repair_json(text, problem, deadline=None):
+    repaired, _ = model_router.converse(
+        'json_repair',
+        deadline=deadline,
+        messages=bedrock_usage.user_message(llm_json.repair_prompt(text, problem)),
+        inferenceConfig={'maxTokens': LESSON_MAX_TOKENS}
+    )
+    return repaired
+
+def stream_bedrock_lesson(target_language, native_language, topic, level, weak_areas, deadline=None):
+    """
+    Generate a lesson with converse_stream, yielding ('section', key, value) and
+    ('item', key, index, value) events as each part of the JSON closes, then
+    ('done', lesson, model_id) with the whole output validated and repaired
+    exactly as generate_bedrock_lesson does.
+    """
+    started = time.monotonic()
+    first_token_ms = None
+    response, model_id = bedrock_invoke.invoke(
+        'converse_stream', deadline,
+        modelId=model_router.model_for('lesson'),
+        **lesson_request(target_language, native_language, topic, level, weak_areas)
+    )
+
+    parser = streaming_json.SectionStream()
+    chunks = []
+    for event in response['stream']:
+        # Read timeouts apply per chunk, so bound the whole stream as well
+        if deadline is not None:
+            deadline.check('lesson stream')
+        delta = event.get('contentBlockDelta', {}).get('delta', {})
+        if 'text' in delta:
+            if first_token_ms is None:
+                first_token_ms = (time.monotonic() - started) * 1000
+            chunks.append(delta['text'])
+            yield from parser.feed(delta['text'])
+        elif 'metadata' in event:
+            bedrock_usage.log_usage(
+                'lesson-stream', model_id, event['metadata'].get('usage'),
+                latency_ms=event['metadata'].get('metrics', {}).get('latencyMs'),
+                first_token_ms=first_token_ms
+            )
+
+    # Sections streamed early are previews; the stored lesson is the full
+    # output, normalized (incomplete items dropped, extras trimmed) or repaired
+    repair = None
+    if deadline is None or deadline.has(LESSON_REPAIR_MIN_MS):
+        repair = lambda text, problem: _repair_json(text, problem, deadline)
+    lesson = llm_json.parse_with_repair(''.join(chunks).strip(), '{', llm_json.validate_lesson, repair=repair)
+    yield ('done', lesson, model_id)
@@ -0,0 +1,204 @@
+# llm_json.py
+# Tolerant extraction of JSON from model output. Finds the outermost JSON
+# value in one pass and repairs the defects models commonly produce (preamble
+# or commentary around the JSON, code fences, trailing commas, raw newlines in
+# strings, smart quotes, truncated output) before falling back to a small
+# model "repair" call. Per-endpoint validators check the shape the app needs.
+import json
+
+_SMART_QUOTES = frozenset('“”„‟')
+_CLOSERS = {'{': '}', '[': ']'}
+
+LESSON_VOCABULARY_RANGE = (8, 10)
+LESSON_PHRASES_RANGE = (5, 6)
+LESSON_EXERCISES = 3
+QUIZ_OPTIONS = 4
+
+
+class LLMJSONError(ValueError):
+    """Raised when no usable JSON value can be recovered from model output"""
+
+
+def _scan(text, start):
+    """
+    Copy the JSON value starting at ``start``, dropping trailing commas,
+    escaping raw newlines in strings and turning smart-quoted strings into
+    JSON strings. If the text ends before the value closes, cut back to the
+    last complete member and close the open containers.
+    """
+    out = []
+    stack = []
+    # (length of out, open containers) after the last complete member
+    safe_point = None
+    # The quotes that close the current string, or None outside strings
+    closing = None
+    escape = False
+
+    for c in text[start:]:
+        if closing:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c in closing:
+                closing = None
+                c = '"'
+            elif c == '"':
+                # A plain quote inside a smart-quoted string
+                c = '\\"'
+            elif c == '\n':
+                c = '\\n'
+            out.append(c)
+            continue
+
+        if c == '"' or c in _SMART_QUOTES:
+            closing = '"' if c == '"' else _SMART_QUOTES
+            out.append('"')
+        elif c in _CLOSERS:
+            stack.append(_CLOSERS[c])
+            out.append(c)
+        elif c in '}]':
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            if not stack or c != stack[-1]:
+                continue
+            stack.pop()
+            out.append(c)
+            if not stack:
+                return ''.join(out)
+            safe_point = (len(out), list(stack))
+        elif c == ',':
+            safe_point = (len(out), list(stack))
+            out.append(c)
+        else:
+            out.append(c)
+
+    # Truncated: close at the last complete member
+    if safe_point is None:
+        raise LLMJSONError("Truncated JSON with no complete members")
+    length, open_stack = safe_point
+    return ''.join(out[:length]).rstrip().rstrip(',') + ''.join(reversed(open_stack))
+
+
+def _find_start(text, opener):
+    openers = [opener] if opener else ['{', '[']
+    positions = [p for p in (text.find(o) for o in openers) if p != -1]
+    if not positions:
+        raise LLMJSONError("No JSON value found in model output")
+    return min(positions)
+
+
+def extract_json(text, opener=None):
+    """
+    Return the outermost JSON value in ``text``: the one at the first opener,
+    or its last complete prefix if the output was cut off. ``opener``
+    restricts the search to an object ('{') or array ('['). Anything else
+    (an opener in commentary before the value, say) raises, leaving it to
+    the repair call.
+    """
+    if not isinstance(text, str):
+        raise LLMJSONError("Model output is not text")
+    try:
+        return json.loads(_scan(text, _find_start(text, opener)))
+    except LLMJSONError:
+        raise
+    except ValueError as e:
+        raise LLMJSONError(f"Could not parse model JSON: {e}")
+
+
+def validate_lesson(lesson):
+    """Normalize a lesson in place and return (schema problems, lesson)"""
+    if not isinstance(lesson, dict):
+        return ["Lesson must be a JSON object"], lesson
+    errors = []
+    for key in ('title', 'content', 'grammar_focus', 'cultural_note'):
+        if not isinstance(lesson.get(key), str) or not lesson[key].strip():
+            errors.append(f"'{key}' must be a non-empty string")
+
+    for key, (low, high), required in (
+        ('vocabulary', LESSON_VOCABULARY_RANGE, ('word', 'translation')),
+        ('phrases', LESSON_PHRASES_RANGE, ('phrase', 'translation')),
+    ):
+        items = lesson.get(key)
+        if not isinstance(items, list):
+            errors.append(f"'{key}' must be a list")
+            continue
+        # Drop incomplete entries (e.g. from truncation) and any extras
+        items = [i for i in items if isinstance(i, dict) and all(i.get(f) for f in required)]
+        lesson[key] = items[:high]
+        if len(items) < low:
+            errors.append(f"'{key}' needs {low}-{high} complete items, got {len(items)}")
+
+    exercises = lesson.get('exercises')
+    if not isinstance(exercises, list) or len(exercises) < LESSON_EXERCISES:
+        errors.append(f"'exercises' needs exactly {LESSON_EXERCISES} items")
+    else:
+        lesson['exercises'] = exercises[:LESSON_EXERCISES]
+    return errors, lesson
+
+
+def validate_quiz(questions, question_count=None):
+    """Normalize quiz questions and return (schema problems, valid questions)"""
+    if isinstance(questions, dict):
+        # Accept {"questions": [...]} wrappers
+        questions = next((v for v in questions.values() if isinstance(v, list)), None)
+    if not isinstance(questions, list):
+        return ["Quiz must be a JSON array"], []
+
+    valid = []
+    for question in questions:
+        if not isinstance(question, dict) or not isinstance(question.get('question'), str):
+            continue
+        options = question.get('options')
+        correct = question.get('correct')
+        if (not isinstance(options, list) or len(options) < QUIZ_OPTIONS - 1
+                or not all(isinstance(o, str) for o in options)):
+            continue
+        if isinstance(correct, str) and correct.isdigit():
+            correct = int(correct)
+        # The 4th option is reserved for "I don't know", so it can't be the answer
+        if not isinstance(correct, int) or isinstance(correct, bool) or not 0 <= correct < QUIZ_OPTIONS - 1:
+            continue
+        question['correct'] = correct
+        valid.append(question)
+
+    errors = []
+    if not valid:
+        errors.append("No valid questions (each needs text, 4 options and a valid 'correct' index)")
+    elif question_count and len(valid) < question_count:
+        errors.append(f"Expected {question_count} valid questions, got {len(valid)}")
+    return errors, valid
+
+
+def parse_with_repair(text, opener, validate, repair=None):
+    """
+    Extract and validate model JSON. ``validate(value)`` returns (errors, value).
+    Only when local repair fails is ``repair(text, problem)`` called for a
+    corrected model response, which is parsed and validated once more.
+    """
+    try:
+        value = extract_json(text, opener)
+        errors, value = validate(value)
+    except LLMJSONError as e:
+        errors, value = [str(e)], None
+    if not errors:
+        return value
+    if repair is None:
+        raise LLMJSONError('; '.join(errors))
+
+    print(f"Requesting JSON repair: {'; '.join(errors)}")
+    value = extract_json(repair(text, '; '.join(errors)), opener)
+    errors, value = validate(value)
+    if errors:
+        raise LLMJSONError('; '.join(errors))
+    return value
+
+
+def repair_prompt(text, problem):
+    return (
+        "The following model output was supposed to be JSON but has problems: "
+        f"{problem}\n\nFix it and return ONLY the corrected JSON, with no explanation.\n\n{text}"
+    )
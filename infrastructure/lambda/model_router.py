@@ -0,0 +1,94 @@
+# model_router.py
+# Maps each kind of Bedrock task to a model tier. Interactive, low-stakes
+# tasks (single words, object labels) start on the smallest model; a task
+# whose output fails validation is retried one tier up, as long as its
+# policy allows it and the request has time left. Tiers can be overridden
+# per task with MODEL_TIER_<TASK> environment variables (e.g.
+# MODEL_TIER_QUIZ=pro) and tier model ids with MODEL_ID_<TIER>.
+import os
+from collections import namedtuple
+
+import bedrock_invoke
+import bedrock_usage
+
+TIER_ORDER = ('micro', 'lite', 'pro')
+TIER_MODELS = {
+    'micro': os.environ.get('MODEL_ID_MICRO', 'amazon.nova-micro-v1:0'),
+    'lite': os.environ.get('MODEL_ID_LITE', 'amazon.nova-lite-v1:0'),
+    'pro': os.environ.get('MODEL_ID_PRO', 'amazon.nova-pro-v1:0'),
+}
+
+# tier: where the task starts; max_tier: highest tier it may escalate to;
+# escalate_min_ms: budget needed to try another tier
+Policy = namedtuple('Policy', ['tier', 'max_tier', 'escalate_min_ms'])
+
+TASK_POLICIES = {
+    'word_translation': Policy('micro', 'lite', 2000),
+    'label_translation': Policy('micro', 'lite', 3000),
+    'sentence_translation': Policy('lite', 'pro', 4000),
+    'quiz': Policy('lite', 'pro', 8000),
+    'lesson': Policy('pro', 'pro', 0),
+    'json_repair': Policy('lite', 'pro', 6000),
+}
+
+
+def policy_for(task):
+    policy = TASK_POLICIES[task]
+    override = os.environ.get(f"MODEL_TIER_{task.upper()}", '').lower()
+    if override in TIER_ORDER:
+        max_tier = max(override, policy.max_tier, key=TIER_ORDER.index)
+        policy = policy._replace(tier=override, max_tier=max_tier)
+    return policy
+
+
+def tiers_for(task):
+    """The tiers a task may use, smallest first"""
+    policy = policy_for(task)
+    return TIER_ORDER[TIER_ORDER.index(policy.tier):TIER_ORDER.index(policy.max_tier) + 1]
+
+
+def model_for(task):
+    """Model id for a task's starting tier"""
+    return TIER_MODELS[tiers_for(task)[0]]
+
+
+def converse(task, validate=None, deadline=None, **request):
+    """
+    Run a converse request for ``task``, escalating through its tiers.
+    ``validate(text, final)`` returns the parsed value or raises ValueError;
+    ``final`` is True on the last tier that will be tried. Returns
+    (value, model_id); without ``validate`` the value is the response text.
+    """
+    policy = policy_for(task)
+    tiers = tiers_for(task)
+    for i, tier in enumerate(tiers):
+        model_id = TIER_MODELS[tier]
+        final = (i == len(tiers) - 1
+                 or (deadline is not None and not deadline.has(policy.escalate_min_ms)))
+        # The wrapper may answer from the model's fallback when it is throttled
+        response, model_id = bedrock_invoke.invoke('converse', deadline, modelId=model_id, **request)
+        bedrock_usage.log_response(task, model_id, response)
+        text = bedrock_usage.response_text(response)
+        if validate is None:
+            return text, model_id
+        try:
+            return validate(text, final), model_id
+        except ValueError as e:
+            if final:
+                raise
+            print(f"Escalating {task} from {tier}: {e}")
+
+
+def clean_translation(text, source_text):
+    """
+    Validator for plain translations: strips wrapping quotes and rejects
+    empty output or output that is clearly more than a translation.
+    """
+    translation = text.strip().strip('"\'“”‘’').strip()
+    if not translation:
+        raise ValueError("Empty translation")
+    if '\n' in translation and '\n' not in source_text.strip():
+        raise ValueError("Translation has extra lines")
+    if len(translation) > max(40, 4 * len(source_text)):
+        raise ValueError("Translation is much longer than its source")
+    return translation
@@ -0,0 +1,134 @@
+# multipart.py
+# Bytes-level multipart/form-data parser shared by the upload handlers.
+# The request body is decoded to bytes exactly once; parts are handed out as
+# memoryview slices of that buffer, so no further copies are made until a
+# caller explicitly asks for bytes.
+import base64
+import re
+from collections import namedtuple
+
+Part = namedtuple('Part', ['name', 'filename', 'content_type', 'data'])
+
+_BOUNDARY_RE = re.compile(r'boundary=("?)([^";]+)\1', re.IGNORECASE)
+_PARAM_RE = re.compile(r'(\w+)="([^"]*)"')
+
+
+def get_header(headers, name, default=''):
+    """Case-insensitive header lookup (API Gateway keeps the client's casing)"""
+    if not headers:
+        return default
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == lowered:
+                return candidate
+        return default
+    return value
+
+
+def get_content_type(event):
+    return get_header(event.get('headers') or {}, 'Content-Type')
+
+
+def is_multipart(event):
+    return 'multipart/form-data' in get_content_type(event).lower()
+
+
+def body_bytes(event) -> bytes:
+    """Return the raw request body as bytes, decoding base64 if needed"""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded', False):
+        return base64.b64decode(body)
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    return body.encode('utf-8')
+
+
+def get_boundary(content_type: str) -> bytes:
+    match = _BOUNDARY_RE.search(content_type or '')
+    if not match:
+        raise ValueError("Missing multipart boundary")
+    return match.group(2).strip().encode('latin-1')
+
+
+def _parse_part_headers(raw: memoryview):
+    name = filename = None
+    content_type = ''
+    for line in bytes(raw).decode('utf-8', 'replace').split('\r\n'):
+        key, _, value = line.partition(':')
+        key = key.strip().lower()
+        if key == 'content-disposition':
+            params = dict(_PARAM_RE.findall(value))
+            name = params.get('name')
+            filename = params.get('filename')
+        elif key == 'content-type':
+            content_type = value.strip()
+    return name, filename, content_type
+
+
+def parse(body: bytes, content_type: str) -> dict:
+    """
+    Parse a multipart/form-data body into {field name: Part}.
+    Part.data is a memoryview into ``body``.
+    """
+    boundary = get_boundary(content_type)
+    delimiter = b'--' + boundary
+    separator = b'\r\n' + delimiter
+    view = memoryview(body)
+    parts = {}
+
+    pos = body.find(delimiter)
+    if pos == -1:
+        return parts
+    pos += len(delimiter)
+
+    while True:
+        # A closing delimiter is followed by "--"
+        if body[pos:pos + 2] == b'--':
+            break
+        if body[pos:pos + 2] == b'\r\n':
+            pos += 2
+
+        header_end = body.find(b'\r\n\r\n', pos)
+        if header_end == -1:
+            break
+        data_start = header_end + 4
+
+        next_delimiter = body.find(separator, data_start)
+        if next_delimiter == -1:
+            # Tolerate a missing closing delimiter
+            data_end = len(body)
+        else:
+            data_end = next_delimiter
+
+        name, filename, part_type = _parse_part_headers(view[pos:header_end])
+        if name is not None and name not in parts:
+            parts[name] = Part(name, filename, part_type, view[data_start:data_end])
+
+        if next_delimiter == -1:
+            break
+        pos = next_delimiter + len(separator)
+
+    return parts
+
+
+def parse_event(event) -> dict:
+    """Parse the multipart body of an API Gateway proxy event"""
+    return parse(body_bytes(event), get_content_type(event))
+
+
+def field_text(parts: dict, name: str, default=None):
+    """Return a text form field decoded as UTF-8"""
+    part = parts.get(name)
+    if part is None:
+        return default
+    return bytes(part.data).decode('utf-8').strip()
+
+
+def first_file(parts: dict, content_prefix: str = ''):
+    """Return the first uploaded file part, or one whose content type matches the prefix"""
+    for part in parts.values():
+        if part.filename is not None or (content_prefix and part.content_type.startswith(content_prefix)):
+            return part
+    return None
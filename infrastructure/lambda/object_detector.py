@@ -1,52 +1,44 @@
 import json
-import boto3
 import base64
 import os
 from datetime import datetime
-import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 
-import language_config as langcfg
+import aws_clients
+import bedrock_invoke
+import deadlines
+import language_config
+import label_dictionary
+import llm_json
+import model_router
+import multipart
 
-rekognition = boto3.client('rekognition')
-bedrock = boto3.client('bedrock-runtime')
-s3 = boto3.client('s3')
+rekognition = aws_clients.lazy_client('rekognition')
+s3 = aws_clients.lazy_client('s3')
 
 BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
 
+# Bounded fan-out for labels the batched translation did not return
+TRANSLATION_FALLBACK_WORKERS = 4
+# Translation is optional; below these budgets (ms) labels keep their English names
+TRANSLATION_MIN_MS = 4000
+TRANSLATION_FALLBACK_MIN_MS = 3000
+
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
-        body = json.loads(event['body'])
-        user_id = body['userId']
-        
-        langcfg.refresh_language_globals(user_id)
-        target_name = langcfg.GLOBAL_TARGET_LANGUAGE_NAME  # e.g., "Malay"
-        native_name = langcfg.GLOBAL_NATIVE_LANGUAGE_NAME  # if you need it
-
-        # Get content type
-        headers = event.get('headers', {})
-        content_type = headers.get('content-type') or headers.get('Content-Type', '')
-        
         # Handle multipart form data
-        if 'multipart/form-data' in content_type:
-            body = event.get('body', '')
-            is_base64 = event.get('isBase64Encoded', False)
+        if multipart.is_multipart(event):
+            parts = multipart.parse_event(event)
+            user_id = multipart.field_text(parts, 'userId')
+            if not user_id:
+                raise Exception("Missing userId in multipart data")
             
-            if is_base64:
-                body = base64.b64decode(body).decode('utf-8')
-            
-            # Extract image from multipart data
-            image_data = extract_image_from_multipart(body, content_type)
-            
-            if not image_data:
+            image_part = multipart.first_file(parts, 'image/')
+            if image_part is None or not image_part.data:
                 raise Exception("No image found in multipart data")
-            
-            # Process with Rekognition directly
-            response = rekognition.detect_labels(
-                Image={'Bytes': image_data},
-                MaxLabels=10,
-                MinConfidence=70
-            )
+            image_data = bytes(image_part.data)
             
         else:
             # Handle JSON body with base64 image
@@ -55,6 +47,7 @@ def handler(event, context):
             except:
                 raise Exception("Invalid JSON body")
             
+            user_id = body['userId']
             if 'image' not in body:
                 raise Exception("No image data provided in request")
             
@@ -63,23 +56,30 @@ def handler(event, context):
                 image_data = base64.b64decode(body['image'])
             except:
                 raise Exception("Invalid base64 image data")
-            
-            # Process with Rekognition
-            response = rekognition.detect_labels(
-                Image={'Bytes': image_data},
-                MaxLabels=10,
-                MinConfidence=70
-            )
+        
+        ctx = language_config.get_language_context(user_id, deadline)
+        target_name = ctx.target_language_name  # e.g., "Malay"
+        
+        # Process with Rekognition
+        response = deadline.client('rekognition').detect_labels(
+            Image={'Bytes': image_data},
+            MaxLabels=10,
+            MinConfidence=70
+        )
         
         # Process detected objects
         detected_objects = []
+        labels = response['Labels']
         
-        for label in response['Labels']:
+        # Translate all labels in a single Bedrock round trip
+        translations = translate_labels_with_bedrock(
+            [label['Name'] for label in labels], target_name, deadline
+        )
+        
+        for label in labels:
             object_name = label['Name']
             confidence = label['Confidence'] / 100.0
-            
-            # Translate using Bedrock
-            translated_name = translate_with_bedrock(object_name, target_name)
+            translated_name = translations.get(object_name, object_name)
             
             detected_objects.append({
                 'name': object_name,
@@ -102,6 +102,8 @@ def handler(event, context):
             })
         }
         
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
@@ -118,68 +120,96 @@ def handler(event, context):
             })
         }
 
-def extract_image_from_multipart(body, content_type):
-    """Extract image data from multipart form data"""
+def translate_labels_with_bedrock(labels, target_language, deadline=None):
+    """Translate a list of labels in one request, returning {label: translation}"""
+    labels = list(dict.fromkeys(labels))
+    if not labels:
+        return {}
+    
+    # Answer from the precomputed taxonomy dictionary first
+    translations = {}
+    for label in labels:
+        known = label_dictionary.lookup(label, target_language)
+        if known:
+            translations[label] = known
+    
+    pending = [label for label in labels if label not in translations]
+    if not pending:
+        return translations
+    if deadline is not None and not deadline.has(TRANSLATION_MIN_MS):
+        print(f"Skipping translation of {len(pending)} labels: {deadline.remaining_ms()} ms left")
+        return translations
+    
     try:
-        # Get boundary from content type
-        boundary_match = re.search(r'boundary=([^;\s]+)', content_type)
-        if not boundary_match:
-            return None
-        
-        boundary = boundary_match.group(1)
-        
-        # Split by boundary
-        parts = body.split(f'--{boundary}')
-        
-        for part in parts:
-            if 'Content-Type: image/' in part or 'filename=' in part:
-                # Find the start of binary data (after double CRLF)
-                data_start = part.find('\r\n\r\n')
-                if data_start == -1:
-                    data_start = part.find('\n\n')
-                
-                if data_start != -1:
-                    # Extract binary data
-                    image_data = part[data_start + 4:].rstrip('\r\n-')
-                    
-                    # If it's base64 encoded, decode it
-                    try:
-                        return base64.b64decode(image_data)
-                    except:
-                        # If not base64, return as bytes
-                        return image_data.encode('latin-1')
+        prompt = (
+            f"Translate each of these object names to {target_language}: {json.dumps(pending)}\n"
+            "Return ONLY a JSON object mapping each original name to its translation, "
+            "no explanation."
+        )
         
-        return None
+        parsed, _ = model_router.converse(
+            'label_translation',
+            validate=lambda text, final: _parse_label_translations(text, pending),
+            deadline=deadline,
+            messages=[{
+                'role': 'user',
+                'content': [{'text': prompt}]
+            }],
+            inferenceConfig={'maxTokens': 64 + 32 * len(pending)}
+        )
+        for label in pending:
+            value = parsed.get(label)
+            if isinstance(value, str) and value.strip():
+                translations[label] = value.strip()
+    except bedrock_invoke.BedrockUnavailable as e:
+        # Per-label calls would be throttled too; keep dictionary answers and English names
+        print(f"Skipping label translation: {e}")
+        return translations
     except Exception as e:
-        print(f"Error extracting image: {e}")
-        return None
+        print(f"Batch translation error: {e}")
+    
+    # Fall back per label for anything the batch did not cover
+    missing = [label for label in labels if label not in translations]
+    if missing and (deadline is None or deadline.has(TRANSLATION_FALLBACK_MIN_MS)):
+        with ThreadPoolExecutor(max_workers=min(TRANSLATION_FALLBACK_WORKERS, len(missing))) as pool:
+            results = pool.map(lambda label: _translate_label_safely(label, target_language, deadline), missing)
+            translations.update(zip(missing, results))
+    
+    return translations
+
+def _parse_label_translations(text, labels):
+    """Validator for a batch translation: a JSON object covering most of the labels"""
+    parsed = llm_json.extract_json(text, '{')
+    if not isinstance(parsed, dict):
+        raise llm_json.LLMJSONError("Expected a JSON object of translations")
+    covered = sum(1 for label in labels if isinstance(parsed.get(label), str) and parsed[label].strip())
+    if covered * 2 < len(labels):
+        raise llm_json.LLMJSONError(f"Only {covered} of {len(labels)} labels translated")
+    return parsed
 
-def translate_with_bedrock(text, target_language):
+def _translate_label_safely(label, target_language, deadline=None):
+    try:
+        return translate_with_bedrock(label, target_language, deadline)
+    except Exception as e:
+        print(f"Label translation error for {label}: {e}")
+        return label
+
+def translate_with_bedrock(text, target_language, deadline=None):
     try:
         prompt = f"Translate '{text}' to {target_language}. Return only the translation, no explanation."
         
-        response = bedrock.converse(
-            modelId='amazon.nova-pro-v1:0',
+        translation, _ = model_router.converse(
+            'word_translation',
+            validate=lambda output, final: model_router.clean_translation(output, text),
+            deadline=deadline,
             messages=[{
                 'role': 'user',
                 'content': [{'text': prompt}]
-            }]
+            }],
+            inferenceConfig={'maxTokens': 64}
         )
-        
-        translation = response['output']['message']['content'][0]['text'].strip()
         return translation
         
     except Exception as e:
         print(f"Translation error: {e}")
-        # Multi-language fallback using global config
-        global_target = LANGUAGE_CONFIG['GLOBAL_TARGET_LANGUAGE_NAME']
-        is_malay = global_target == get_language_name(LANGUAGE_CONFIG['GLOBAL_TARGET_LANGUAGE'])
-        translations = {
-            global_target: {'Person': 'Orang' if is_malay else 'Persona', 'Phone': 'Telefon' if is_malay else 'Teléfono', 'Book': 'Buku' if is_malay else 'Libro'},
-            'Fallback': {'Person': 'Person', 'Phone': 'Phone', 'Book': 'Book'},
-            'Korean': {'Person': '사람', 'Phone': '전화기', 'Book': '책'},
-            'Chinese': {'Person': '人', 'Phone': '电话', 'Book': '书'},
-            'French': {'Person': 'Personne', 'Phone': 'Téléphone', 'Book': 'Livre'}
-        }
-        lang_dict = translations.get(target_language, translations[global_target])
-        return lang_dict.get(text, text)
\ No newline at end of file
+        return label_dictionary.lookup(text, target_language) or text
@@ -0,0 +1,59 @@
+# pagination.py
+# Opaque cursors for paginated DynamoDB reads. A cursor is the query's
+# LastEvaluatedKey, JSON-encoded and URL-safe base64'd so clients can pass
+# it back verbatim without depending on the table's key schema. Decoding
+# checks the key still belongs to the partition being read, so a cursor
+# can't be used to page through another user's items.
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps({k: _plain(v) for k, v in last_evaluated_key.items()},
+                         separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, partition=None):
+    """
+    The ExclusiveStartKey for ``cursor``, or None if there is no cursor.
+    ``partition`` is a (name, value) pair the key must match.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')),
+                         parse_float=Decimal, parse_int=Decimal)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(key, dict) or not key:
+        raise InvalidCursor('Invalid cursor')
+    if partition is not None and key.get(partition[0]) != partition[1]:
+        raise InvalidCursor('Cursor does not belong to this request')
+    return key
+
+
+def parse_limit(value, default, maximum):
+    """Page size from a query string value, clamped to 1..maximum"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
@@ -0,0 +1,231 @@
+# pronunciation_scoring.py
+# Word-level pronunciation scoring: aligns the words Transcribe recognized
+# (with their confidences and timings) against the phrase the learner was
+# asked to say, then scores each word and each grapheme-based phoneme group.
+# The edit-distance recurrences are vectorized with NumPy so a typical
+# utterance scores in well under a millisecond per word.
+import re
+import unicodedata
+
+try:
+    import numpy as np
+except ImportError:  # NumPy ships in a layer; scoring is skipped without it
+    np = None
+    print("NumPy is not available (is the NumPy layer attached?); pronunciation scoring is disabled")
+
+# Multi-letter spellings that represent a single sound (Malay and English)
+DIGRAPHS = {'ng': 'nasal', 'ny': 'nasal', 'sy': 'fricative', 'kh': 'fricative',
+            'gh': 'fricative', 'sh': 'fricative', 'th': 'fricative', 'ch': 'affricate'}
+LETTER_GROUPS = {}
+for _letters, _group in (('aeiou', 'vowel'), ('mn', 'nasal'), ('pbtdkgcq', 'plosive'),
+                         ('fvszhx', 'fricative'), ('j', 'affricate'), ('lrwy', 'liquid_glide')):
+    for _letter in _letters:
+        LETTER_GROUPS[_letter] = _group
+
+CORRECT_THRESHOLD = 0.85
+WEAK_GROUP_THRESHOLD = 0.7
+
+_TOKEN_RE = re.compile(r"[^\W_]+(?:['-][^\W_]+)*")
+
+
+def available():
+    return np is not None
+
+
+def normalize_word(word):
+    """Lower-case and strip diacritics and punctuation"""
+    folded = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(ch for ch in folded if not unicodedata.combining(ch) and ch.isalnum())
+
+
+def tokenize(text):
+    tokens = (normalize_word(token) for token in _TOKEN_RE.findall(text or ''))
+    return [token for token in tokens if token]
+
+
+def _edit_rows(a, b_matrix, b_lengths):
+    """
+    Levenshtein distance of ``a`` against every padded row of ``b_matrix`` at once.
+    Yields each DP row so callers can keep them for a backtrace.
+    """
+    count, width = b_matrix.shape
+    positions = np.arange(width + 1)
+    row = np.broadcast_to(positions, (count, width + 1)).astype(np.int32)
+    yield row
+    for i, ch in enumerate(a, 1):
+        substitution = row[:, :-1] + (b_matrix != ord(ch))
+        deletion = row[:, 1:] + 1
+        best = np.empty_like(row)
+        best[:, 0] = i
+        best[:, 1:] = np.minimum(substitution, deletion)
+        # Insertions chain along the row: D[j] = min_k(best[k] + j - k)
+        row = np.minimum.accumulate(best - positions, axis=1) + positions
+        yield row
+
+
+def _encode(words):
+    width = max((len(w) for w in words), default=0)
+    matrix = np.full((len(words), width), -1, dtype=np.int32)
+    for i, word in enumerate(words):
+        if word:
+            matrix[i, :len(word)] = [ord(ch) for ch in word]
+    return matrix, np.array([len(w) for w in words], dtype=np.int32)
+
+
+def word_distance_matrix(expected, recognized):
+    """Normalized (0..1) character edit distance for every expected/recognized word pair"""
+    costs = np.ones((len(expected), len(recognized)), dtype=np.float32)
+    if not expected or not recognized:
+        return costs
+    matrix, lengths = _encode(recognized)
+    for i, word in enumerate(expected):
+        for row in _edit_rows(word, matrix, lengths):
+            pass
+        distances = row[np.arange(len(recognized)), lengths]
+        costs[i] = distances / np.maximum(lengths, len(word))
+    return costs
+
+
+def align_words(costs):
+    """
+    Align expected (rows) against recognized (columns) words with gap cost 1.
+    Returns a list of (expected index or None, recognized index or None).
+    """
+    m, n = costs.shape
+    positions = np.arange(n + 1, dtype=np.float32)
+    dp = np.zeros((m + 1, n + 1), dtype=np.float32)
+    dp[0] = positions
+    for i in range(1, m + 1):
+        best = np.empty(n + 1, dtype=np.float32)
+        best[0] = i
+        best[1:] = np.minimum(dp[i - 1, :-1] + costs[i - 1], dp[i - 1, 1:] + 1)
+        dp[i] = np.minimum.accumulate(best - positions) + positions
+
+    pairs = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and np.isclose(dp[i, j], dp[i - 1, j - 1] + costs[i - 1, j - 1]):
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and np.isclose(dp[i, j], dp[i - 1, j] + 1):
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1))
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+def _matched_characters(expected, recognized):
+    """Boolean mask over ``expected`` marking characters reproduced in ``recognized``"""
+    matched = [False] * len(expected)
+    if not recognized:
+        return matched
+    matrix, lengths = _encode([recognized])
+    rows = [row[0] for row in _edit_rows(expected, matrix, lengths)]
+    i, j = len(expected), len(recognized)
+    while i > 0 and j > 0:
+        same = expected[i - 1] == recognized[j - 1]
+        if rows[i][j] == rows[i - 1][j - 1] + (not same):
+            matched[i - 1] = same
+            i, j = i - 1, j - 1
+        elif rows[i][j] == rows[i - 1][j] + 1:
+            i -= 1
+        else:
+            j -= 1
+    return matched
+
+
+def phoneme_units(word):
+    """Split a word into (start, end, group) units, treating digraphs as one sound"""
+    units = []
+    i = 0
+    while i < len(word):
+        pair = word[i:i + 2]
+        if pair in DIGRAPHS:
+            units.append((i, i + 2, DIGRAPHS[pair]))
+            i += 2
+        else:
+            units.append((i, i + 1, LETTER_GROUPS.get(word[i], 'other')))
+            i += 1
+    return units
+
+
+def score_utterance(expected_text, words):
+    """
+    Score a transcribed utterance against the expected phrase.
+    ``words`` are Transcribe pronunciation items: {content, confidence, startTime, endTime}.
+    """
+    expected = tokenize(expected_text)
+    recognized = [normalize_word(w.get('content', '')) for w in words]
+
+    costs = word_distance_matrix(expected, recognized)
+    alignment = align_words(costs)
+
+    word_results = []
+    group_totals = {}
+    for e, r in alignment:
+        if e is None:
+            word = words[r]
+            word_results.append({
+                'expected': None,
+                'recognized': word.get('content', ''),
+                'status': 'inserted',
+                'score': 0.0,
+                'confidence': float(word.get('confidence', 0)),
+                'startTime': float(word.get('startTime', 0)),
+                'endTime': float(word.get('endTime', 0))
+            })
+            continue
+
+        target = expected[e]
+        if r is None:
+            confidence = 0.0
+            similarity = 0.0
+            matched = [False] * len(target)
+            entry = {'expected': target, 'recognized': None, 'status': 'missing'}
+        else:
+            word = words[r]
+            confidence = float(word.get('confidence', 0))
+            similarity = 1.0 - float(costs[e, r])
+            matched = _matched_characters(target, recognized[r])
+            entry = {
+                'expected': target,
+                'recognized': word.get('content', ''),
+                'status': 'correct' if similarity == 1.0 else 'substituted',
+                'startTime': float(word.get('startTime', 0)),
+                'endTime': float(word.get('endTime', 0))
+            }
+
+        entry['score'] = round(similarity * confidence, 3)
+        entry['confidence'] = confidence
+        if entry['status'] == 'correct' and entry['score'] < CORRECT_THRESHOLD:
+            entry['status'] = 'unclear'
+        word_results.append(entry)
+
+        for start, end, group in phoneme_units(target):
+            hit = confidence if all(matched[start:end]) else 0.0
+            total, count = group_totals.get(group, (0.0, 0))
+            group_totals[group] = (total + hit, count + 1)
+
+    expected_scores = [w['score'] for w in word_results if w['expected'] is not None]
+    insertions = sum(1 for w in word_results if w['status'] == 'inserted')
+    overall = sum(expected_scores) / (len(expected_scores) + insertions) if expected_scores else 0.0
+    groups = {group: round(total / count, 3) for group, (total, count) in group_totals.items()}
+
+    return {
+        'overallScore': round(overall, 3),
+        'accuracy': round(sum(1 for w in word_results if w['status'] == 'correct') / len(expected), 3) if expected else 0.0,
+        'completeness': round(sum(1 for w in word_results if w['expected'] and w['recognized']) / len(expected), 3) if expected else 0.0,
+        'words': word_results,
+        'phonemeGroups': groups,
+        'weakGroups': sorted((g for g, s in groups.items() if s < WEAK_GROUP_THRESHOLD), key=groups.get),
+        'weakWords': [w['expected'] for w in word_results
+                      if w['expected'] is not None and w['status'] != 'correct']
+    }
+
+
+def score_batch(utterances):
+    """Score many (expected_text, words) pairs, e.g. when re-running analytics"""
+    return [score_utterance(expected_text, words) for expected_text, words in utterances]
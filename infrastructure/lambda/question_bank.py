@@ -0,0 +1,163 @@
+# question_bank.py
+# Persistent bank of validated quiz questions. Each language pair and level
+# is one partition (bankKey) and each question is stored under
+# "<skill>#<content hash>", so regenerating the same question is a no-op.
+# A quiz is drawn with one begins_with query per skill and stratified
+# random sampling across them; only strata that are too thin are topped
+# up by the model.
+import hashlib
+import json
+import os
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+
+QUESTION_BANK_TABLE = os.environ.get('QUESTION_BANK_TABLE', 'language-learning-question-bank')
+
+SKILLS = ('vocabulary', 'grammar', 'usage')
+# Levels a bank can exist for; anything else would start a junk partition
+LEVELS = ('absolute-beginner', 'beginner', 'elementary', 'intermediate', 'upper-intermediate', 'advanced')
+DONT_KNOW = "I don't know"
+# Generate at least this many questions when a stratum needs topping up so
+# the bank grows in useful steps rather than one question at a time
+TOP_UP_BATCH = 5
+# Upper bound on bank items read per quiz; sampling only needs a pool.
+# Each skill gets an equal share, so one large stratum can't crowd out the
+# ones that sort after it, and each share is read from a random point in
+# the stratum so every question in a large bank can be drawn.
+MAX_POOL_ITEMS = 1000
+MAX_STRATUM_ITEMS = MAX_POOL_ITEMS // len(SKILLS)
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+
+def normalize_level(level):
+    """A level from LEVELS, accepting any case and spaces ('Upper Intermediate')"""
+    normalized = '-'.join(str(level or '').lower().split())
+    if normalized not in LEVELS:
+        raise ValueError(f"level must be one of: {', '.join(LEVELS)}")
+    return normalized
+
+
+def bank_key(target_language, native_language, level):
+    return '|'.join([
+        (target_language or '').lower(),
+        (native_language or '').lower(),
+        normalize_level(level),
+    ])
+
+
+def _normalize(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(text).lower()).split())
+
+
+def content_hash(question):
+    """Hash of the question text and its answer options, ignoring order and punctuation"""
+    options = sorted(_normalize(o) for o in question.get('options', []) if o != DONT_KNOW)
+    payload = json.dumps([_normalize(question.get('question', '')), options], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def normalize_skill(skill):
+    skill = (skill or '').lower()
+    return skill if skill in SKILLS else 'usage'
+
+
+def stratum_quotas(question_count):
+    """Split a quiz evenly across skills, spreading the remainder at random"""
+    base, extra = divmod(question_count, len(SKILLS))
+    bonus = set(random.sample(SKILLS, extra))
+    return {skill: base + (skill in bonus) for skill in SKILLS}
+
+
+def _load_stratum(table, key, skill):
+    """
+    Up to MAX_STRATUM_ITEMS of a skill's questions, read onward from a random
+    point and wrapping around to the start. Question ids end in a content
+    hash, so a random hash is a uniformly random place to start.
+    """
+    prefix = f"{skill}#"
+    start_id = prefix + ''.join(random.choices('0123456789abcdef', k=32))
+    names = ('questionId', 'skill', 'question', 'options', 'correct')
+    common = {
+        'ProjectionExpression': ', '.join(f"#{name}" for name in names),
+        'ExpressionAttributeNames': {f"#{name}": name for name in names},
+    }
+    passes = (
+        # From the random start to the end of the stratum...
+        {'KeyConditionExpression': Key('bankKey').eq(key) & Key('questionId').begins_with(prefix),
+         'ExclusiveStartKey': {'bankKey': key, 'questionId': start_id}},
+        # ...then from its beginning up to the start
+        {'KeyConditionExpression': Key('bankKey').eq(key) & Key('questionId').between(prefix, start_id)},
+    )
+    items = []
+    for kwargs in passes:
+        kwargs.update(common)
+        while len(items) < MAX_STRATUM_ITEMS:
+            response = table.query(Limit=MAX_STRATUM_ITEMS - len(items), **kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return items
+
+
+def load_pool(key, deadline=None):
+    """Banked questions for a language pair and level, grouped by skill"""
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(QUESTION_BANK_TABLE)
+    with ThreadPoolExecutor(max_workers=len(SKILLS)) as executor:
+        futures = {skill: executor.submit(_load_stratum, table, key, skill) for skill in SKILLS}
+    return {skill: future.result() for skill, future in futures.items()}
+
+
+def store(key, questions):
+    """Add validated questions to the bank, skipping duplicates by content hash"""
+    now = datetime.utcnow().isoformat()
+    items = {}
+    for question in questions:
+        skill = normalize_skill(question.get('skill'))
+        question_id = f"{skill}#{content_hash(question)}"
+        items[question_id] = {
+            'bankKey': key,
+            'questionId': question_id,
+            'skill': skill,
+            'question': question['question'],
+            'options': question['options'],
+            'correct': int(question['correct']),
+            'createdAt': now
+        }
+
+    # Identical content maps to the same key, so rewriting a duplicate is harmless
+    with dynamodb.Table(QUESTION_BANK_TABLE).batch_writer() as batch:
+        for item in items.values():
+            batch.put_item(Item=item)
+    return list(items.values())
+
+
+def sample(pool, quotas):
+    """
+    Stratified random sample. Returns (questions, shortfall per skill); a
+    shortfall is left when a stratum has fewer questions than its quota.
+    """
+    picked = []
+    shortfall = {}
+    for skill, quota in quotas.items():
+        stratum = pool.get(skill, [])
+        picked.extend(random.sample(stratum, min(quota, len(stratum))))
+        if len(stratum) < quota:
+            shortfall[skill] = quota - len(stratum)
+    return picked, shortfall
+
+
+def public_question(item):
+    return {
+        'question': item['question'],
+        'options': list(item['options']),
+        'correct': int(item['correct']),
+        'skill': item.get('skill')
+    }
@@ -1,29 +1,44 @@
 import json
-import boto3
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-)
+import language_config
 
-bedrock = boto3.client('bedrock-runtime')
+import bedrock_invoke
+import bedrock_usage
+import deadlines
+import llm_json
+import model_router
+import question_bank
+
+QUIZ_MAX_TOKENS = 4000
+
+DEFAULT_QUESTION_COUNT = 10
+MAX_QUESTION_COUNT = 30
+
+# Budgets (ms) below which generation or a JSON repair call is skipped
+QUIZ_TOP_UP_MIN_MS = 6000
+QUIZ_REPAIR_MIN_MS = 5000
 
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
         body = json.loads(event['body'])
         user_id = body['userId'] 
+        try:
+            question_count = parse_question_count(body.get('questionCount'))
+            level = question_bank.normalize_level(body.get('difficulty', body.get('level', 'beginner')))
+        except ValueError as e:
+            return _bad_request(str(e))
 
-        refresh_language_globals(user_id)
+        ctx = language_config.get_language_context(user_id, deadline)
 
-        target_language=GLOBAL_TARGET_LANGUAGE_NAME
-        native_language=GLOBAL_NATIVE_LANGUAGE_NAME
-        level = body.get('difficulty', body.get('level', 'beginner'))
-        question_count = body.get('questionCount', 10)
-        
-        # Generate quiz using Bedrock
-        quiz = generate_bedrock_quiz(target_language, native_language, level, question_count)
+        target_language = ctx.target_language_name
+        native_language = ctx.native_language_name
+
+        # Serve from the question bank, generating only for thin strata
+        quiz, method = build_quiz(target_language, native_language, level, question_count, deadline)
         
         return {
             'statusCode': 200,
@@ -35,10 +50,15 @@ def handler(event, context):
                 'questions': quiz,
                 'level': level,
                 'generatedAt': datetime.utcnow().isoformat(),
-                'method': 'amazon_nova_pro'
+                'method': method
             })
         }
         
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
+    except bedrock_invoke.BedrockUnavailable as e:
+        print(f"Bedrock unavailable: {e}")
+        return bedrock_invoke.busy_response()
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
@@ -50,45 +70,161 @@ def handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def generate_bedrock_quiz(target_language, native_language, level, question_count):
-    prompt = f"""Generate exactly {question_count} multiple choice questions to assess {level} level {target_language} proficiency for a {native_language} speaker.
+def _bad_request(message):
+    return {
+        'statusCode': 400,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message})
+    }
+
+def parse_question_count(value):
+    """questionCount from the request, clamped to 1..MAX_QUESTION_COUNT"""
+    if value in (None, ''):
+        return DEFAULT_QUESTION_COUNT
+    if isinstance(value, bool):
+        raise ValueError('questionCount must be an integer')
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('questionCount must be an integer')
+    return max(1, min(count, MAX_QUESTION_COUNT))
+
+def build_quiz(target_language, native_language, level, question_count, deadline=None):
+    """
+    Draw a stratified sample from the bank and top up any skill that has
+    fewer banked questions than its share of the quiz (when there's time).
+    Returns (questions, method); method names the sources, e.g.
+    'question_bank+amazon.nova-lite-v1:0'.
+    """
+    key = question_bank.bank_key(target_language, native_language, level)
+    try:
+        pool = question_bank.load_pool(key, deadline)
+    except deadlines.TIMEOUT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"Error loading question bank: {e}")
+        pool = {skill: [] for skill in question_bank.SKILLS}
+
+    quotas = question_bank.stratum_quotas(question_count)
+    picked, shortfall = question_bank.sample(pool, quotas)
+    sources = ['question_bank'] if picked else []
+    busy = None
+
+    if shortfall and deadline is not None and not deadline.has(QUIZ_TOP_UP_MIN_MS):
+        print(f"Skipping question top-up: {deadline.remaining_ms()} ms left")
+    elif shortfall:
+        with ThreadPoolExecutor(max_workers=len(shortfall)) as executor:
+            futures = {
+                skill: executor.submit(
+                    top_up_stratum, key, target_language, native_language, level,
+                    skill, max(missing, question_bank.TOP_UP_BATCH), deadline
+                )
+                for skill, missing in shortfall.items()
+            }
+        for skill, future in futures.items():
+            try:
+                fresh, model_id = future.result()
+            except bedrock_invoke.BedrockUnavailable as e:
+                # Serve what the bank has; other strata can cover the gap
+                busy = e
+                print(f"Skipping {skill} top-up: {e}")
+                continue
+            except Exception as e:
+                print(f"Error topping up {skill} questions: {e}")
+                continue
+            # Anything new that wasn't already banked can fill the gap
+            seen = {item['questionId'] for item in pool.get(skill, [])}
+            fresh = [item for item in fresh if item['questionId'] not in seen]
+            picked.extend(fresh[:shortfall[skill]])
+            pool.setdefault(skill, []).extend(fresh)
+            if fresh and model_id not in sources:
+                sources.append(model_id)
+
+    if len(picked) < question_count:
+        # A stratum couldn't be filled; borrow from the others
+        used = {item['questionId'] for item in picked}
+        spare = [item for stratum in pool.values() for item in stratum if item['questionId'] not in used]
+        picked.extend(random.sample(spare, min(question_count - len(picked), len(spare))))
+
+    if not picked:
+        if busy is not None:
+            raise busy
+        if deadline is not None and not deadline.has(QUIZ_TOP_UP_MIN_MS):
+            raise deadlines.DeadlineExceeded('quiz generation')
+        raise Exception("No quiz questions available")
+
+    if not sources:
+        # Only borrowed from other strata of the bank
+        sources.append('question_bank')
+    random.shuffle(picked)
+    return [question_bank.public_question(item) for item in picked[:question_count]], '+'.join(sources)
+
+def top_up_stratum(key, target_language, native_language, level, skill, count, deadline=None):
+    """Generate and bank questions for one skill; returns (stored items, model id)"""
+    questions, model_id = generate_bedrock_quiz(target_language, native_language, level, count, skill, deadline)
+    for question in questions:
+        question['skill'] = skill
+    return question_bank.store(key, questions), model_id
+
+QUIZ_SYSTEM_PROMPT = """You write multiple choice questions that assess a learner's proficiency in a target language.
+Each request gives the target language, the learner's native language, their level, the number of questions and the skill to test.
 
 Requirements:
 - Each question must have exactly 4 options
 - Include "I don't know" as the 4th option for every question
-- Questions should test vocabulary, grammar, and practical usage
-- Difficulty appropriate for {level} level
+- The correct answer must be one of the first 3 options
+- Difficulty appropriate for the learner's level
+- Vocabulary questions test word meanings and translations
+- Grammar questions test word order, affixes, tenses and particles
+- Usage questions test choosing the right phrase for a situation
 
 Return ONLY a JSON array with this exact format:
 [
-  {{
+  {
     "question": "Question text here",
     "options": ["Correct answer", "Wrong answer 1", "Wrong answer 2", "I don't know"],
     "correct": 0
-  }}
-]
+  }
+]"""
+
+def quiz_max_tokens(question_count):
+    """Output cap sized to the request: a question is roughly 100 tokens"""
+    return min(QUIZ_MAX_TOKENS, 200 + 120 * question_count)
+
+def generate_bedrock_quiz(target_language, native_language, level, question_count, skill=None, deadline=None):
+    skills = skill or 'vocabulary, grammar, and practical usage'
+    prompt = f"""Target language: {target_language}
+Native language: {native_language}
+Level: {level}
+Questions: {question_count}
+Skill: {skills}"""
 
-Generate {question_count} questions for {level} {target_language}:"""
+    max_tokens = quiz_max_tokens(question_count)
 
-    response = bedrock.converse(
-        modelId='amazon.nova-pro-v1:0',
-        messages=[{
-            'role': 'user',
-            'content': [{'text': prompt}]
-        }]
+    def parse(text, final):
+        # Repair locally where possible. Before the last tier a failure escalates
+        # to a bigger model; on it, ask for a targeted fix if there's time left.
+        repair = None
+        if final and (deadline is None or deadline.has(QUIZ_REPAIR_MIN_MS)):
+            repair = lambda text, problem: _repair_json(text, problem, max_tokens, deadline)
+        return llm_json.parse_with_repair(
+            text.strip(), '[',
+            lambda questions: llm_json.validate_quiz(questions, question_count),
+            repair=repair
+        )
+
+    quiz_data, model_id = model_router.converse(
+        'quiz',
+        validate=parse,
+        deadline=deadline,
+        system=bedrock_usage.cached_system(QUIZ_SYSTEM_PROMPT),
+        messages=bedrock_usage.user_message(prompt),
+        inferenceConfig={'maxTokens': max_tokens}
     )
     
-    quiz_content = response['output']['message']['content'][0]['text'].strip()
-    
-    # Clean JSON response
-    if quiz_content.startswith('```json'):
-        quiz_content = quiz_content[7:]
-    if quiz_content.endswith('```'):
-        quiz_content = quiz_content[:-3]
-    quiz_content = quiz_content.strip()
-    
-    quiz_data = json.loads(quiz_content)
-    
     # Ensure "I don't know" option
     for question in quiz_data:
         if len(question['options']) < 4:
@@ -96,4 +232,13 @@ Generate {question_count} questions for {level} {target_language}:"""
         elif question['options'][3] != "I don't know":
             question['options'][3] = "I don't know"
     
-    return quiz_data[:question_count]
+    return quiz_data[:question_count], model_id
+
+def _repair_json(text, problem, max_tokens, deadline=None):
+    repaired, _ = model_router.converse(
+        'json_repair',
+        deadline=deadline,
+        messages=bedrock_usage.user_message(llm_json.repair_prompt(text, problem)),
+        inferenceConfig={'maxTokens': max_tokens}
+    )
+    return repaired
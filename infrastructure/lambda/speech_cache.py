@@ -0,0 +1,161 @@
+# speech_cache.py
+# Content-addressed cache for Polly output in the media bucket. Objects live
+# under tts/ keyed by a hash of everything that affects the audio, so the same
+# word in the same voice is synthesized once; the bucket's lifecycle rule
+# expires entries 30 days after they were written. A hit doesn't change an
+# object's age, so hits on older objects copy them in place: any key handed
+# out has weeks left before it expires. A bounded in-memory index remembers
+# keys known to exist (until they're due a refresh) so warm containers can
+# skip the S3 HEAD.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+import aws_clients
+
+BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
+KEY_PREFIX = 'tts/'
+INDEX_SIZE = int(os.environ.get('SPEECH_CACHE_INDEX_SIZE', '4096'))
+URL_EXPIRES_SECONDS = int(os.environ.get('SPEECH_URL_EXPIRES_SECONDS', '3600'))
+# Well inside the tts/ lifecycle expiry (30 days)
+REFRESH_AFTER_SECONDS = 7 * 24 * 3600
+
+CONTENT_TYPES = {'mp3': 'audio/mpeg', 'ogg_vorbis': 'audio/ogg', 'pcm': 'audio/pcm'}
+EXTENSIONS = {'mp3': 'mp3', 'ogg_vorbis': 'ogg', 'pcm': 'pcm'}
+
+POLLY_VOICES = {
+    'en': 'Joanna',
+    'ms': 'Aditi',  # Using Hindi voice as closest to Malay
+    'es': 'Conchita',
+    'fr': 'Celine',
+    'de': 'Marlene',
+    'it': 'Carla',
+    'zh': 'Zhiyu',
+    'ja': 'Mizuki',
+    'ko': 'Seoyeon'
+}
+
+polly = aws_clients.lazy_client('polly')
+s3 = aws_clients.lazy_client('s3')
+
+_index = OrderedDict()
+_lock = threading.Lock()
+
+
+def voice_for(language):
+    return POLLY_VOICES.get(language, 'Joanna')
+
+
+def cache_key(text, voice_id, language_code, output_format='mp3'):
+    digest = hashlib.sha256(json.dumps(
+        [text, voice_id, language_code, output_format], ensure_ascii=False
+    ).encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}{digest[:2]}/{digest}.{EXTENSIONS.get(output_format, output_format)}"
+
+
+def _remember(key, written_at=None):
+    """Note that ``key`` exists; ``written_at`` (epoch seconds) is when it was last written"""
+    fresh_until = (written_at or time.time()) + REFRESH_AFTER_SECONDS
+    with _lock:
+        _index[key] = fresh_until
+        _index.move_to_end(key)
+        while len(_index) > INDEX_SIZE:
+            _index.popitem(last=False)
+
+
+def _known(key):
+    with _lock:
+        if _index.get(key, 0) > time.time():
+            _index.move_to_end(key)
+            return True
+        return False
+
+
+def _refresh(key, content_type, client=None):
+    """Rewrite ``key`` onto itself so the lifecycle rule counts its age from now"""
+    (client or s3).copy_object(
+        Bucket=BUCKET_NAME,
+        Key=key,
+        CopySource={'Bucket': BUCKET_NAME, 'Key': key},
+        MetadataDirective='REPLACE',
+        ContentType=content_type or 'application/octet-stream'
+    )
+
+
+def exists(key, client=None):
+    """True if ``key`` is cached; old objects are refreshed so they outlive the URLs handed out"""
+    if _known(key):
+        return True
+    try:
+        head = (client or s3).head_object(Bucket=BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+    written_at = head['LastModified'].timestamp()
+    if written_at + REFRESH_AFTER_SECONDS <= time.time():
+        _refresh(key, head.get('ContentType'), client)
+        written_at = None
+    _remember(key, written_at)
+    return True
+
+
+def presigned_url(key):
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': key},
+        ExpiresIn=URL_EXPIRES_SECONDS
+    )
+
+
+def store(key, audio, output_format='mp3', client=None):
+    (client or s3).put_object(
+        Bucket=BUCKET_NAME,
+        Key=key,
+        Body=audio,
+        ContentType=CONTENT_TYPES.get(output_format, 'application/octet-stream')
+    )
+    _remember(key)
+
+
+def synthesize(text, voice_id, language_code, output_format='mp3', include_audio=False, deadline=None):
+    """
+    Return {'key', 'url', 'cached', 'audio'} for the requested speech.
+    Polly is only called on a cache miss. 'audio' holds the bytes when
+    include_audio is set (read back from S3 on a hit), otherwise None.
+    With a ``deadline``, Polly and S3 calls time out within the request budget.
+    """
+    key = cache_key(text, voice_id, language_code, output_format)
+    polly_client = deadline.client('polly') if deadline else polly
+    s3_client = deadline.client('s3') if deadline else s3
+
+    if exists(key, s3_client):
+        audio = None
+        if include_audio:
+            audio = s3_client.get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read()
+        return {'key': key, 'url': presigned_url(key), 'cached': True, 'audio': audio}
+
+    response = polly_client.synthesize_speech(
+        Text=text,
+        OutputFormat=output_format,
+        VoiceId=voice_id,
+        LanguageCode=language_code
+    )
+
+    if not include_audio:
+        # Pipe Polly's stream straight into S3 in chunks instead of buffering the clip
+        s3_client.upload_fileobj(
+            response['AudioStream'], BUCKET_NAME, key,
+            ExtraArgs={'ContentType': CONTENT_TYPES.get(output_format, 'application/octet-stream')}
+        )
+        _remember(key)
+        return {'key': key, 'url': presigned_url(key), 'cached': False, 'audio': None}
+
+    audio = response['AudioStream'].read()
+    store(key, audio, output_format, s3_client)
+    return {'key': key, 'url': presigned_url(key), 'cached': False, 'audio': audio}
@@ -0,0 +1,80 @@
+# srs.py
+# SM-2 spaced-repetition scheduling for vocabulary. Each graded answer
+# updates a word's ease factor, interval and streak of correct recalls and
+# moves its nextReviewAt; the DueIndex GSI on (userId, nextReviewAt) then
+# answers "what's due now" with one range query. Pure functions only; the
+# table reads and writes live in vocabulary_manager.
+from datetime import timedelta
+from decimal import Decimal
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 365
+# A forgotten word comes back within the same practice session
+LAPSE_MINUTES = 10
+# Answers below this quality (0-5) count as forgotten
+PASS_QUALITY = 3
+# Quality assumed for a plain right/wrong answer
+CORRECT_QUALITY = 4
+INCORRECT_QUALITY = 1
+
+# Interval (days) at or above which a word reaches each mastery level
+MASTERY_THRESHOLDS = ((60, 5), (21, 4), (6, 3), (1, 2))
+
+# Attributes a review reads and writes
+STATE_FIELDS = ('easeFactor', 'intervalDays', 'repetitions', 'reviewCount', 'correctCount')
+
+
+def quality_from(review):
+    """Grade 0-5 from a review's 'quality', or from a boolean 'correct'"""
+    if review.get('quality') is not None:
+        quality = int(review['quality'])
+        if not 0 <= quality <= 5:
+            raise ValueError('quality must be between 0 and 5')
+        return quality
+    if isinstance(review.get('correct'), bool):
+        return CORRECT_QUALITY if review['correct'] else INCORRECT_QUALITY
+    raise ValueError('Each review needs a quality (0-5) or correct (true/false)')
+
+
+def mastery_level(interval_days):
+    for threshold, level in MASTERY_THRESHOLDS:
+        if interval_days >= threshold:
+            return level
+    return 1
+
+
+def schedule(state, quality, now):
+    """
+    The attributes to write after answering a word with ``quality``, given
+    its current ``state`` (missing attributes take their defaults).
+    """
+    ease = float(state.get('easeFactor', DEFAULT_EASE))
+    interval = float(state.get('intervalDays', 0))
+    repetitions = int(state.get('repetitions', 0))
+
+    if quality >= PASS_QUALITY:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = min(MAX_INTERVAL_DAYS, round(interval * ease))
+        repetitions += 1
+        next_review = now + timedelta(days=interval)
+    else:
+        repetitions = 0
+        interval = 0
+        next_review = now + timedelta(minutes=LAPSE_MINUTES)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return {
+        'easeFactor': Decimal(str(round(ease, 3))),
+        'intervalDays': int(interval),
+        'repetitions': repetitions,
+        'reviewCount': int(state.get('reviewCount', 0)) + 1,
+        'correctCount': int(state.get('correctCount', 0)) + (quality >= PASS_QUALITY),
+        'masteryLevel': mastery_level(interval),
+        'lastReviewedAt': now.isoformat(),
+        'nextReviewAt': next_review.isoformat()
+    }
@@ -0,0 +1,128 @@
+# streaming_json.py
+# Incremental parser for a JSON object arriving in chunks from a streaming
+# model response. It reports each top-level member as soon as its value is
+# complete, and each element of a top-level array as soon as that element is
+# complete, without re-scanning text it has already seen. Any preamble before
+# the first '{' (e.g. a ```json fence) is ignored.
+import json
+
+
+class SectionStream:
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.item_start = None
+        self.item_index = 0
+        self.sections = {}
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of text and return the events it completed:
+          ('section', key, value)       a top-level member closed
+          ('item', key, index, value)   an element of a top-level array closed
+        """
+        self.buffer += chunk
+        events = []
+        buffer = self.buffer
+
+        for i in range(self.pos, len(buffer)):
+            if self.done:
+                break
+            c = buffer[i]
+
+            if not self.stack:
+                if c == '{':
+                    self.stack.append('{')
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.key = self._load(self.key_start, i + 1)
+                        self.key_start = None
+                continue
+
+            depth = len(self.stack)
+            in_array = depth == 2 and self.stack[1] == '['
+
+            if c == '"':
+                self.in_string = True
+                if depth == 1:
+                    if self.key is None:
+                        self.key_start = i
+                    elif self.value_start is None:
+                        self.value_start = i
+                elif in_array and self.item_start is None:
+                    self.item_start = i
+            elif c in '{[':
+                if depth == 1 and self.value_start is None:
+                    self.value_start = i
+                elif in_array and self.item_start is None:
+                    self.item_start = i
+                self.stack.append(c)
+            elif c in '}]':
+                # A primitive value is terminated by its container closing
+                if in_array and self.item_start is not None:
+                    self._emit_item(events, i)
+                elif depth == 1 and self.value_start is not None:
+                    self._emit_section(events, i)
+                self.stack.pop()
+                depth = len(self.stack)
+                if depth == 0:
+                    self.done = True
+                elif depth == 1 and self.value_start is not None:
+                    self._emit_section(events, i + 1)
+                elif depth == 2 and self.stack[1] == '[' and self.item_start is not None:
+                    self._emit_item(events, i + 1)
+            elif c == ',':
+                if depth == 1 and self.value_start is not None:
+                    self._emit_section(events, i)
+                elif in_array and self.item_start is not None:
+                    self._emit_item(events, i)
+            elif not c.isspace() and c != ':':
+                # Start of a number, true/false/null
+                if depth == 1 and self.key is not None and self.value_start is None:
+                    self.value_start = i
+                elif in_array and self.item_start is None:
+                    self.item_start = i
+
+        self.pos = len(buffer)
+        return events
+
+    def _load(self, start, end):
+        return json.loads(self.buffer[start:end].strip())
+
+    def _emit_section(self, events, end):
+        try:
+            value = self._load(self.value_start, end)
+        except ValueError as e:
+            print(f"Skipping malformed section {self.key!r}: {e}")
+        else:
+            self.sections[self.key] = value
+            events.append(('section', self.key, value))
+        self.key = None
+        self.value_start = None
+        self.item_start = None
+        self.item_index = 0
+
+    def _emit_item(self, events, end):
+        try:
+            value = self._load(self.item_start, end)
+        except ValueError as e:
+            print(f"Skipping malformed item in {self.key!r}: {e}")
+        else:
+            events.append(('item', self.key, self.item_index, value))
+            self.item_index += 1
+        self.item_start = None
@@ -0,0 +1,21 @@
+import transcription_jobs
+
+def handler(event, context):
+    """EventBridge target for 'Transcribe Job State Change' events"""
+    detail = event.get('detail', {})
+    job_id = detail.get('TranscriptionJobName')
+    status = detail.get('TranscriptionJobStatus')
+
+    if not job_id or status not in ('COMPLETED', 'FAILED'):
+        print(f"Ignoring event: {detail}")
+        return
+
+    failure_reason = None
+    if status == 'FAILED':
+        try:
+            job = transcription_jobs.transcribe.get_transcription_job(TranscriptionJobName=job_id)
+            failure_reason = job['TranscriptionJob'].get('FailureReason')
+        except Exception as e:
+            print(f"Error reading failed job {job_id}: {e}")
+
+    transcription_jobs.record_completion(job_id, status, failure_reason)
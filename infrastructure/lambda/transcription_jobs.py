@@ -0,0 +1,227 @@
+# transcription_jobs.py
+# Asynchronous Amazon Transcribe jobs: the API handlers submit a job and return
+# its id immediately, transcription_events.handler records the outcome when
+# Transcribe publishes the job state change, and clients poll for the result.
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import aws_clients
+
+BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
+TABLE_NAME = os.environ.get('TRANSCRIPTIONS_TABLE', 'language-learning-transcriptions')
+RESULT_TTL_SECONDS = int(os.environ.get('TRANSCRIPTION_RESULT_TTL_SECONDS', str(24 * 3600)))
+
+transcribe = aws_clients.lazy_client('transcribe')
+s3 = aws_clients.lazy_client('s3')
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+
+class JobQuotaExceeded(Exception):
+    """Raised when Transcribe rejects a job because the concurrent job quota is used up"""
+
+
+def wants_async(event, parts=None):
+    """True when the client asked for submit/poll mode (?mode=async or a mode form field)"""
+    query = event.get('queryStringParameters') or {}
+    mode = query.get('mode')
+    if mode is None and parts is not None:
+        part = parts.get('mode')
+        mode = bytes(part.data).decode('utf-8').strip() if part is not None else None
+    return (mode or '').lower() == 'async'
+
+
+def summarize_transcript(transcript_data):
+    """Return (transcription, average confidence, word items) from a Transcribe result document"""
+    results = transcript_data['results']
+    transcription = results['transcripts'][0]['transcript'] if results.get('transcripts') else ''
+
+    words = []
+    for item in results.get('items', []):
+        if item.get('type') != 'pronunciation':
+            continue
+        alternative = item.get('alternatives', [{}])[0]
+        words.append({
+            'content': alternative.get('content', ''),
+            'confidence': float(alternative.get('confidence', 0)),
+            'startTime': float(item.get('start_time', 0)),
+            'endTime': float(item.get('end_time', 0))
+        })
+
+    confidence = sum(w['confidence'] for w in words) / len(words) if words else 0.0
+    return transcription, confidence, words
+
+
+def submit(audio_data, language_code, kind, user_id, media_format='wav', content_type='audio/wav',
+           metadata=None, deadline=None):
+    """
+    Upload audio and start a Transcribe job without waiting for it.
+    Returns the job id; the result is recorded by transcription_events.handler.
+    The job is recorded as PENDING before it is started, so a state change
+    event can never arrive for a job the table doesn't know about.
+    """
+    s3_client = deadline.client('s3') if deadline else s3
+    transcribe_client = deadline.client('transcribe') if deadline else transcribe
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(TABLE_NAME)
+
+    # The async- prefix is what the EventBridge rule matches on
+    job_id = f"async-{kind}-{uuid.uuid4()}"
+    audio_key = f"transcription-jobs/{job_id}.{media_format}"
+
+    s3_client.put_object(
+        Bucket=BUCKET_NAME,
+        Key=audio_key,
+        Body=audio_data,
+        ContentType=content_type
+    )
+
+    item = {
+        'jobId': job_id,
+        'userId': user_id,
+        'kind': kind,
+        'status': 'PENDING',
+        'languageCode': language_code,
+        'audioKey': audio_key,
+        'submittedAt': datetime.utcnow().isoformat(),
+        'expiresAt': int(time.time()) + RESULT_TTL_SECONDS
+    }
+    if metadata:
+        item['metadata'] = metadata
+    table.put_item(Item=item)
+
+    try:
+        transcribe_client.start_transcription_job(
+            TranscriptionJobName=job_id,
+            Media={'MediaFileUri': f"s3://{BUCKET_NAME}/{audio_key}"},
+            MediaFormat=media_format,
+            LanguageCode=language_code,
+            OutputBucketName=BUCKET_NAME,
+            OutputKey=f"transcripts/{job_id}.json"
+        )
+    except transcribe_client.exceptions.LimitExceededException as e:
+        # The job was never created, so nothing else will clean up after it
+        table.delete_item(Key={'jobId': job_id})
+        s3_client.delete_object(Bucket=BUCKET_NAME, Key=audio_key)
+        raise JobQuotaExceeded(str(e))
+    except Exception as e:
+        # The job may still have started (e.g. on a timeout); keep the record
+        # so its state change event can overwrite this and clean up. The audio
+        # goes now: a job that did start without it fails, which it is marked
+        # as already, and the bucket's expiry rule covers a failed delete.
+        _mark_failed(table, job_id, f"Could not start transcription: {e}")
+        try:
+            s3_client.delete_object(Bucket=BUCKET_NAME, Key=audio_key)
+        except Exception as cleanup_error:
+            print(f"Cleanup error for {audio_key}: {cleanup_error}")
+        raise
+
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #status = :inProgress',
+            ConditionExpression='#status = :pending',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':inProgress': 'IN_PROGRESS', ':pending': 'PENDING'}
+        )
+    except Exception as e:
+        # The job already finished, or the update failed; either way pollers
+        # keep waiting until the record is COMPLETED or FAILED
+        print(f"Could not mark job {job_id} in progress: {e}")
+    return job_id
+
+
+def _mark_failed(table, job_id, reason):
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #status = :failed, failureReason = :reason, completedAt = :completedAt',
+            ConditionExpression='#status = :pending',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':failed': 'FAILED',
+                ':pending': 'PENDING',
+                ':reason': reason,
+                ':completedAt': datetime.utcnow().isoformat()
+            }
+        )
+    except Exception as e:
+        print(f"Could not mark job {job_id} failed: {e}")
+
+
+def get(job_id):
+    """Return the stored job record, or None if unknown or expired"""
+    item = dynamodb.Table(TABLE_NAME).get_item(Key={'jobId': job_id}).get('Item')
+    if item and int(item.get('expiresAt', 0)) <= time.time():
+        return None
+    return item
+
+
+def record_completion(job_id, status, failure_reason=None):
+    """Store the outcome of a finished job and clean up its audio"""
+    table = dynamodb.Table(TABLE_NAME)
+    job = table.get_item(Key={'jobId': job_id}).get('Item')
+    if not job:
+        print(f"Ignoring state change for unknown job {job_id}")
+        return
+
+    update_expression = 'SET #status = :status, completedAt = :completedAt'
+    values = {
+        ':status': status,
+        ':completedAt': datetime.utcnow().isoformat()
+    }
+
+    transcript_key = f"transcripts/{job_id}.json"
+    if status == 'COMPLETED':
+        obj = s3.get_object(Bucket=BUCKET_NAME, Key=transcript_key)
+        transcription, confidence, words = summarize_transcript(json.loads(obj['Body'].read()))
+        update_expression += ', transcription = :transcription, confidence = :confidence, words = :words'
+        values[':transcription'] = transcription
+        # DynamoDB stores numbers as Decimal
+        values[':confidence'] = Decimal(str(confidence))
+        values[':words'] = json.loads(json.dumps(words), parse_float=Decimal)
+    else:
+        update_expression += ', failureReason = :failureReason'
+        values[':failureReason'] = failure_reason or 'Unknown error'
+
+    table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=update_expression,
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues=values
+    )
+
+    # Clean up
+    for key in (job.get('audioKey'), transcript_key):
+        try:
+            if key:
+                s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+        except Exception as e:
+            print(f"Cleanup error for {key}: {e}")
+    try:
+        transcribe.delete_transcription_job(TranscriptionJobName=job_id)
+    except Exception as e:
+        print(f"Cleanup error for job {job_id}: {e}")
+
+
+def public_view(job):
+    """Client-facing fields of a job record, with Decimals converted to floats"""
+    view = {
+        'jobId': job['jobId'],
+        'status': job['status'],
+        'language': job.get('languageCode'),
+        'submittedAt': job.get('submittedAt')
+    }
+    if job['status'] == 'COMPLETED':
+        view['transcription'] = job.get('transcription', '')
+        view['confidence'] = float(job.get('confidence', 0))
+        view['words'] = [
+            {k: (float(v) if isinstance(v, Decimal) else v) for k, v in word.items()}
+            for word in job.get('words', [])
+        ]
+        view['completedAt'] = job.get('completedAt')
+    elif job['status'] == 'FAILED':
+        view['error'] = job.get('failureReason')
+    return view
@@ -0,0 +1,117 @@
+# translation_cache.py
+# Two-tier cache for translations: a bounded in-process LRU that lives for the
+# lifetime of a warm container, backed by a shared DynamoDB table with TTL.
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import aws_clients
+
+TABLE_NAME = os.environ.get('TRANSLATION_CACHE_TABLE', 'language-learning-translation-cache')
+LOCAL_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '2048'))
+TTL_SECONDS = int(os.environ.get('TRANSLATION_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+METRICS_NAMESPACE = 'LanguageLearning/TranslationCache'
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, lower-cased, collapsed whitespace"""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(text.lower().split())
+
+
+def cache_key(text: str, source_lang: str, target_lang: str) -> str:
+    raw = f"{source_lang}|{target_lang}|{normalize_text(text)}".lower()
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _local_get(key):
+    with _lock:
+        value = _local.get(key)
+        if value is not None:
+            _local.move_to_end(key)
+        return value
+
+
+def _local_put(key, value):
+    with _lock:
+        _local[key] = value
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _emit_metric(name: str, tier: str) -> None:
+    """Log a CloudWatch Embedded Metric Format record"""
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Tier']],
+                'Metrics': [{'Name': name, 'Unit': 'Count'}]
+            }]
+        },
+        'Tier': tier,
+        name: 1
+    }))
+
+
+def get(text: str, source_lang: str, target_lang: str):
+    """Return a cached translation or None"""
+    key = cache_key(text, source_lang, target_lang)
+
+    value = _local_get(key)
+    if value is not None:
+        _emit_metric('CacheHit', 'memory')
+        return value
+
+    try:
+        item = dynamodb.Table(TABLE_NAME).get_item(
+            Key={'cacheKey': key},
+            # 'translation' is a DynamoDB reserved word
+            ProjectionExpression='#t, #e',
+            ExpressionAttributeNames={'#t': 'translation', '#e': 'expiresAt'}
+        ).get('Item')
+    except Exception as e:
+        print(f"Translation cache read error: {e}")
+        item = None
+
+    # DynamoDB TTL deletion is lazy, so expired rows may still be returned
+    if item and int(item.get('expiresAt', 0)) > time.time():
+        value = item['translation']
+        _local_put(key, value)
+        _emit_metric('CacheHit', 'dynamodb')
+        return value
+
+    _emit_metric('CacheMiss', 'all')
+    return None
+
+
+def put(text: str, source_lang: str, target_lang: str, translation: str) -> None:
+    key = cache_key(text, source_lang, target_lang)
+    _local_put(key, translation)
+    try:
+        dynamodb.Table(TABLE_NAME).put_item(Item={
+            'cacheKey': key,
+            'sourceText': normalize_text(text),
+            'sourceLanguage': source_lang,
+            'targetLanguage': target_lang,
+            'translation': translation,
+            'expiresAt': int(time.time()) + TTL_SECONDS
+        })
+    except Exception as e:
+        print(f"Translation cache write error: {e}")
+
+
+def clear_local() -> None:
+    with _lock:
+        _local.clear()
@@ -1,26 +1,29 @@
 import json
-import boto3
 from datetime import datetime
 
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-)
+import language_config
 
-bedrock = boto3.client('bedrock-runtime')
+import bedrock_invoke
+import deadlines
+import model_router
+import translation_cache
+
+# Translations are about as long as their source; two tokens per character is generous
+TRANSLATION_MAX_TOKENS_PER_CHAR = 2
+TRANSLATION_MAX_TOKENS = 2000
 
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
         body = json.loads(event['body'])
         user_id = body['userId']
         text = body['text']
-        refresh_language_globals(user_id)
-        source_lang = GLOBAL_NATIVE_LANGUAGE_NAME
-        target_lang = GLOBAL_TARGET_LANGUAGE_NAME
+        ctx = language_config.get_language_context(user_id, deadline)
+        source_lang = ctx.native_language_name
+        target_lang = ctx.target_language_name
         
         # Use Bedrock Nova model for translation
-        translated_text = translate_with_bedrock(text, source_lang, target_lang)
+        translated_text, method = translate_with_bedrock(text, source_lang, target_lang, deadline)
         
         return {
             'statusCode': 200,
@@ -33,10 +36,15 @@ def handler(event, context):
                 'nativeLanguage': source_lang,
                 'targetLanguage': target_lang,
                 'timestamp': datetime.utcnow().isoformat(),
-                'method': 'amazon_nova_pro'
+                'method': method
             })
         }
         
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
+    except bedrock_invoke.BedrockUnavailable as e:
+        print(f"Bedrock unavailable: {e}")
+        return bedrock_invoke.busy_response()
     except Exception as e:
         print(f"Translation error: {str(e)}")
         return {
@@ -48,19 +56,26 @@ def handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def translate_with_bedrock(text, source_lang, target_lang):
-    # Convert language names to proper format if needed
+def translate_with_bedrock(text, source_lang, target_lang, deadline=None):
+    """Returns (translation, method): the model id that answered, or 'translation_cache'"""
+    cached = translation_cache.get(text, source_lang, target_lang)
+    if cached is not None:
+        return cached, 'translation_cache'
     
     prompt = f"Translate '{text}' from {source_lang} to {target_lang}. Return only the translation."
 
-    response = bedrock.converse(
-        modelId='amazon.nova-pro-v1:0',
+    # Single words go to the smallest model; sentences start one tier up
+    task = 'word_translation' if len(text.split()) == 1 else 'sentence_translation'
+    translation, model_id = model_router.converse(
+        task,
+        validate=lambda output, final: model_router.clean_translation(output, text),
+        deadline=deadline,
         messages=[{
             'role': 'user',
             'content': [{'text': prompt}]
-        }]
+        }],
+        inferenceConfig={'maxTokens': min(TRANSLATION_MAX_TOKENS, 64 + TRANSLATION_MAX_TOKENS_PER_CHAR * len(text))}
     )
+    translation_cache.put(text, source_lang, target_lang, translation)
     
-    translation = response['output']['message']['content'][0]['text'].strip()
-    
-    return translation
+    return translation, model_id
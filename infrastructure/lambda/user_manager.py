@@ -1,15 +1,12 @@
 import json
-import boto3
+import aws_clients
 import os
 from datetime import datetime
 from decimal import Decimal
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-)
+import language_config
+from language_config import LANGUAGE_CONFIG
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.lazy_resource('dynamodb')
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -98,8 +95,9 @@ def create_or_update_user(event):
                 'userId': user_id,
                 'email': body.get('email', ''),
                 'name': body.get('name', ''),
-                'targetLanguage': body.get('targetLanguage', GLOBAL_TARGET_LANGUAGE_NAME),
-                'nativeLanguage': body.get('nativeLanguage', GLOBAL_NATIVE_LANGUAGE_NAME),
+                # Stored as codes, whatever alias the client sent
+                'targetLanguage': language_config.normalize_lang(body.get('targetLanguage', LANGUAGE_CONFIG['GLOBAL_TARGET_LANGUAGE'])),
+                'nativeLanguage': language_config.normalize_lang(body.get('nativeLanguage', LANGUAGE_CONFIG['GLOBAL_NATIVE_LANGUAGE'])),
                 'initialProficiency': body.get('initialProficiency', 'absolute-beginner'),
                 'finalLevel': body.get('finalLevel', 'Beginner'),
                 'assessmentScore': body.get('assessmentScore', 0),
@@ -132,6 +130,7 @@ def create_or_update_user(event):
             }
             
             users_table.put_item(Item=user_item)
+            language_config.clear_language_cache(user_id)
             
             return {
                 'statusCode': 201,
@@ -170,11 +169,24 @@ def create_or_update_user(event):
                 update_expression += ', onboardingCompleted = :onboardingCompleted'
                 expression_values[':onboardingCompleted'] = body['onboardingCompleted']
             
+            # Language preferences
+            for field in ('targetLanguage', 'nativeLanguage'):
+                if field in body:
+                    update_expression += f', {field} = :{field}'
+                    expression_values[f':{field}'] = language_config.normalize_lang(body[field])
+            
+            if 'proficiency' in body:
+                update_expression += ', proficiency = :proficiency'
+                expression_values[':proficiency'] = body['proficiency']
+            
             users_table.update_item(
                 Key={'userId': user_id},
                 UpdateExpression=update_expression,
                 ExpressionAttributeValues=expression_values
             )
+            # This container's cached context is now stale; other containers
+            # pick up the change when theirs expires
+            language_config.clear_language_cache(user_id)
             
             return {
                 'statusCode': 200,
@@ -188,6 +200,16 @@ def create_or_update_user(event):
                 }, cls=DecimalEncoder)
             }
             
+    except ValueError as e:
+        # Malformed JSON or an unsupported language
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(e)})
+        }
     except Exception as e:
         return {
             'statusCode': 500,
@@ -207,51 +229,3 @@ def get_current_user_id():
     # Example placeholder: read from environment for CLI/scripts
     import os
     return os.getenv("CURRENT_USER_ID")
-
-# ---- Language preferences API ----
-def get_user_language_prefs(user_id):
-    """
-    Return a tuple (native_language, target_language) for the given user_id.
-    Replace the internals to hit your real DB/ORM.
-    Expected keys on the user record: 'native_language', 'target_language'.
-    """
-    # ----- BEGIN: replace with your real implementation -----
-    user = None
-    try:
-        if 'get_user' in globals():
-            user = get_user(user_id)  # type: ignore[name-defined]
-    except Exception:
-        user = None
-    try:
-        if user is None and 'load_user' in globals():
-            user = load_user(user_id)  # type: ignore[name-defined]
-    except Exception:
-        user = None
-    try:
-        if user is None and 'User' in globals():
-            user = User.get(user_id)  # type: ignore[name-defined]
-    except Exception:
-        user = None
-
-    if not user:
-        # As a last resort, read env for demo: CURRENT_NATIVE_LANGUAGE, CURRENT_TARGET_LANGUAGE
-        import os
-        n = os.getenv("CURRENT_NATIVE_LANGUAGE")
-        t = os.getenv("CURRENT_TARGET_LANGUAGE")
-        return (n, t)
-
-    native = None
-    target = None
-    try:
-        native = getattr(user, 'native_language', None)
-        target = getattr(user, 'target_language', None)
-    except Exception:
-        pass
-    if native is None or target is None:
-        try:
-            native = (user.get('native_language') if hasattr(user, 'get') else native) or native
-            target = (user.get('target_language') if hasattr(user, 'get') else target) or target
-        except Exception:
-            pass
-
-    return (native, target)
@@ -1,18 +1,56 @@
+import hashlib
 import json
-import boto3
-import uuid
+import os
+import string
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import aws_clients
+import deadlines
+import dynamo_batch
+import pagination
+import srs
+import vocabulary_search
+from botocore.exceptions import ClientError
 from datetime import datetime
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key
-from language_config import LANGUAGE_CONFIG
-from language_config import GLOBAL_NATIVE_LANGUAGE, GLOBAL_TARGET_LANGUAGE, refresh_language_globals
+import language_config
 
-GLOBAL_USER_ID = None
-GLOBAL_NATIVE_LANGUAGE = None
-GLOBAL_TARGET_LANGUAGE = None
-refresh_language_globals()
+VOCABULARY_TABLE = os.environ.get('VOCABULARY_TABLE', 'language-learning-vocabulary')
 
-dynamodb = boto3.resource('dynamodb')
+# Attributes a client may ask for, and the set list views need
+FIELDS = ('wordId', 'word', 'translation', 'context', 'targetLanguage', 'nativeLanguage',
+          'addedAt', 'lastEncounteredAt', 'encounterCount', 'masteryLevel', 'reviewCount',
+          'correctCount', 'easeFactor', 'intervalDays', 'repetitions', 'lastReviewedAt',
+          'nextReviewAt')
+LIST_FIELDS = ('wordId', 'word', 'translation', 'masteryLevel')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Cap for all=true so the response stays well inside Lambda's 6 MB payload limit
+MAX_ALL_ITEMS = 5000
+# Time another page read needs in all=true mode
+PAGE_MIN_MS = 1000
+
+# Words accepted in one bulk add (a lesson or a camera scene is far fewer)
+MAX_BULK_WORDS = 100
+# Per-word writes (encounter counters, reviews) run this many at a time
+WRITE_WORKERS = 8
+# Time one per-word write needs; words left when it runs out are skipped
+WORD_WRITE_MIN_MS = 500
+WORD_PUNCTUATION = string.punctuation + '¡¿«»“”‘’…'
+
+# Sparse GSI on (userId, nextReviewAt), projecting the list fields
+DUE_INDEX = 'DueIndex'
+DEFAULT_DUE_LIMIT = 20
+# Attempts at a review write that lost a race with another review of the same word
+MAX_REVIEW_ATTEMPTS = 3
+
+MAX_SEARCH_RESULTS = 50
+# Attributes the search index is built from
+INDEX_FIELDS = ('wordId', 'word', 'translation', 'targetLanguage', 'nativeLanguage')
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -21,13 +59,14 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(o)
 
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
         http_method = event['httpMethod']
         
         if http_method == 'GET':
-            return get_vocabulary(event)
+            return get_vocabulary(event, deadline)
         elif http_method == 'POST':
-            return add_vocabulary(event)
+            return add_vocabulary(event, deadline)
         else:
             return {
                 'statusCode': 405,
@@ -48,24 +87,145 @@ def handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def get_vocabulary(event):
+def _bad_request(message):
+    return {
+        'statusCode': 400,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message})
+    }
+
+def parse_fields(value):
+    """Attributes to return: a comma-separated subset of FIELDS, 'list' for LIST_FIELDS, or None for all"""
+    if not value:
+        return None
+    if value == 'list':
+        return LIST_FIELDS
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # The sort key identifies the word, so every projection carries it
+    return tuple(dict.fromkeys(['wordId'] + fields))
+
+def _query_kwargs(user_id, fields=None):
+    kwargs = {'KeyConditionExpression': Key('userId').eq(user_id)}
+    if fields:
+        # Names go through placeholders since some attributes clash with reserved words
+        names = {f"#f{i}": field for i, field in enumerate(fields)}
+        kwargs['ProjectionExpression'] = ', '.join(names)
+        kwargs['ExpressionAttributeNames'] = names
+    return kwargs
+
+def iter_vocabulary_pages(user_id, fields=None, page_size=DEFAULT_PAGE_SIZE, start_key=None, deadline=None):
+    """
+    Yield (items, last_evaluated_key) one query page at a time; the key is
+    None on the last page. Callers stop whenever they have enough.
+    """
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_TABLE)
+    kwargs = _query_kwargs(user_id, fields)
+    kwargs['Limit'] = page_size
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    while True:
+        response = table.query(**kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        yield response.get('Items', []), last_key
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+def count_vocabulary(user_id, deadline=None):
+    """Number of words in a user's bank, without transferring any items"""
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_TABLE)
+    kwargs = _query_kwargs(user_id)
+    kwargs['Select'] = 'COUNT'
+    total = 0
+    while True:
+        response = table.query(**kwargs)
+        total += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            return total
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def get_vocabulary(event, deadline=None):
+    """
+    GET /vocabulary?userId=...
+      limit   page size (default DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE)
+      cursor  nextCursor from the previous page
+      fields  comma-separated attributes, or 'list' for word/translation/masteryLevel
+      all     'true' to read every page server-side (up to MAX_ALL_ITEMS)
+      select  'count' to return only the number of words
+      due     'true' for words due for review now, most overdue first
+              (default limit DEFAULT_DUE_LIMIT; takes cursor too)
+      search  prefix of a word or translation, accent-insensitive; ranked
+              matches (default limit 10)
+    """
     try:
-        user_id = event['queryStringParameters']['userId']
-        vocabulary_table = dynamodb.Table('language-learning-vocabulary')
-        
-        response = vocabulary_table.query(
-            KeyConditionExpression=Key('userId').eq(user_id)
-        )
-        
+        params = event.get('queryStringParameters') or {}
+        user_id = params.get('userId')
+        if not user_id:
+            return _bad_request('userId is required')
+
+        if params.get('select') == 'count':
+            body = {'count': count_vocabulary(user_id, deadline)}
+        elif params.get('search') is not None:
+            try:
+                limit = pagination.parse_limit(params.get('limit'), vocabulary_search.DEFAULT_RESULTS, MAX_SEARCH_RESULTS)
+            except ValueError as e:
+                return _bad_request(str(e))
+            body = {'results': vocabulary_search.search(user_id, params['search'], limit, deadline)}
+        elif params.get('due') == 'true':
+            try:
+                start_key = pagination.decode_cursor(params.get('cursor'), ('userId', user_id))
+                limit = pagination.parse_limit(params.get('limit'), DEFAULT_DUE_LIMIT, MAX_PAGE_SIZE)
+            except ValueError as e:
+                return _bad_request(str(e))
+            items, last_key = due_words(user_id, limit, start_key, deadline)
+            body = {
+                'vocabulary': items,
+                'nextCursor': pagination.encode_cursor(last_key)
+            }
+        else:
+            try:
+                fields = parse_fields(params.get('fields'))
+                start_key = pagination.decode_cursor(params.get('cursor'), ('userId', user_id))
+                fetch_all = params.get('all') == 'true'
+                limit = pagination.parse_limit(
+                    params.get('limit'),
+                    MAX_PAGE_SIZE if fetch_all else DEFAULT_PAGE_SIZE,
+                    MAX_PAGE_SIZE
+                )
+            except ValueError as e:
+                return _bad_request(str(e))
+
+            items = []
+            last_key = None
+            for page, last_key in iter_vocabulary_pages(user_id, fields, limit, start_key, deadline):
+                items.extend(page)
+                if not fetch_all or len(items) >= MAX_ALL_ITEMS:
+                    break
+                # Hand back what we have and a cursor rather than run out of time
+                if deadline is not None and not deadline.has(PAGE_MIN_MS):
+                    break
+            body = {
+                'vocabulary': items,
+                'nextCursor': pagination.encode_cursor(last_key)
+            }
+
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'vocabulary': response['Items']}, cls=DecimalEncoder)
+            'body': json.dumps(body, cls=DecimalEncoder)
         }
-        
+
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
     except Exception as e:
         return {
             'statusCode': 500,
@@ -76,31 +236,324 @@ def get_vocabulary(event):
             'body': json.dumps({'error': str(e)})
         }
 
-def add_vocabulary(event):
+def due_words(user_id, limit, start_key=None, deadline=None):
+    """Up to ``limit`` words whose nextReviewAt has passed, with the key to continue from"""
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_TABLE)
+    kwargs = {
+        'IndexName': DUE_INDEX,
+        'KeyConditionExpression': Key('userId').eq(user_id) & Key('nextReviewAt').lte(datetime.utcnow().isoformat()),
+        'Limit': limit
+    }
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**kwargs)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def review_word(user_id, word_id, quality, now, deadline=None):
+    """
+    Apply one graded answer to a word's schedule. The write is conditional
+    on reviewCount being unchanged since the read, so two reviews of the
+    same word racing each other are applied one after the other rather
+    than one overwriting the other. Returns the new schedule, or None if
+    the word isn't in the bank.
+    """
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_TABLE)
+    key = {'userId': user_id, 'wordId': word_id}
+    names = {f"#{name}": name for name in srs.STATE_FIELDS}
+    for attempt in range(MAX_REVIEW_ATTEMPTS):
+        state = table.get_item(
+            Key=key,
+            ProjectionExpression=', '.join(names),
+            ExpressionAttributeNames=names,
+            ConsistentRead=True
+        ).get('Item')
+        if state is None:
+            return None
+        updates = srs.schedule(state, quality, now)
+        update_names = {f"#{name}": name for name in updates}
+        values = {f":{name}": value for name, value in updates.items()}
+        if 'reviewCount' in state:
+            condition = '#reviewCount = :seenReviewCount'
+            values[':seenReviewCount'] = state['reviewCount']
+        else:
+            condition = 'attribute_exists(#wordId) AND attribute_not_exists(#reviewCount)'
+            update_names['#wordId'] = 'wordId'
+        try:
+            table.update_item(
+                Key=key,
+                UpdateExpression='SET ' + ', '.join(f"#{name} = :{name}" for name in updates),
+                ConditionExpression=condition,
+                ExpressionAttributeNames=update_names,
+                ExpressionAttributeValues=values
+            )
+            return dict(updates, wordId=word_id)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            print(f"Review of {word_id} raced another update (attempt {attempt + 1})")
+    raise RuntimeError(f"Could not record review of {word_id}")
+
+def _review_words(user_id, graded, now, deadline=None):
+    """
+    Apply one word's reviews in order, stopping when time runs short.
+    Returns (schedules, missing, skipped) for the word.
+    """
+    scheduled, missing, skipped = [], [], []
+    for i, (word_id, quality) in enumerate(graded):
+        if deadline is not None and not deadline.has(WORD_WRITE_MIN_MS):
+            skipped.extend(word_id for word_id, _ in graded[i:])
+            break
+        result = review_word(user_id, word_id, quality, now, deadline)
+        if result is None:
+            missing.append(word_id)
+        else:
+            scheduled.append(result)
+    return scheduled, missing, skipped
+
+def review_vocabulary(user_id, reviews, deadline=None):
+    """
+    POST /vocabulary with {userId, reviews: [{wordId, quality | correct}, ...]}.
+    Different words are reviewed in parallel; repeat reviews of one word are
+    applied in order. Reviews not started before the deadline come back in
+    'skipped' so the client can resend them.
+    """
+    if not isinstance(reviews, list) or not reviews:
+        return _bad_request('reviews must be a non-empty list')
+    if len(reviews) > MAX_BULK_WORDS:
+        return _bad_request(f"At most {MAX_BULK_WORDS} reviews can be recorded at once")
+    try:
+        graded = [(str(review['wordId']), srs.quality_from(review)) for review in reviews]
+    except (KeyError, TypeError, ValueError) as e:
+        return _bad_request(f"Invalid review: {e}")
+
+    now = datetime.utcnow()
+    by_word = {}
+    for word_id, quality in graded:
+        by_word.setdefault(word_id, []).append((word_id, quality))
+
+    scheduled, missing, skipped, failed = [], [], [], []
+    with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(by_word))) as executor:
+        futures = {
+            word_id: executor.submit(_review_words, user_id, word_reviews, now, deadline)
+            for word_id, word_reviews in by_word.items()
+        }
+    for word_id, future in futures.items():
+        try:
+            word_scheduled, word_missing, word_skipped = future.result()
+        except Exception as e:
+            # A timed-out write may or may not have landed; report it rather than guess
+            print(f"Error reviewing {word_id}: {e}")
+            failed.append(word_id)
+            continue
+        scheduled.extend(word_scheduled)
+        missing.extend(word_missing)
+        skipped.extend(word_skipped)
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'reviewed': scheduled, 'missing': missing, 'skipped': skipped, 'failed': failed},
+                           cls=DecimalEncoder)
+    }
+
+def normalize_word(word):
+    """Canonical form of a word for identity: NFKC, case-folded, trimmed of punctuation, single-spaced"""
+    text = unicodedata.normalize('NFKC', str(word)).casefold()
+    return ' '.join(text.split()).strip(WORD_PUNCTUATION)
+
+def word_id(word, target_language, native_language):
+    """Deterministic id, so the same word in the same language pair always maps to one row"""
+    payload = '|'.join([target_language or '', native_language or '', normalize_word(word)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def _parse_words(body):
+    """The words to add, from either a single word body or a 'words' list"""
+    entries = body['words'] if 'words' in body else [body]
+    if not isinstance(entries, list) or not entries:
+        raise ValueError('words must be a non-empty list')
+    if len(entries) > MAX_BULK_WORDS:
+        raise ValueError(f"At most {MAX_BULK_WORDS} words can be added at once")
+    words = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError('Each word must be an object')
+        word = str(entry.get('word') or '').strip()
+        translation = str(entry.get('translation') or '').strip()
+        if not normalize_word(word) or not translation:
+            raise ValueError('Each word needs a word and a translation')
+        words.append({'word': word, 'translation': translation, 'context': entry.get('context') or ''})
+    return words
+
+def _new_word_item(user_id, ctx, entry, encounters, now):
+    return {
+        'userId': user_id,
+        'wordId': word_id(entry['word'], ctx.target_language, ctx.native_language),
+        'word': entry['word'],
+        'translation': entry['translation'],
+        'context': entry['context'],
+        'targetLanguage': ctx.target_language_name,
+        'nativeLanguage': ctx.native_language_name,
+        'addedAt': now,
+        'lastEncounteredAt': now,
+        'encounterCount': encounters,
+        'masteryLevel': 1,
+        'reviewCount': 0,
+        'correctCount': 0,
+        # New words are due straight away
+        'nextReviewAt': now
+    }
+
+def _count_encounter(user_id, ctx, entry, encounters, now, deadline=None):
+    """
+    Add a word, or count another encounter if it's already in the bank.
+    A single UpdateItem, so concurrent adds never duplicate.
+    """
+    item = _new_word_item(user_id, ctx, entry, encounters, now)
+    # First write wins for the word's own fields; progress and counters are left alone
+    keep = ['word', 'translation', 'context', 'targetLanguage', 'nativeLanguage', 'addedAt',
+            'masteryLevel', 'reviewCount', 'correctCount', 'nextReviewAt']
+    names = {f"#{name}": name for name in keep + ['lastEncounteredAt', 'encounterCount']}
+    values = {f":{name}": item[name] for name in keep}
+    values.update({':lastEncounteredAt': now, ':encounters': encounters})
+    assignments = [f"#{name} = if_not_exists(#{name}, :{name})" for name in keep]
+    assignments.append('#lastEncounteredAt = :lastEncounteredAt')
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_TABLE)
+    response = table.update_item(
+        Key={'userId': user_id, 'wordId': item['wordId']},
+        UpdateExpression=f"SET {', '.join(assignments)} ADD #encounterCount :encounters",
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW'
+    )
+    return response['Attributes']
+
+def upsert_word(user_id, ctx, entry, encounters=1, now=None, deadline=None):
+    """Add or re-encounter a single word, indexing it for search if it is new"""
+    now = now or datetime.utcnow().isoformat()
+    item = _count_encounter(user_id, ctx, entry, encounters, now, deadline)
+    # This call created the row only if the write-once fields are ours and no
+    # earlier encounters were counted; an encounter doesn't change the terms
+    if item.get('addedAt') == now and item.get('encounterCount') == encounters:
+        vocabulary_search.index_words([item], deadline)
+    return item
+
+def add_words(user_id, ctx, entries, deadline=None):
+    """
+    Bulk add. Words already in the bank get their encounter count bumped
+    with parallel UpdateItems; new words are written together with
+    BatchWriteItem and indexed for search in one batch. Returns the
+    resulting items in request order, one per distinct word, and how many
+    were new.
+    """
+    now = datetime.utcnow().isoformat()
+    # Repeats within one request collapse into a single row with more encounters
+    grouped = {}
+    for entry in entries:
+        key = word_id(entry['word'], ctx.target_language, ctx.native_language)
+        if key in grouped:
+            grouped[key][1] += 1
+        else:
+            grouped[key] = [entry, 1]
+
+    existing = {
+        item['wordId']
+        for item in dynamo_batch.batch_get(
+            VOCABULARY_TABLE,
+            [{'userId': user_id, 'wordId': key} for key in grouped],
+            projection=('wordId',),
+            deadline=deadline
+        )
+    }
+
+    results = {}
+    new_items = []
+    for key, (entry, encounters) in grouped.items():
+        if key not in existing:
+            item = _new_word_item(user_id, ctx, entry, encounters, now)
+            new_items.append(item)
+            results[key] = item
+
+    bumps = [key for key in grouped if key in existing]
+    if bumps:
+        if deadline is not None:
+            deadline.check('vocabulary update', WORD_WRITE_MIN_MS)
+        with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(bumps))) as executor:
+            futures = {
+                key: executor.submit(_count_encounter, user_id, ctx, *grouped[key], now, deadline)
+                for key in bumps
+            }
+        for key, future in futures.items():
+            results[key] = future.result()
+
+    # A word created by a concurrent request between the read and this write
+    # is overwritten with a fresh row; an accepted cost of batching the writes
+    dynamo_batch.batch_write(VOCABULARY_TABLE, new_items, deadline)
+    # Words already in the bank were indexed when they were added, and an
+    # encounter doesn't change their terms
+    vocabulary_search.index_words(new_items, deadline)
+    return [results[key] for key in grouped], len(new_items)
+
+def reindex_vocabulary(user_id, cursor=None, deadline=None):
+    """
+    POST /vocabulary with {userId, reindex: true}: rebuild the user's search
+    rows (e.g. for words added before the index existed). Stops early when
+    time runs short and returns a cursor to continue from.
+    """
+    try:
+        start_key = pagination.decode_cursor(cursor, ('userId', user_id))
+    except ValueError as e:
+        return _bad_request(str(e))
+    words = 0
+    last_key = None
+    for page, last_key in iter_vocabulary_pages(user_id, INDEX_FIELDS, MAX_PAGE_SIZE, start_key, deadline):
+        vocabulary_search.index_words([dict(item, userId=user_id) for item in page], deadline)
+        words += len(page)
+        if deadline is not None and not deadline.has(PAGE_MIN_MS * 3):
+            break
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'indexed': words, 'nextCursor': pagination.encode_cursor(last_key)})
+    }
+
+def add_vocabulary(event, deadline=None):
+    """
+    POST /vocabulary with {userId, word, translation, context} or
+    {userId, words: [{word, translation, context}, ...]}. Adding a word that
+    is already in the bank counts an encounter instead of duplicating it.
+    A body with 'reviews' records graded answers instead, and one with
+    'reindex' rebuilds the search index.
+    """
     try:
         body = json.loads(event['body'])
         user_id = body['userId']
-        word = body['word']
-        translation = body['translation']
-        context = body.get('context', '')
-        
-        vocabulary_table = dynamodb.Table('language-learning-vocabulary')
-        
-        word_item = {
-            'userId': user_id,
-            'wordId': str(uuid.uuid4()),
-            'word': word,
-            'translation': translation,
-            'context': context,
-            'targetLanguage': target_language,
-            'nativeLanguage': native_language,
-            'addedAt': datetime.utcnow().isoformat(),
-            'masteryLevel': 1,
-            'reviewCount': 0,
-            'correctCount': 0
-        }
-        
-        vocabulary_table.put_item(Item=word_item)
+        if 'reviews' in body:
+            return review_vocabulary(user_id, body['reviews'], deadline)
+        if body.get('reindex'):
+            return reindex_vocabulary(user_id, body.get('cursor'), deadline)
+        try:
+            entries = _parse_words(body)
+        except ValueError as e:
+            return _bad_request(str(e))
+        ctx = language_config.get_language_context(user_id, deadline)
+
+        if 'words' in body:
+            words, added = add_words(user_id, ctx, entries, deadline)
+            result = {
+                'message': f"Added {added} new words, updated {len(words) - added}",
+                'words': words
+            }
+        else:
+            word_item = upsert_word(user_id, ctx, entries[0], deadline=deadline)
+            result = {
+                'message': 'Vocabulary added successfully',
+                'word': word_item
+            }
         
         return {
             'statusCode': 201,
@@ -108,12 +561,11 @@ def add_vocabulary(event):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({
-                'message': 'Vocabulary added successfully',
-                'word': word_item
-            }, cls=DecimalEncoder)
+            'body': json.dumps(result, cls=DecimalEncoder)
         }
         
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
     except Exception as e:
         return {
             'statusCode': 500,
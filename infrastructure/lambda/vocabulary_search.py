@@ -0,0 +1,176 @@
+# vocabulary_search.py
+# Per-user typeahead over the vocabulary bank. Each word is indexed under a
+# handful of normalized terms (lower-cased, diacritics folded): the word,
+# its translation, their individual tokens and, for Malay, candidate stems
+# with affixes stripped. Terms are the sort key of the search table
+# ("<term>#<wordId>"), so a prefix search on either field is a single
+# begins_with query; the hits are then ranked and de-duplicated per word.
+import os
+import re
+import unicodedata
+
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+import dynamo_batch
+import language_config
+
+VOCABULARY_SEARCH_TABLE = os.environ.get('VOCABULARY_SEARCH_TABLE', 'language-learning-vocabulary-search')
+
+# Index rows read per search; ranking picks the best of these
+SEARCH_READ_LIMIT = 200
+DEFAULT_RESULTS = 10
+MAX_TERMS_PER_WORD = 16
+MIN_STEM_LENGTH = 4
+
+# Lower is better: where in the entry a term came from
+KIND_RANK = {
+    'word': 0, 'word_token': 1, 'word_stem': 2,
+    'translation': 3, 'translation_token': 4, 'translation_stem': 5,
+}
+
+VOWELS = 'aeiou'
+# Malay prefixes as (prefix, letters it may precede, replacements for the
+# dropped initial). meN-/peN- swallow the root's first consonant, so one
+# surface form can have several candidate roots: memukul -> pukul, memakan -> makan.
+MALAY_PREFIXES = (
+    ('meny', VOWELS, ('s',)), ('peny', VOWELS, ('s',)),
+    ('meng', VOWELS, ('', 'k')), ('peng', VOWELS, ('', 'k')),
+    ('meng', 'ghk', ('',)), ('peng', 'ghk', ('',)),
+    ('mem', 'bfpv', ('',)), ('pem', 'bfpv', ('',)),
+    ('mem', VOWELS, ('p', 'm')), ('pem', VOWELS, ('p', 'm')),
+    ('men', 'cdjtzs', ('',)), ('pen', 'cdjtzs', ('',)),
+    ('men', VOWELS, ('t', 'n')), ('pen', VOWELS, ('t', 'n')),
+    ('me', 'lrwymn', ('',)), ('pe', 'lrwymn', ('',)),
+    ('memper', None, ('',)), ('diper', None, ('',)),
+    ('ber', None, ('',)), ('per', None, ('',)), ('ter', None, ('',)),
+    ('be', 'k', ('',)), ('di', None, ('',)), ('ke', None, ('',)), ('se', None, ('',)),
+)
+MALAY_PARTICLES = ('lah', 'kah', 'tah', 'pun')
+MALAY_POSSESSIVES = ('nya', 'ku', 'mu')
+MALAY_SUFFIXES = ('kan', 'an', 'i')
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+
+
+def fold(text):
+    """Lower-case, strip diacritics and punctuation, single-space"""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.sub(r'[^\w\s]|_', ' ', stripped).split())
+
+
+def _strip_suffixes(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def malay_stems(word):
+    """
+    Candidate roots for a folded Malay word. Rule-based and without a
+    dictionary, so it over-generates; stems only widen search matches
+    and rank below the word itself.
+    """
+    base = _strip_suffixes(_strip_suffixes(word, MALAY_PARTICLES), MALAY_POSSESSIVES)
+    candidates = {base, _strip_suffixes(base, MALAY_SUFFIXES)}
+    for form in list(candidates):
+        for prefix, before, replacements in MALAY_PREFIXES:
+            rest = form[len(prefix):]
+            if not form.startswith(prefix) or not rest or (before and rest[0] not in before):
+                continue
+            for replacement in replacements:
+                stem = replacement + rest
+                if len(stem) >= MIN_STEM_LENGTH:
+                    candidates.add(stem)
+                    candidates.add(_strip_suffixes(stem, MALAY_SUFFIXES))
+    candidates.discard(word)
+    return {stem for stem in candidates if len(stem) >= MIN_STEM_LENGTH}
+
+
+def _language_code(name):
+    try:
+        return language_config.normalize_lang(name or '')
+    except ValueError:
+        return None
+
+
+def terms_for(item):
+    """{term: kind} for a vocabulary item, keeping each term's best kind"""
+    terms = {}
+
+    def add(term, kind):
+        if term and (term not in terms or KIND_RANK[kind] < KIND_RANK[terms[term]]):
+            terms[term] = kind
+
+    for field, language in (('word', item.get('targetLanguage')), ('translation', item.get('nativeLanguage'))):
+        text = fold(item.get(field))
+        add(text, field)
+        tokens = text.split()
+        if len(tokens) > 1:
+            for token in tokens:
+                add(token, f"{field}_token")
+        if _language_code(language) == 'ms':
+            for token in tokens:
+                for stem in malay_stems(token):
+                    add(stem, f"{field}_stem")
+    # Word and translation first, then tokens and stems, up to the cap
+    ranked = sorted(terms.items(), key=lambda kv: KIND_RANK[kv[1]])
+    return dict(ranked[:MAX_TERMS_PER_WORD])
+
+
+def index_rows(item):
+    return [
+        {
+            'userId': item['userId'],
+            'term': f"{term}#{item['wordId']}",
+            'wordId': item['wordId'],
+            'word': item.get('word', ''),
+            'translation': item.get('translation', ''),
+            'kind': kind
+        }
+        for term, kind in terms_for(item).items()
+    ]
+
+
+def index_words(items, deadline=None):
+    """Write search rows for vocabulary items; rewriting a word's rows is a no-op"""
+    rows = [row for item in items for row in index_rows(item)]
+    if rows:
+        dynamo_batch.batch_write(VOCABULARY_SEARCH_TABLE, rows, deadline)
+    return len(rows)
+
+
+def search(user_id, query, limit=DEFAULT_RESULTS, deadline=None):
+    """Words whose word or translation has a term starting with ``query``, best first"""
+    prefix = fold(query)
+    if not prefix:
+        return []
+    table = (deadline.resource('dynamodb') if deadline else dynamodb).Table(VOCABULARY_SEARCH_TABLE)
+    response = table.query(
+        KeyConditionExpression=Key('userId').eq(user_id) & Key('term').begins_with(prefix),
+        ProjectionExpression='#term, #wordId, #word, #translation, #kind',
+        ExpressionAttributeNames={f"#{name}": name for name in ('term', 'wordId', 'word', 'translation', 'kind')},
+        Limit=SEARCH_READ_LIMIT
+    )
+
+    best = {}
+    for row in response.get('Items', []):
+        term = row['term'].rsplit('#', 1)[0]
+        kind = row.get('kind', '')
+        # Exact matches first (stems aside: they're guesses), then by where the term came from
+        exact = term == prefix and not kind.endswith('_stem')
+        rank = (not exact, KIND_RANK.get(kind, len(KIND_RANK)), len(term), fold(row.get('word')))
+        if row['wordId'] not in best or rank < best[row['wordId']][0]:
+            best[row['wordId']] = (rank, row)
+    ranked = sorted(best.values(), key=lambda pair: pair[0])
+    return [
+        {
+            'wordId': row['wordId'],
+            'word': row.get('word'),
+            'translation': row.get('translation'),
+            'matched': row.get('kind')
+        }
+        for _, row in ranked[:limit]
+    ]
@@ -1,112 +1,104 @@
 import json
-import boto3
+import aws_clients
 import base64
 import uuid
 import os
-import time
 from datetime import datetime
 
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE,
-    get_language_code
-)
+import language_config
+from language_config import get_language_code
+import deadlines
+import multipart
+import audio_preprocessing
+import transcription_jobs
+import pronunciation_scoring
+import speech_cache
 
-transcribe = boto3.client('transcribe')
-polly = boto3.client('polly')
-s3 = boto3.client('s3')
+transcribe = aws_clients.lazy_client('transcribe')
+s3 = aws_clients.lazy_client('s3')
 
 BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
 
+# Stop polling Transcribe once less than this (ms) is left to fetch the
+# transcript, clean up and respond; clients can use ?mode=async instead
+TRANSCRIBE_POLL_MIN_MS = 2500
+
+# Longer clips are streamed into S3 and served from there rather than through Lambda
+STREAM_TEXT_CHARS = 300
+
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
-        # Handle multipart form data for voice practice
-        content_type = event.get('headers', {}).get('content-type', '')
+        # Poll for the result of an asynchronous pronunciation job
+        if event.get('httpMethod') == 'GET':
+            return get_job_result(event)
         
-        if 'multipart/form-data' in content_type:
+        # Handle multipart form data for voice practice
+        if multipart.is_multipart(event):
             # Parse multipart form data
-            boundary = content_type.split('boundary=')[1]
-            body = event.get('body', '')
-            
-            if event.get('isBase64Encoded', False):
-                body = base64.b64decode(body).decode('utf-8')
-            
-            # Extract form fields
-            parts = body.split('--' + boundary)
-            audio_data = None
-            user_id = None
-            target_language = None
-            
-            for part in parts:
-                if 'Content-Disposition: form-data; name="audio"' in part:
-                    # Extract audio data
-                    audio_start = part.find('\r\n\r\n') + 4
-                    audio_end = part.rfind('\r\n')
-                    if audio_start < audio_end:
-                        audio_data = part[audio_start:audio_end].encode('latin1')
-                elif 'Content-Disposition: form-data; name="userId"' in part:
-                    user_id = part.split('\r\n\r\n')[1].split('\r\n')[0]
-                elif 'Content-Disposition: form-data; name="targetLanguage"' in part:
-                    target_language = part.split('\r\n\r\n')[1].split('\r\n')[0]
+            parts = multipart.parse_event(event)
+            audio_part = parts.get('audio')
+            audio_data = audio_part.data if audio_part is not None else None
+            user_id = multipart.field_text(parts, 'userId')
+            target_language = multipart.field_text(parts, 'targetLanguage')
+            expected_text = multipart.field_text(parts, 'expectedText')
             
             if not audio_data or not user_id:
                 raise Exception("Missing audio data or user ID")
             
-            # Refresh language globals
-            refresh_language_globals(user_id)
+            ctx = language_config.get_language_context(user_id, deadline)
             
             # Use target language for transcription
-            language_code = get_language_code(target_language or GLOBAL_TARGET_LANGUAGE)
+            target_language = target_language or ctx.target_language
+            language_code = get_language_code(target_language)
+            
+            # Sniff the real container, downmix/resample and trim silence before upload
+            try:
+                audio = audio_preprocessing.prepare(audio_data)
+            except ValueError as e:
+                return _bad_audio_response(str(e))
+            
+            # Submit/poll mode: return the job id without waiting for Transcribe
+            if transcription_jobs.wants_async(event, parts):
+                return submit_job(audio, language_code, user_id, expected_text, deadline)
             
             # Upload to S3
-            audio_key = f"pronunciation/{uuid.uuid4()}.wav"
+            audio_key = f"pronunciation/{uuid.uuid4()}.{audio.media_format}"
             s3.put_object(
                 Bucket=BUCKET_NAME,
                 Key=audio_key,
-                Body=audio_data,
-                ContentType='audio/wav'
+                Body=audio.data,
+                ContentType=audio.content_type
             )
             
             # Start transcription
             job_name = f"pronunciation-{uuid.uuid4()}"
             audio_uri = f"s3://{BUCKET_NAME}/{audio_key}"
             
-            transcribe.start_transcription_job(
+            deadline.client('transcribe').start_transcription_job(
                 TranscriptionJobName=job_name,
                 Media={'MediaFileUri': audio_uri},
-                MediaFormat='wav',
+                MediaFormat=audio.media_format,
                 LanguageCode=language_code
             )
             
-            # Wait for completion
-            max_wait = 30
-            wait_time = 0
-            
-            while wait_time < max_wait:
-                response = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+            # Wait for completion while the request budget allows
+            while deadline.has(TRANSCRIBE_POLL_MIN_MS):
+                response = deadline.client('transcribe').get_transcription_job(TranscriptionJobName=job_name)
                 status = response['TranscriptionJob']['TranscriptionJobStatus']
                 
                 if status == 'COMPLETED':
                     transcript_uri = response['TranscriptionJob']['Transcript']['TranscriptFileUri']
                     
                     import urllib.request
-                    with urllib.request.urlopen(transcript_uri) as resp:
+                    with urllib.request.urlopen(transcript_uri, timeout=deadline.remaining()) as resp:
                         transcript_data = json.loads(resp.read().decode())
                     
-                    transcription = transcript_data['results']['transcripts'][0]['transcript']
-                    
-                    # Calculate confidence
-                    confidence = 0.0
-                    if 'items' in transcript_data['results']:
-                        confidences = [float(item.get('alternatives', [{}])[0].get('confidence', 0)) 
-                                     for item in transcript_data['results']['items'] 
-                                     if item.get('type') == 'pronunciation']
-                        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+                    transcription, confidence, words = transcription_jobs.summarize_transcript(transcript_data)
+                    scoring = score_pronunciation(expected_text, words)
                     
-                    feedback = generate_feedback(confidence)
-                    suggestions = generate_suggestions(confidence)
+                    feedback = generate_feedback(confidence, scoring)
+                    suggestions = generate_suggestions(confidence, scoring)
                     
                     # Clean up
                     transcribe.delete_transcription_job(TranscriptionJobName=job_name)
@@ -123,6 +115,7 @@ def handler(event, context):
                             'confidence': confidence,
                             'feedback': feedback,
                             'suggestions': suggestions,
+                            'pronunciation': scoring,
                             'timestamp': datetime.utcnow().isoformat(),
                             'method': 'aws_transcribe'
                         })
@@ -131,43 +124,72 @@ def handler(event, context):
                 elif status == 'FAILED':
                     break
                 
-                time.sleep(1)
-                wait_time += 1
+                deadline.sleep(1)
             
             # Cleanup on timeout/failure
+            timed_out = not deadline.has(TRANSCRIBE_POLL_MIN_MS)
             try:
                 transcribe.delete_transcription_job(TranscriptionJobName=job_name)
                 s3.delete_object(Bucket=BUCKET_NAME, Key=audio_key)
             except:
                 pass
             
+            if timed_out:
+                return deadlines.timeout_response(deadlines.DeadlineExceeded('pronunciation transcription'))
+            
             # Return fallback response
-            return get_fallback_response(target_language or GLOBAL_TARGET_LANGUAGE)
+            return get_fallback_response(target_language)
             
         else:
             # Handle text-to-speech request
             body = json.loads(event.get('body', '{}'))
             text = body.get('text', 'Hello')
             language = body.get('language', 'en')
-            user_id = body.get('userId')
-            
-            if user_id:
-                refresh_language_globals(user_id)
             
             # Generate speech using Polly
             voice_id = get_polly_voice(language)
             language_code = get_language_code(language)
             
-            response = polly.synthesize_speech(
-                Text=text,
-                OutputFormat='mp3',
-                VoiceId=voice_id,
-                LanguageCode=language_code
+            # base64 (JSON, default), binary (raw audio/mpeg), url (presigned link in JSON)
+            # or redirect (302 to the clip in S3)
+            # Binary only reaches the client decoded when API Gateway matches the
+            # Accept header to a binary media type; otherwise the client would
+            # get base64 text labelled audio/mpeg, so it's sent a redirect instead
+            binary_ok = accepts_binary_audio(event)
+            response_format = body.get('responseFormat') or ('binary' if binary_ok else 'base64')
+            if response_format == 'binary' and (not binary_ok or len(text) > STREAM_TEXT_CHARS):
+                response_format = 'redirect'
+            
+            speech = speech_cache.synthesize(
+                text, voice_id, language_code,
+                include_audio=response_format in ('base64', 'binary'),
+                deadline=deadline
             )
             
-            # Convert to base64
-            audio_data = response['AudioStream'].read()
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            if response_format == 'binary':
+                return audio_response(speech['audio'], speech['cached'])
+            if response_format == 'redirect':
+                return {
+                    'statusCode': 302,
+                    'headers': {
+                        'Location': speech['url'],
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': ''
+                }
+            
+            result = {
+                'audioFormat': 'mp3',
+                'audioUrl': speech['url'],
+                'cached': speech['cached'],
+                'text': text,
+                'voice': voice_id,
+                'language': language,
+                'timestamp': datetime.utcnow().isoformat(),
+                'method': 'aws_polly'
+            }
+            if speech['audio'] is not None:
+                result['audioData'] = base64.b64encode(speech['audio']).decode('utf-8')
             
             return {
                 'statusCode': 200,
@@ -175,36 +197,127 @@ def handler(event, context):
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps({
-                    'audioData': audio_base64,
-                    'audioFormat': 'mp3',
-                    'text': text,
-                    'voice': voice_id,
-                    'language': language,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'method': 'aws_polly'
-                })
-            }
-        
+                'body': json.dumps(result)
+            }        
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
     except Exception as e:
         print(f"Error: {str(e)}")
         return get_fallback_response('en')
 
-def get_polly_voice(language):
-    voice_mapping = {
-        'en': 'Joanna',
-        'ms': 'Aditi',  # Using Hindi voice as closest to Malay
-        'es': 'Conchita',
-        'fr': 'Celine',
-        'de': 'Marlene',
-        'it': 'Carla',
-        'zh': 'Zhiyu',
-        'ja': 'Mizuki',
-        'ko': 'Seoyeon'
+def accepts_binary_audio(event):
+    """True if API Gateway will decode a binary audio body for this request"""
+    # API Gateway only checks the first media type in Accept against the
+    # API's binary media types
+    accept = multipart.get_header(event.get('headers') or {}, 'Accept')
+    first = accept.split(',')[0].split(';')[0].strip().lower()
+    return first.startswith('audio/')
+
+def audio_response(audio, cached):
+    """Raw MP3 response; API Gateway decodes the body for clients that Accept audio/*"""
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'audio/mpeg',
+            'Content-Length': str(len(audio)),
+            'Access-Control-Allow-Origin': '*',
+            'X-Audio-Cache': 'hit' if cached else 'miss'
+        },
+        'body': base64.b64encode(audio).decode('ascii'),
+        'isBase64Encoded': True
     }
-    return voice_mapping.get(language, 'Joanna')
 
-def generate_feedback(confidence):
+def _bad_audio_response(message):
+    return {
+        'statusCode': 400,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message})
+    }
+
+def submit_job(audio, language_code, user_id, expected_text=None, deadline=None):
+    try:
+        job_id = transcription_jobs.submit(
+            audio.data, language_code, 'pronunciation', user_id,
+            media_format=audio.media_format,
+            content_type=audio.content_type,
+            metadata={'expectedText': expected_text} if expected_text else None,
+            deadline=deadline
+        )
+    except transcription_jobs.JobQuotaExceeded as e:
+        print(f"Transcribe job quota exceeded: {e}")
+        return {
+            'statusCode': 429,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Retry-After': '2'
+            },
+            'body': json.dumps({'error': 'Too many transcriptions in progress, retry shortly'})
+        }
+    
+    return {
+        'statusCode': 202,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'jobId': job_id,
+            'status': 'IN_PROGRESS',
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    }
+
+def get_job_result(event):
+    query = event.get('queryStringParameters') or {}
+    job = transcription_jobs.get(query.get('jobId', ''))
+    
+    if not job or job.get('userId') != query.get('userId'):
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Pronunciation job not found'})
+        }
+    
+    result = transcription_jobs.public_view(job)
+    if result['status'] == 'COMPLETED':
+        expected_text = job.get('metadata', {}).get('expectedText')
+        scoring = score_pronunciation(expected_text, result['words'])
+        result['feedback'] = generate_feedback(result['confidence'], scoring)
+        result['suggestions'] = generate_suggestions(result['confidence'], scoring)
+        result['pronunciation'] = scoring
+    result['method'] = 'aws_transcribe'
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(result)
+    }
+
+def get_polly_voice(language):
+    return speech_cache.voice_for(language)
+
+def score_pronunciation(expected_text, words):
+    """Word-level scoring against the practice phrase, or None when it can't be scored"""
+    if not expected_text or not pronunciation_scoring.available():
+        return None
+    try:
+        return pronunciation_scoring.score_utterance(expected_text, words)
+    except Exception as e:
+        print(f"Pronunciation scoring error: {e}")
+        return None
+
+def generate_feedback(confidence, scoring=None):
+    if scoring is not None:
+        confidence = scoring['overallScore']
     if confidence > 0.9:
         return "Excellent pronunciation! Your accent is very clear."
     elif confidence > 0.8:
@@ -214,7 +327,17 @@ def generate_feedback(confidence):
     else:
         return "Keep practicing! Try speaking more slowly and clearly."
 
-def generate_suggestions(confidence):
+def generate_suggestions(confidence, scoring=None):
+    if scoring is not None:
+        tips = []
+        if scoring['weakWords']:
+            tips.append(f"Practice these words: {', '.join(scoring['weakWords'][:3])}.")
+        if scoring['weakGroups']:
+            sounds = ', '.join(group.replace('_', '/') + ' sounds' for group in scoring['weakGroups'][:2])
+            tips.append(f"Pay attention to {sounds}.")
+        if tips:
+            return ' '.join(tips)
+        confidence = scoring['overallScore']
     if confidence < 0.7:
         return "Try speaking more slowly and emphasize each syllable clearly."
     elif confidence < 0.8:
@@ -1,90 +1,82 @@
 import json
-import boto3
-import base64
+import aws_clients
 import uuid
 import os
-import time
 from datetime import datetime
-from language_config import (
-    refresh_language_globals,
-    GLOBAL_NATIVE_LANGUAGE_NAME,
-    GLOBAL_TARGET_LANGUAGE_NAME,
-    GLOBAL_NATIVE_LANGUAGE,
-    get_language_code
-)
+import language_config
+from language_config import get_language_code
+import deadlines
+import multipart
+import audio_preprocessing
+import transcription_jobs
 
-transcribe = boto3.client('transcribe')
-s3 = boto3.client('s3')
+transcribe = aws_clients.lazy_client('transcribe')
+s3 = aws_clients.lazy_client('s3')
 
 BUCKET_NAME = os.environ.get('MEDIA_BUCKET')
 
+# Stop polling Transcribe once less than this (ms) is left to fetch the
+# transcript, clean up and respond; clients can use ?mode=async instead
+TRANSCRIBE_POLL_MIN_MS = 2500
+
 def handler(event, context):
+    deadline = deadlines.Deadline.from_context(context)
     try:
-        content_type = event.get('headers', {}).get('content-type', '')
+        # Poll for the result of an asynchronous job
+        if event.get('httpMethod') == 'GET':
+            return get_job_result(event)
         
-        if 'multipart/form-data' in content_type:
+        if multipart.is_multipart(event):
             # Parse multipart form data
-            boundary = content_type.split('boundary=')[1]
-            body = event.get('body', '')
-            
-            if event.get('isBase64Encoded', False):
-                body = base64.b64decode(body).decode('utf-8')
-            
-            # Extract form fields
-            parts = body.split('--' + boundary)
-            audio_data = None
-            user_id = None
-            language = None
-            
-            for part in parts:
-                if 'Content-Disposition: form-data; name="audio"' in part:
-                    # Extract audio data
-                    audio_start = part.find('\r\n\r\n') + 4
-                    audio_end = part.rfind('\r\n')
-                    if audio_start < audio_end:
-                        audio_data = part[audio_start:audio_end].encode('latin1')
-                elif 'Content-Disposition: form-data; name="userId"' in part:
-                    user_id = part.split('\r\n\r\n')[1].split('\r\n')[0]
-                elif 'Content-Disposition: form-data; name="language"' in part:
-                    language = part.split('\r\n\r\n')[1].split('\r\n')[0]
+            parts = multipart.parse_event(event)
+            audio_part = parts.get('audio')
+            audio_data = audio_part.data if audio_part is not None else None
+            user_id = multipart.field_text(parts, 'userId')
+            language = multipart.field_text(parts, 'language')
             
             if not audio_data or not user_id:
                 raise Exception("Missing audio data or user ID")
             
-            # Refresh language globals
-            refresh_language_globals(user_id)
-            
             # Use provided language or default to native language
-            language_code = get_language_code(language or GLOBAL_NATIVE_LANGUAGE)
+            if not language:
+                language = language_config.get_language_context(user_id, deadline).native_language
+            language_code = get_language_code(language)
+            
+            # Sniff the real container, downmix/resample and trim silence before upload
+            try:
+                audio = audio_preprocessing.prepare(audio_data)
+            except ValueError as e:
+                return _bad_audio_response(str(e))
+            
+            # Submit/poll mode: return the job id without waiting for Transcribe
+            if transcription_jobs.wants_async(event, parts):
+                return submit_job(audio, language_code, user_id, deadline)
             
             # Generate unique filename
-            audio_key = f"audio/{uuid.uuid4()}.wav"
+            audio_key = f"audio/{uuid.uuid4()}.{audio.media_format}"
             
             # Upload audio to S3
             s3.put_object(
                 Bucket=BUCKET_NAME,
                 Key=audio_key,
-                Body=audio_data,
-                ContentType='audio/wav'
+                Body=audio.data,
+                ContentType=audio.content_type
             )
             
             # Start transcription job
             job_name = f"transcribe-{uuid.uuid4()}"
             audio_uri = f"s3://{BUCKET_NAME}/{audio_key}"
             
-            transcribe.start_transcription_job(
+            deadline.client('transcribe').start_transcription_job(
                 TranscriptionJobName=job_name,
                 Media={'MediaFileUri': audio_uri},
-                MediaFormat='wav',
+                MediaFormat=audio.media_format,
                 LanguageCode=language_code
             )
             
-            # Wait for transcription to complete (with timeout)
-            max_wait = 30  # seconds
-            wait_time = 0
-            
-            while wait_time < max_wait:
-                response = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+            # Wait for transcription to complete while the request budget allows
+            while deadline.has(TRANSCRIBE_POLL_MIN_MS):
+                response = deadline.client('transcribe').get_transcription_job(TranscriptionJobName=job_name)
                 status = response['TranscriptionJob']['TranscriptionJobStatus']
                 
                 if status == 'COMPLETED':
@@ -93,7 +85,7 @@ def handler(event, context):
                     
                     # Download and parse transcript
                     import urllib.request
-                    with urllib.request.urlopen(transcript_uri) as response:
+                    with urllib.request.urlopen(transcript_uri, timeout=deadline.remaining()) as response:
                         transcript_data = json.loads(response.read().decode())
                     
                     transcription = transcript_data['results']['transcripts'][0]['transcript']
@@ -129,34 +121,103 @@ def handler(event, context):
                     error_reason = response['TranscriptionJob'].get('FailureReason', 'Unknown error')
                     raise Exception(f"Transcription failed: {error_reason}")
                 
-                time.sleep(1)
-                wait_time += 1
+                deadline.sleep(1)
             
-            # Timeout - clean up and return fallback
+            # Timeout - clean up and tell the client
             try:
                 transcribe.delete_transcription_job(TranscriptionJobName=job_name)
                 s3.delete_object(Bucket=BUCKET_NAME, Key=audio_key)
             except:
                 pass
             
-            return get_fallback_response(language_code)
+            return deadlines.timeout_response(deadlines.DeadlineExceeded('transcription'))
             
         else:
             # Handle JSON request (for testing)
             body = json.loads(event.get('body', '{}'))
             language = body.get('language', 'en-US')
-            user_id = body.get('userId')
-            
-            if user_id:
-                refresh_language_globals(user_id)
             
             return get_fallback_response(language)
         
+    except deadlines.TIMEOUT_ERRORS as e:
+        return deadlines.timeout_response(e)
     except Exception as e:
         print(f"Error: {str(e)}")
         return get_fallback_response('en-US')
 
 
+def _bad_audio_response(message):
+    return {
+        'statusCode': 400,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message})
+    }
+
+
+def submit_job(audio, language_code, user_id, deadline=None):
+    try:
+        job_id = transcription_jobs.submit(
+            audio.data, language_code, 'transcribe', user_id,
+            media_format=audio.media_format,
+            content_type=audio.content_type,
+            deadline=deadline
+        )
+    except transcription_jobs.JobQuotaExceeded as e:
+        print(f"Transcribe job quota exceeded: {e}")
+        return {
+            'statusCode': 429,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Retry-After': '2'
+            },
+            'body': json.dumps({'error': 'Too many transcriptions in progress, retry shortly'})
+        }
+    
+    return {
+        'statusCode': 202,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'jobId': job_id,
+            'status': 'IN_PROGRESS',
+            'language': language_code,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    }
+
+
+def get_job_result(event):
+    query = event.get('queryStringParameters') or {}
+    job = transcription_jobs.get(query.get('jobId', ''))
+    
+    if not job or job.get('userId') != query.get('userId'):
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Transcription job not found'})
+        }
+    
+    result = transcription_jobs.public_view(job)
+    result['method'] = 'aws_transcribe'
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(result)
+    }
+
+
 def get_fallback_response(language_code):
     fallback_transcriptions = {
         'en-US': 'Hello, how can I help you today?',
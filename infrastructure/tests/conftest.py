@@ -0,0 +1,57 @@
+# Shared test setup: make the Lambda modules importable and give tests a
+# moto-backed AWS account whose clients replace the shared ones.
+import os
+import sys
+
+import pytest
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_SECURITY_TOKEN', 'testing')
+os.environ.setdefault('AWS_SESSION_TOKEN', 'testing')
+
+import aws_clients  # noqa: E402
+
+
+def _reset_clients():
+    aws_clients._session = None
+    aws_clients._clients.clear()
+    aws_clients._resources.clear()
+
+
+@pytest.fixture
+def aws():
+    """A mocked AWS account; shared clients are rebuilt inside it"""
+    from moto import mock_aws
+    _reset_clients()
+    with mock_aws():
+        yield aws_clients
+    _reset_clients()
+
+
+def create_table(name, partition_key, sort_key=None, indexes=()):
+    """A PAY_PER_REQUEST table with string keys, for moto-backed tests"""
+    keys = [(partition_key, 'HASH')] + ([(sort_key, 'RANGE')] if sort_key else [])
+    attributes = {name for name, _ in keys}
+    gsis = []
+    for index_name, hash_key, range_key in indexes:
+        attributes.update({hash_key, range_key})
+        gsis.append({
+            'IndexName': index_name,
+            'KeySchema': [{'AttributeName': hash_key, 'KeyType': 'HASH'},
+                          {'AttributeName': range_key, 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        })
+    kwargs = {
+        'TableName': name,
+        'KeySchema': [{'AttributeName': n, 'KeyType': t} for n, t in keys],
+        'AttributeDefinitions': [{'AttributeName': n, 'AttributeType': 'S'} for n in sorted(attributes)],
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+    if gsis:
+        kwargs['GlobalSecondaryIndexes'] = gsis
+    return aws_clients.resource('dynamodb').create_table(**kwargs)
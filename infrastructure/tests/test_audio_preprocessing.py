@@ -0,0 +1,83 @@
+import struct
+
+import numpy as np
+import pytest
+
+import audio_preprocessing
+from audio_preprocessing import TARGET_SAMPLE_RATE, EmptyAudioError, prepare
+
+RNG = np.random.default_rng(7)
+
+
+def voiced(seconds, level=0.3):
+    """A vowel-like harmonic signal with a slow syllable envelope"""
+    t = np.arange(int(seconds * TARGET_SAMPLE_RATE)) / TARGET_SAMPLE_RATE
+    tone = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6))
+    envelope = 0.8 + 0.2 * np.sin(2 * np.pi * 4 * t)
+    return (level * envelope * tone / np.abs(tone).max()).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * TARGET_SAMPLE_RATE), dtype=np.float32)
+
+
+def noise(samples, level):
+    return (RNG.standard_normal(samples) * level).astype(np.float32)
+
+
+def wav(mono):
+    return audio_preprocessing._encode_wav(mono)
+
+
+def test_continuous_voiced_clip_is_kept_whole():
+    clip = voiced(1.5)
+    prepared = prepare(wav(clip))
+    assert prepared.media_format == 'wav'
+    assert prepared.duration == pytest.approx(1.5, abs=0.02)
+
+
+def test_continuous_voiced_clip_with_noise_is_kept():
+    clip = voiced(1.5)
+    clip = clip + noise(len(clip), 0.02)
+    assert prepare(wav(clip)).duration == pytest.approx(1.5, abs=0.02)
+
+
+def test_silence_around_speech_is_trimmed_to_padding():
+    clip = np.concatenate([silence(1.0), voiced(0.5), silence(1.0)])
+    clip = clip + noise(len(clip), 0.001)
+    duration = prepare(wav(clip)).duration
+    padding = 2 * audio_preprocessing.PADDING_SECONDS
+    assert 0.5 <= duration <= 0.5 + padding + 0.05
+
+
+def test_silent_clip_is_rejected():
+    with pytest.raises(EmptyAudioError):
+        prepare(wav(silence(1.0)))
+
+
+def test_faint_hiss_is_rejected():
+    with pytest.raises(EmptyAudioError):
+        prepare(wav(noise(TARGET_SAMPLE_RATE, 0.001)))
+
+
+def test_stereo_44k_is_downmixed_and_resampled():
+    t = np.arange(44100) / 44100
+    left = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    stereo = np.stack([left, left], axis=1)
+    pcm = (stereo * 32767).astype('<i2').tobytes()
+    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(pcm), b'WAVE', b'fmt ', 16, 1, 2,
+                         44100, 44100 * 4, 4, 16, b'data', len(pcm))
+    prepared = prepare(header + pcm)
+    assert prepared.duration == pytest.approx(1.0, abs=0.02)
+
+
+def test_compressed_formats_pass_through():
+    data = b'\x1a\x45\xdf\xa3' + b'\x00' * 32
+    prepared = prepare(data)
+    assert (prepared.media_format, prepared.content_type) == ('webm', 'audio/webm')
+    assert prepared.data == data
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        prepare(b'not audio at all')
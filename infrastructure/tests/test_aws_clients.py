@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import aws_clients
+
+
+def test_lazy_client_is_built_on_first_use(aws):
+    polly = aws_clients.lazy_client('polly')
+    assert aws_clients._clients == {}
+
+    polly.meta
+
+    assert list(aws_clients._clients) == [('polly', None)]
+
+
+def test_lazy_resource_uses_the_shared_resource(aws):
+    dynamodb = aws_clients.lazy_resource('dynamodb')
+
+    assert dynamodb.meta is aws_clients.resource('dynamodb').meta
+    assert list(aws_clients._resources) == [('dynamodb', None)]
+
+
+def test_clients_are_reused(aws):
+    assert aws_clients.client('s3') is aws_clients.client('s3')
+    assert aws_clients.client('s3') is not aws_clients.client('polly')
+
+
+def test_concurrent_first_use_builds_one_client(aws):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: aws_clients.client('transcribe'), range(32)))
+
+    assert all(c is clients[0] for c in clients)
+    assert len(aws_clients._clients) == 1
+
+
+@pytest.mark.parametrize('service', sorted(aws_clients.SERVICE_SETTINGS))
+def test_each_service_gets_its_own_settings(aws, service):
+    connect_timeout, read_timeout, pool_size, max_attempts = aws_clients.SERVICE_SETTINGS[service]
+
+    config = aws_clients.client(service).meta.config
+
+    assert config.connect_timeout == connect_timeout
+    assert config.read_timeout == read_timeout
+    assert config.max_pool_connections == pool_size
+    assert aws_clients.config_for(service).retries == {'mode': 'adaptive', 'max_attempts': max_attempts}
+
+
+def test_unknown_services_get_the_defaults():
+    config = aws_clients.config_for('sqs')
+
+    assert (config.connect_timeout, config.read_timeout, config.max_pool_connections) == \
+        aws_clients.DEFAULT_SETTINGS[:3]
+
+
+@pytest.mark.parametrize('timeout, step', [
+    (None, None), (0.2, 1), (4.9, 3), (5, 5), (14.9, 13), (15, None), (60, None),
+])
+def test_timeouts_round_down_to_a_step(timeout, step):
+    assert aws_clients.timeout_step('s3', timeout) == step
+
+
+def test_deadline_variant_fits_the_timeout_and_does_not_retry(aws):
+    client = aws_clients.client('dynamodb', timeout=2.5)
+    config = client.meta.config
+
+    assert client is aws_clients.client('dynamodb', timeout=2.9)
+    assert client is not aws_clients.client('dynamodb')
+    assert config.read_timeout == 2
+    assert config.connect_timeout == 1
+    assert aws_clients.config_for('dynamodb', 2).retries['max_attempts'] == 1
+
+
+def test_bedrock_region_override(aws, monkeypatch):
+    monkeypatch.setattr(aws_clients, 'BEDROCK_REGION', 'us-west-2')
+
+    assert aws_clients.client('bedrock-runtime').meta.region_name == 'us-west-2'
+    assert aws_clients.client('s3').meta.region_name == 'us-east-1'
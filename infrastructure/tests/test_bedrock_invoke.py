@@ -0,0 +1,238 @@
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+import bedrock_invoke
+import deadlines
+
+MODEL = 'amazon.nova-lite-v1:0'
+PROFILE = 'us.amazon.nova-lite-v1:0'
+MESSAGES = [{'role': 'user', 'content': [{'text': 'Hai'}]}]
+REPLY = {
+    'output': {'message': {'role': 'assistant', 'content': [{'text': 'Hello'}]}},
+    'stopReason': 'end_turn',
+    'usage': {'inputTokens': 1, 'outputTokens': 1, 'totalTokens': 2},
+    'metrics': {'latencyMs': 10}
+}
+
+
+@pytest.fixture
+def bedrock(aws, monkeypatch):
+    """A stubbed Bedrock client, fresh breakers and no real sleeping"""
+    sleeps = []
+    monkeypatch.setattr(bedrock_invoke, '_breakers', {})
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', 'us')
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_MODELS', {})
+    monkeypatch.setattr(bedrock_invoke.time, 'sleep', sleeps.append)
+    with Stubber(aws.client('bedrock-runtime')) as stubber:
+        stubber.sleeps = sleeps
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def _throttle(stubber, model_id=MODEL, code='ThrottlingException'):
+    stubber.add_client_error('converse', code, 'Slow down', 429,
+                             expected_params={'modelId': model_id, 'messages': MESSAGES})
+
+
+def _reply(stubber, model_id=MODEL):
+    stubber.add_response('converse', REPLY, {'modelId': model_id, 'messages': MESSAGES})
+
+
+def _invoke(deadline=None):
+    return bedrock_invoke.invoke('converse', deadline=deadline, modelId=MODEL, messages=MESSAGES)
+
+
+def test_success_reports_the_model_used(bedrock):
+    _reply(bedrock)
+
+    response, model_id = _invoke()
+
+    assert model_id == MODEL
+    assert response['output']['message']['content'][0]['text'] == 'Hello'
+    assert bedrock.sleeps == []
+
+
+def test_throttling_is_retried_with_jittered_backoff(bedrock):
+    _throttle(bedrock)
+    _throttle(bedrock, code='ServiceUnavailableException')
+    _reply(bedrock)
+
+    _, model_id = _invoke()
+
+    assert model_id == MODEL
+    assert len(bedrock.sleeps) == 2
+    assert all(bedrock_invoke.BACKOFF_BASE_SECONDS <= s <= bedrock_invoke.BACKOFF_CAP_SECONDS
+               for s in bedrock.sleeps)
+
+
+def test_validation_errors_are_not_retried(bedrock):
+    bedrock.add_client_error('converse', 'ValidationException', 'Bad request', 400)
+
+    with pytest.raises(ClientError):
+        _invoke()
+
+    assert bedrock.sleeps == []
+
+
+def test_fails_over_to_the_inference_profile(bedrock):
+    for _ in range(bedrock_invoke.DEFAULT_RETRIES + 1):
+        _throttle(bedrock)
+    _reply(bedrock, PROFILE)
+
+    _, model_id = _invoke()
+
+    assert model_id == PROFILE
+
+
+def test_explicit_fallback_mapping(bedrock, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_MODELS', {MODEL: 'amazon.nova-micro-v1:0'})
+
+    assert bedrock_invoke.fallback_for(MODEL) == 'amazon.nova-micro-v1:0'
+    # Profiles already carry a region prefix
+    assert bedrock_invoke.fallback_for(PROFILE) is None
+
+
+def test_busy_when_every_candidate_is_throttled(bedrock):
+    for model_id in (MODEL, PROFILE):
+        for _ in range(bedrock_invoke.DEFAULT_RETRIES + 1):
+            _throttle(bedrock, model_id)
+
+    with pytest.raises(bedrock_invoke.BedrockUnavailable):
+        _invoke()
+
+    assert bedrock_invoke.busy_response()['statusCode'] == 503
+
+
+def test_breaker_opens_after_sustained_throttling(bedrock, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', '')
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    # Two calls of three attempts each: the fifth throttle opens the breaker
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        _throttle(bedrock)
+    for _ in range(2):
+        with pytest.raises(bedrock_invoke.BedrockUnavailable):
+            _invoke()
+    bedrock.assert_no_pending_responses()
+
+    # While open, calls fail fast without touching Bedrock
+    with pytest.raises(bedrock_invoke.BedrockUnavailable):
+        _invoke()
+
+    # After the cooldown one probe goes through and its success closes the breaker
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+    _reply(bedrock)
+    _reply(bedrock)
+    assert _invoke()[1] == MODEL
+    assert _invoke()[1] == MODEL
+
+
+def test_failed_probe_reopens_the_breaker(bedrock, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', '')
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    breaker = bedrock_invoke._breaker(MODEL)
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        breaker.record_throttle()
+
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+    _throttle(bedrock)
+    with pytest.raises(bedrock_invoke.BedrockUnavailable):
+        _invoke()
+
+    assert bedrock.sleeps == []
+    assert not breaker.allow()
+
+
+def test_retries_draw_on_the_request_budget(aws, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, '_breakers', {})
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', '')
+    monkeypatch.setattr(bedrock_invoke.time, 'sleep', lambda seconds: None)
+    deadline = deadlines.Deadline(24000)
+    deadline.retries_left = 1
+    with Stubber(deadline.client('bedrock-runtime')) as stubber:
+        _throttle(stubber)
+        _throttle(stubber)
+        with pytest.raises(bedrock_invoke.BedrockUnavailable):
+            _invoke(deadline)
+        stubber.assert_no_pending_responses()
+
+    assert deadline.retries_left == 0
+
+
+def test_no_retry_without_time_for_another_call(aws, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, '_breakers', {})
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', '')
+    deadline = deadlines.Deadline(bedrock_invoke.MIN_CALL_MS)
+    with Stubber(deadline.client('bedrock-runtime')) as stubber:
+        _throttle(stubber)
+        with pytest.raises(bedrock_invoke.BedrockUnavailable):
+            _invoke(deadline)
+
+    assert deadline.retries_left == deadlines.RETRY_BUDGET
+
+
+def test_only_one_probe_after_the_cooldown(bedrock, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    breaker = bedrock_invoke._breaker(MODEL)
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        breaker.record_throttle()
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+
+    assert breaker.allow() is True
+    # Concurrent callers keep failing fast while the probe is in flight
+    assert breaker.allow() is False
+    assert breaker.allow() is False
+
+    breaker.record_success()
+    assert breaker.allow() is True and breaker.allow() is True
+
+
+def test_abandoned_probe_is_replaced(bedrock, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    breaker = bedrock_invoke._breaker(MODEL)
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        breaker.record_throttle()
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+    assert breaker.allow() is True
+
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+
+
+def test_probe_that_times_out_reopens_the_breaker(bedrock, monkeypatch):
+    monkeypatch.setattr(bedrock_invoke, 'FALLBACK_PROFILE_PREFIX', '')
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    breaker = bedrock_invoke._breaker(MODEL)
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        breaker.record_throttle()
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+
+    def timeout(**kwargs):
+        raise deadlines.DeadlineExceeded('converse')
+
+    monkeypatch.setattr(bedrock.client, 'converse', timeout)
+    with pytest.raises(deadlines.DeadlineExceeded):
+        _invoke()
+
+    assert breaker.allow() is False
+
+
+def test_refused_probe_closes_the_breaker(bedrock, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(bedrock_invoke.time, 'monotonic', lambda: clock[0])
+    breaker = bedrock_invoke._breaker(MODEL)
+    for _ in range(bedrock_invoke.BREAKER_THRESHOLD):
+        breaker.record_throttle()
+    clock[0] += bedrock_invoke.BREAKER_COOLDOWN_SECONDS
+    bedrock.add_client_error('converse', 'ValidationException', 'Bad request', 400)
+
+    with pytest.raises(ClientError):
+        _invoke()
+
+    assert breaker.allow() is True and breaker.allow() is True
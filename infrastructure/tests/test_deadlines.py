@@ -0,0 +1,109 @@
+import base64
+import json
+
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+import aws_clients
+import deadlines
+import language_config
+import lesson_generator
+import object_detector
+
+CTX = language_config.LanguageContext(
+    user_id='u1', native_language='en', target_language='ms',
+    native_language_name='English', target_language_name='Malay', proficiency='beginner'
+)
+
+
+class FakeContext:
+    function_name = 'lesson-generator'
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def _budget(deadline):
+    # Allow for the time spent between building the deadline and reading it
+    return pytest.approx(deadline.remaining_ms(), abs=50)
+
+
+@pytest.mark.parametrize('remaining_ms, api_gateway, expected_ms', [
+    (60000, True, deadlines.API_GATEWAY_TIMEOUT_MS),
+    (10000, True, 10000),
+    (60000, False, 60000),
+])
+def test_budget_comes_from_the_context_and_api_gateway(remaining_ms, api_gateway, expected_ms):
+    deadline = deadlines.Deadline.from_context(FakeContext(remaining_ms), api_gateway=api_gateway)
+
+    assert expected_ms - deadlines.RESPONSE_MARGIN_MS == _budget(deadline)
+
+
+def test_without_a_context_the_api_gateway_limit_applies():
+    deadline = deadlines.Deadline.from_context(None, api_gateway=False)
+
+    assert deadlines.API_GATEWAY_TIMEOUT_MS - deadlines.RESPONSE_MARGIN_MS == _budget(deadline)
+
+
+def test_check_and_has_compare_against_the_remaining_time():
+    deadline = deadlines.Deadline(2000)
+
+    assert deadline.has(1000) and not deadline.has(5000)
+    deadline.check('lookup', 1000)
+    with pytest.raises(deadlines.DeadlineExceeded, match='generation'):
+        deadline.check('generation', 5000)
+    with pytest.raises(deadlines.DeadlineExceeded):
+        deadlines.Deadline(-10).check('anything')
+
+
+def test_retry_budget_is_shared_by_the_request():
+    deadline = deadlines.Deadline(1000)
+
+    assert [deadline.take_retry() for _ in range(deadlines.RETRY_BUDGET + 2)] == \
+        [True] * deadlines.RETRY_BUDGET + [False, False]
+
+
+def test_clients_end_before_the_deadline(aws):
+    client = deadlines.Deadline(4200).client('s3')
+
+    assert client is aws_clients.client('s3', timeout=3)
+    assert client.meta.config.read_timeout == 3
+    # Plenty of time left: the default client is used
+    assert deadlines.Deadline(20000).client('s3') is aws_clients.client('s3')
+    with pytest.raises(deadlines.DeadlineExceeded):
+        deadlines.Deadline(0).resource('dynamodb')
+
+
+def test_timeout_response_is_a_504():
+    response = deadlines.timeout_response(deadlines.DeadlineExceeded('lesson generation'))
+
+    assert response['statusCode'] == 504
+    assert json.loads(response['body'])['timeout'] is True
+
+
+def test_handler_answers_504_when_the_budget_is_too_short(monkeypatch):
+    monkeypatch.setattr(language_config, 'get_language_context', lambda user_id, deadline=None: CTX)
+    event = {'body': json.dumps({'userId': 'u1', 'topic': 'market', 'fresh': True})}
+
+    response = lesson_generator.handler(event, FakeContext(lesson_generator.LESSON_GENERATION_MIN_MS - 3000))
+
+    assert response['statusCode'] == 504
+    assert json.loads(response['body'])['timeout'] is True
+
+
+def test_handler_answers_504_when_a_downstream_call_times_out(aws, monkeypatch):
+    monkeypatch.setattr(language_config, 'get_language_context', lambda user_id, deadline=None: CTX)
+
+    def hang(**kwargs):
+        raise ReadTimeoutError(endpoint_url='https://rekognition.us-east-1.amazonaws.com')
+
+    for timeout in (None,) + aws_clients.TIMEOUT_STEPS:
+        aws_clients.client('rekognition', timeout).meta.events.register('before-sign.rekognition.DetectLabels', hang)
+    event = {'body': json.dumps({'userId': 'u1', 'image': base64.b64encode(b'image').decode()})}
+
+    response = object_detector.handler(event, FakeContext(20000))
+
+    assert response['statusCode'] == 504
@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import create_table
+import deadlines
+import dynamo_batch
+
+TABLE = 'batch-test'
+
+
+@pytest.fixture
+def table(aws, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(dynamo_batch.time, 'sleep', sleeps.append)
+    create_table(TABLE, 'pk')
+    return sleeps
+
+
+def _throttle(monkeypatch, aws, method, unprocessed_key, rounds):
+    """Make the first ``rounds`` calls process only the first request and hand back the rest"""
+    service = aws.resource('dynamodb')
+    real = getattr(service, method)
+    calls = []
+
+    def partial(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) > rounds:
+            return real(RequestItems=RequestItems)
+        request = RequestItems[TABLE]
+        if method == 'batch_write_item':
+            head, rest = request[:1], request[1:]
+            real(RequestItems={TABLE: head})
+            return {'UnprocessedItems': {TABLE: rest} if rest else {}}
+        keys = request['Keys']
+        response = real(RequestItems={TABLE: dict(request, Keys=keys[:1])})
+        response[unprocessed_key] = {TABLE: dict(request, Keys=keys[1:])} if keys[1:] else {}
+        return response
+
+    monkeypatch.setattr(service, method, partial)
+    return calls
+
+
+def _items(count):
+    return [{'pk': f"k{i}", 'value': i} for i in range(count)]
+
+
+def _stored():
+    return sorted(item['pk'] for item in dynamo_batch.dynamodb.Table(TABLE).scan()['Items'])
+
+
+def test_write_splits_into_api_sized_batches(aws, table, monkeypatch):
+    calls = _throttle(monkeypatch, aws, 'batch_write_item', 'UnprocessedItems', rounds=0)
+
+    dynamo_batch.batch_write(TABLE, _items(60))
+
+    assert [len(call[TABLE]) for call in calls] == [25, 25, 10]
+    assert len(_stored()) == 60
+
+
+def test_unprocessed_writes_are_resent_with_backoff(aws, table, monkeypatch):
+    calls = _throttle(monkeypatch, aws, 'batch_write_item', 'UnprocessedItems', rounds=3)
+
+    dynamo_batch.batch_write(TABLE, _items(5))
+
+    assert [len(call[TABLE]) for call in calls] == [5, 4, 3, 2]
+    assert len(_stored()) == 5
+    assert table == [0.05, 0.1, 0.2]
+
+
+def test_writes_give_up_after_max_attempts(aws, table, monkeypatch):
+    _throttle(monkeypatch, aws, 'batch_write_item', 'UnprocessedItems', rounds=100)
+
+    with pytest.raises(dynamo_batch.UnprocessedItemsError) as error:
+        dynamo_batch.batch_write(TABLE, _items(10))
+
+    assert error.value.count == 10 - dynamo_batch.MAX_ATTEMPTS
+    assert len(table) == dynamo_batch.MAX_ATTEMPTS - 1
+
+
+def test_unprocessed_keys_are_resent(aws, table, monkeypatch):
+    dynamo_batch.batch_write(TABLE, _items(4))
+    calls = _throttle(monkeypatch, aws, 'batch_get_item', 'UnprocessedKeys', rounds=2)
+
+    found = dynamo_batch.batch_get(TABLE, [{'pk': f"k{i}"} for i in range(5)], projection=['pk'])
+
+    assert sorted(item['pk'] for item in found) == ['k0', 'k1', 'k2', 'k3']
+    assert all(set(item) == {'pk'} for item in found)
+    assert [len(call[TABLE]['Keys']) for call in calls] == [5, 4, 3]
+
+
+def test_retry_stops_at_the_deadline(aws, table, monkeypatch):
+    _throttle(monkeypatch, aws, 'batch_write_item', 'UnprocessedItems', rounds=100)
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        dynamo_batch.batch_write(TABLE, _items(3), deadline=deadlines.Deadline(0))
+
+    assert table == []
@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import pytest
+
+from conftest import create_table
+import dynamo_batch
+import history_transfer
+import vocabulary_search
+
+
+@pytest.fixture
+def started(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(history_transfer, 'start_job', lambda context, job: jobs.append(job) or {'statusCode': 202})
+    return jobs
+
+
+@pytest.mark.parametrize('source_key', [
+    'history/someone-else/job/export.ndjson.gz',
+    'history/user-10/job/export.ndjson.gz',
+    'history/user-1/job/export.json',
+    'audio/user-1/export.ndjson.gz',
+])
+def test_import_rejects_keys_outside_the_callers_exports(started, source_key):
+    response = history_transfer.request_import(None, 'user-1', {'sourceKey': source_key})
+
+    assert response['statusCode'] == 400
+    assert 'error' in json.loads(response['body'])
+    assert started == []
+
+
+def test_import_accepts_the_callers_own_export(started):
+    response = history_transfer.request_import(None, 'user-1', {'sourceKey': 'history/user-1/job/export.ndjson.gz'})
+
+    assert response['statusCode'] == 202
+    assert started[0]['sourceKey'] == 'history/user-1/job/export.ndjson.gz'
+    assert started[0]['userId'] == 'user-1'
+
+
+BUCKET = 'media-bucket'
+
+
+@pytest.fixture
+def tables(aws, monkeypatch):
+    monkeypatch.setattr(history_transfer, 'BUCKET_NAME', BUCKET)
+    aws.client('s3').create_bucket(Bucket=BUCKET)
+    create_table(history_transfer.VOCABULARY_TABLE, 'userId', 'wordId')
+    create_table(history_transfer.LESSONS_TABLE, 'lessonId')
+    create_table(vocabulary_search.VOCABULARY_SEARCH_TABLE, 'userId', 'term')
+    return aws
+
+
+def _upload(aws, key, *records):
+    lines = ''.join(json.dumps(record) + '\n' for record in records)
+    aws.client('s3').put_object(Bucket=BUCKET, Key=key, Body=gzip.compress(lines.encode('utf-8')))
+
+
+def _lessons():
+    return dynamo_batch.dynamodb.Table(history_transfer.LESSONS_TABLE).scan()['Items']
+
+
+def test_import_cannot_overwrite_another_users_lessons(tables):
+    lessons = dynamo_batch.dynamodb.Table(history_transfer.LESSONS_TABLE)
+    lessons.put_item(Item={'lessonId': 'victim-lesson', 'userId': 'victim', 'cacheKey': 'ck', 'topic': 'food'})
+    key = 'history/attacker/job/import.ndjson.gz'
+    # The header names the importer, as a forged file would
+    _upload(tables, key,
+            {'type': 'header', 'version': history_transfer.FORMAT_VERSION, 'userId': 'attacker'},
+            {'type': 'lesson', 'item': {'lessonId': 'victim-lesson', 'userId': 'victim', 'cacheKey': 'ck',
+                                        'topic': 'forged', 'createdAt': '2024-01-01', 'audioKey': 'x'}})
+
+    history_transfer.import_history('attacker', key)
+
+    victim = lessons.get_item(Key={'lessonId': 'victim-lesson'})['Item']
+    assert victim['topic'] == 'food' and victim['userId'] == 'victim'
+    [copy] = [item for item in _lessons() if item['lessonId'] != 'victim-lesson']
+    assert copy['userId'] == 'attacker'
+    assert copy['sourceLessonId'] == 'victim-lesson'
+    assert 'cacheKey' not in copy and 'audioKey' not in copy
+
+
+def test_reimporting_a_copy_keeps_its_id(tables):
+    key = 'history/u1/job/import.ndjson.gz'
+    header = {'type': 'header', 'version': history_transfer.FORMAT_VERSION, 'userId': 'u1'}
+    _upload(tables, key, header, {'type': 'lesson', 'item': {'lessonId': 'l1', 'topic': 'food'}})
+    history_transfer.import_history('u1', key)
+    [copy] = _lessons()
+
+    _upload(tables, key, header, {'type': 'lesson', 'item': dict(copy)})
+    history_transfer.import_history('u1', key)
+
+    assert [item['lessonId'] for item in _lessons()] == [copy['lessonId']]
+
+
+def test_imported_words_belong_to_the_importer(tables):
+    key = 'history/u1/job/import.ndjson.gz'
+    _upload(tables, key,
+            {'type': 'header', 'version': history_transfer.FORMAT_VERSION, 'userId': 'someone-else'},
+            {'type': 'vocabulary', 'item': {'userId': 'victim', 'wordId': 'w1', 'word': 'makan',
+                                            'translation': 'eat', 'isAdmin': True}})
+
+    result = history_transfer.import_history('u1', key)
+
+    assert result['vocabulary'] == 1
+    [word] = dynamo_batch.dynamodb.Table(history_transfer.VOCABULARY_TABLE).scan()['Items']
+    assert word['userId'] == 'u1' and word['wordId'] == 'w1'
+    assert 'isAdmin' not in word
+
+
+@pytest.mark.parametrize('record', [
+    {'type': 'vocabulary', 'item': {'word': 'makan'}},
+    {'type': 'vocabulary', 'item': {'wordId': {'S': 'w1'}}},
+    {'type': 'lesson', 'item': {'lessonId': ''}},
+    {'type': 'lesson', 'item': {'lessonId': 'l1', 'sourceLessonId': 7}},
+])
+def test_rows_without_a_usable_key_fail_the_import(tables, record):
+    key = 'history/u1/job/import.ndjson.gz'
+    _upload(tables, key, {'type': 'header', 'version': history_transfer.FORMAT_VERSION}, record)
+
+    with pytest.raises(ValueError):
+        history_transfer.import_history('u1', key)
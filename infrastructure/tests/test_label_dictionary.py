@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import build_label_dictionary
+import label_dictionary
+import model_router
+from language_config import LANGUAGE_CONFIG
+
+TARGET_LANGUAGES = [code for code in LANGUAGE_CONFIG['SUPPORTED_LANGUAGES'] if code != 'en']
+
+
+@pytest.fixture
+def output(tmp_path, monkeypatch):
+    monkeypatch.setattr(label_dictionary, 'DICTIONARY_DIR', str(tmp_path))
+    monkeypatch.setattr(label_dictionary, '_loaded', {})
+    return tmp_path
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Fake label_translation task: translates everything it is given unless told to drop labels"""
+    fake = {'batches': [], 'drop': set()}
+
+    def converse(task, validate=None, messages=None, **kwargs):
+        assert task == 'label_translation'
+        prompt = messages[0]['content'][0]['text']
+        labels = json.loads(prompt[prompt.index('['):prompt.index(']') + 1])
+        fake['batches'].append(labels)
+        reply = json.dumps({label: f"{label}-x" for label in labels if label not in fake['drop']})
+        return validate(reply, True), 'model'
+
+    monkeypatch.setattr(model_router, 'converse', converse)
+    return fake
+
+
+def _taxonomy(tmp_path, *labels):
+    path = tmp_path / 'taxonomy.csv'
+    path.write_text('Label Name,Parents\n' + ''.join(f"{label},x\n" for label in labels) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_build_writes_every_language(output, model):
+    taxonomy = _taxonomy(output, 'Cat', 'Dog', 'Cat', 'Cell Phone')
+
+    assert build_label_dictionary.main([taxonomy, '--output', str(output), '--strict']) == 0
+
+    assert sorted(p.stem for p in output.glob('*.json')) == sorted(TARGET_LANGUAGES)
+    assert label_dictionary.lookup('Cell Phone', 'Malay') == 'Cell Phone-x'
+    assert label_dictionary.lookup('Cat', 'English') == 'Cat'
+    assert label_dictionary.lookup('Bird', 'ms') is None
+    assert model['batches'][0] == ['Cat', 'Cell Phone', 'Dog']
+
+
+def test_rebuild_only_translates_new_labels(output, model):
+    build_label_dictionary.main([_taxonomy(output, 'Cat'), '--output', str(output), '--languages', 'ms'])
+    model['batches'].clear()
+
+    build_label_dictionary.main([_taxonomy(output, 'Cat', 'Dog'), '--output', str(output), '--languages', 'ms'])
+    build_label_dictionary.main([_taxonomy(output, 'Cat', 'Dog'), '--output', str(output), '--languages', 'ms'])
+
+    assert model['batches'] == [['Dog']]
+
+
+def test_strict_build_fails_on_missing_translations(output, model):
+    model['drop'] = {'Dog'}
+    taxonomy = _taxonomy(output, 'Cat', 'Dog', 'Bird')
+
+    assert build_label_dictionary.main([taxonomy, '--output', str(output), '--languages', 'ms', '--strict']) == 1
+    assert build_label_dictionary.main([taxonomy, '--output', str(output), '--languages', 'ms']) == 0
+
+
+def test_unknown_language_is_rejected(output, model):
+    with pytest.raises(SystemExit):
+        build_label_dictionary.main([_taxonomy(output, 'Cat'), '--languages', 'xx'])
+
+
+def test_missing_dictionary_is_a_miss(output):
+    assert label_dictionary.lookup('Cat', 'Klingon') is None
+    assert label_dictionary.lookup('Cat', 'ms') is None
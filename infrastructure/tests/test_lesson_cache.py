@@ -0,0 +1,114 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import create_table
+import bedrock_invoke
+import language_config
+import lesson_cache
+import lesson_generator
+
+KEY = lesson_cache.cache_key('Malay', 'English', 'beginner', 'market', [])
+
+
+@pytest.fixture
+def tables(aws):
+    create_table(lesson_cache.LESSONS_TABLE, 'lessonId',
+                 indexes=[(lesson_cache.INDEX_NAME, 'cacheKey', 'createdAt')])
+    create_table(lesson_cache.USERS_TABLE, 'userId')
+    language_config.clear_language_cache()
+    yield aws.resource('dynamodb')
+    language_config.clear_language_cache()
+
+
+def _add_variants(tables, count, key=KEY, age_days=0):
+    created = datetime.utcnow() - timedelta(days=age_days)
+    table = tables.Table(lesson_cache.LESSONS_TABLE)
+    ids = []
+    for i in range(count):
+        lesson_id = f"v{age_days}-{i}"
+        table.put_item(Item={
+            'lessonId': lesson_id, 'cacheKey': key, 'lesson': {'title': lesson_id},
+            'createdAt': (created - timedelta(minutes=i)).isoformat(),
+        })
+        ids.append(lesson_id)
+    return ids
+
+
+def test_cache_key_ignores_topic_spelling_and_weak_area_order():
+    assert lesson_cache.cache_key('Malay', 'English', 'Beginner', 'Food and Drinks!', ['Tones', 'plurals']) == \
+        lesson_cache.cache_key('malay', 'english', 'beginner', 'food and drink', [' plurals', 'TONES'])
+    assert lesson_cache.cache_key('Malay', 'English', 'beginner', 'food', []).endswith('|none')
+    assert lesson_cache.cache_key('Malay', 'English', 'beginner', 'market', []) != \
+        lesson_cache.cache_key('Malay', 'English', 'advanced', 'market', [])
+
+
+def test_no_variant_until_the_bucket_has_enough(tables):
+    _add_variants(tables, lesson_cache.MIN_VARIANTS - 1)
+
+    assert lesson_cache.find_variant(KEY) is None
+
+
+def test_stale_variants_are_not_served(tables):
+    _add_variants(tables, lesson_cache.MIN_VARIANTS, age_days=lesson_cache.FRESHNESS_DAYS + 1)
+    _add_variants(tables, lesson_cache.MIN_VARIANTS, key='other|key')
+
+    assert lesson_cache.find_variant(KEY) is None
+
+
+def test_variants_the_user_has_seen_are_skipped(tables):
+    ids = _add_variants(tables, 4)
+
+    served = {lesson_cache.find_variant(KEY, ids[:3])['lessonId'] for _ in range(10)}
+
+    assert served == {ids[3]}
+
+
+def test_seen_pool_with_room_grows_instead_of_repeating(tables):
+    ids = _add_variants(tables, 4)
+
+    assert lesson_cache.find_variant(KEY, ids) is None
+
+
+def test_full_seen_pool_serves_the_least_recently_served(tables):
+    ids = _add_variants(tables, lesson_cache.MAX_VARIANTS)
+    history = ids[3:] + ids[:3]
+
+    assert lesson_cache.find_variant(KEY, history)['lessonId'] == ids[3]
+
+
+def test_served_history_is_trimmed_and_saved(tables):
+    history = [f"v{i}" for i in range(lesson_cache.RECENT_VARIANTS_KEPT)]
+
+    updated = lesson_cache.remember_served('u1', 'v5', history)
+
+    assert updated[-1] == 'v5' and len(updated) == lesson_cache.RECENT_VARIANTS_KEPT
+    assert updated.count('v5') == 1
+    stored = tables.Table(lesson_cache.USERS_TABLE).get_item(Key={'userId': 'u1'})['Item']
+    assert stored['recentLessonVariants'] == updated
+
+
+def test_handler_serves_a_cached_variant_without_the_model(tables, monkeypatch):
+    ids = _add_variants(tables, lesson_cache.MIN_VARIANTS)
+    tables.Table(lesson_cache.USERS_TABLE).put_item(Item={
+        'userId': 'u1', 'nativeLanguage': 'en', 'targetLanguage': 'ms', 'proficiency': 'beginner',
+        'recentLessonVariants': ids[:2],
+    })
+
+    def invoke(operation, deadline=None, **request):
+        raise AssertionError('a cached lesson should not reach Bedrock')
+
+    monkeypatch.setattr(bedrock_invoke, 'invoke', invoke)
+    monkeypatch.setattr(lesson_generator, 'lesson_audio_urls', lambda lesson, language, deadline=None: {})
+
+    response = lesson_generator.handler({'body': json.dumps({'userId': 'u1', 'topic': 'Market'})}, None)
+
+    body = json.loads(response['body'])
+    assert response['statusCode'] == 200
+    assert body['method'] == 'lesson_cache'
+    assert body['lesson'] == {'title': ids[2]}
+    stored = tables.Table(lesson_cache.LESSONS_TABLE).get_item(Key={'lessonId': body['lessonId']})['Item']
+    assert stored['sourceLessonId'] == ids[2] and 'cacheKey' not in stored
+    user = tables.Table(lesson_cache.USERS_TABLE).get_item(Key={'userId': 'u1'})['Item']
+    assert user['recentLessonVariants'] == ids
@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+from conftest import create_table
+import bedrock_invoke
+import lesson_generator
+import llm_json
+import model_router
+import speech_cache
+
+LESSONS_TABLE = 'language-learning-lessons'
+
+
+def _lesson(vocabulary=10, exercises=3):
+    return {
+        'title': 'Di pasar',
+        'content': 'Membeli buah di pasar.',
+        'vocabulary': [{'word': f"kata{i}", 'translation': f"word{i}"} for i in range(vocabulary)],
+        'phrases': [{'phrase': f"frasa {i}", 'translation': f"phrase {i}"} for i in range(5)],
+        'grammar_focus': 'Penanda jamak',
+        'cultural_note': 'Tawar-menawar adalah biasa.',
+        'exercises': [{'question': f"q{i}", 'answer': f"a{i}"} for i in range(exercises)],
+    }
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    """Fake Bedrock: streams ``stream_text`` and answers converse calls with ``reply``"""
+    fake = {'stream_text': '', 'reply': None, 'calls': []}
+
+    def invoke(operation, deadline=None, **request):
+        fake['calls'].append(operation)
+        if operation == 'converse_stream':
+            text = fake['stream_text']
+            chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+            events = [{'contentBlockDelta': {'delta': {'text': chunk}}} for chunk in chunks]
+            return {'stream': events}, request['modelId']
+        return {'output': {'message': {'content': [{'text': fake['reply']}]}}}, request['modelId']
+
+    monkeypatch.setattr(bedrock_invoke, 'invoke', invoke)
+    return fake
+
+
+@pytest.fixture
+def lessons(aws):
+    create_table(LESSONS_TABLE, 'lessonId')
+    table = aws.resource('dynamodb').Table(LESSONS_TABLE)
+    table.put_item(Item={'lessonId': 'l1', 'userId': 'u1', 'status': 'GENERATING', 'sections': {}})
+    return table
+
+
+def _run():
+    lesson_generator.run_streaming_lesson({
+        'lessonId': 'l1', 'userId': 'u1', 'targetLanguageCode': 'ms', 'targetLanguage': 'Malay',
+        'nativeLanguage': 'English', 'topic': 'market', 'level': 'beginner', 'weakAreas': [],
+        'cacheKey': 'key', 'recentlyServed': [], 'preSynthesizeAudio': False
+    }, None)
+
+
+def test_streamed_lesson_is_normalized_before_it_is_saved(lessons, bedrock):
+    lesson = _lesson(vocabulary=12, exercises=4)
+    lesson['vocabulary'].insert(3, {'word': 'separuh'})
+    bedrock['stream_text'] = 'Here you go:\n```json\n' + json.dumps(lesson) + '\n```'
+
+    _run()
+
+    item = lessons.get_item(Key={'lessonId': 'l1'})['Item']
+    assert item['status'] == 'COMPLETED'
+    assert 'sections' not in item
+    assert len(item['lesson']['vocabulary']) == llm_json.LESSON_VOCABULARY_RANGE[1]
+    assert all(entry.get('translation') for entry in item['lesson']['vocabulary'])
+    assert len(item['lesson']['exercises']) == llm_json.LESSON_EXERCISES
+    assert item['cacheKey'] == 'key'
+    assert item['method'] == model_router.model_for('lesson')
+    assert bedrock['calls'] == ['converse_stream']
+
+
+def test_invalid_streamed_lesson_is_repaired(lessons, bedrock):
+    bedrock['stream_text'] = json.dumps(_lesson(exercises=1))
+    bedrock['reply'] = json.dumps(_lesson())
+
+    _run()
+
+    item = lessons.get_item(Key={'lessonId': 'l1'})['Item']
+    assert item['status'] == 'COMPLETED'
+    assert len(item['lesson']['exercises']) == llm_json.LESSON_EXERCISES
+    assert bedrock['calls'] == ['converse_stream', 'converse']
+
+
+def test_unrepairable_streamed_lesson_fails(lessons, bedrock):
+    bedrock['stream_text'] = json.dumps(_lesson(vocabulary=2))
+    bedrock['reply'] = json.dumps(_lesson(vocabulary=2))
+
+    _run()
+
+    item = lessons.get_item(Key={'lessonId': 'l1'})['Item']
+    assert item['status'] == 'FAILED'
+    assert 'lesson' not in item
+
+
+def test_generated_lesson_reports_the_model_used(bedrock, monkeypatch):
+    # The pro tier is throttled and the request is served by its fallback
+    def invoke(operation, deadline=None, **request):
+        return {'output': {'message': {'content': [{'text': json.dumps(_lesson())}]}}}, 'fallback-model'
+
+    monkeypatch.setattr(bedrock_invoke, 'invoke', invoke)
+
+    lesson, model_id = lesson_generator.generate_bedrock_lesson('Malay', 'English', 'market', 'beginner', [])
+
+    assert lesson['title'] == 'Di pasar'
+    assert model_id == 'fallback-model'
+
+
+def test_stored_lesson_audio_is_restored_when_it_has_expired(lessons, monkeypatch, aws):
+    monkeypatch.setattr(speech_cache, 'BUCKET_NAME', 'media-bucket')
+    monkeypatch.setattr(speech_cache, '_index', speech_cache.OrderedDict())
+    aws.client('s3').create_bucket(Bucket='media-bucket')
+    lesson = _lesson()
+    lesson_generator.attach_lesson_audio(lesson, 'ms')
+    # Forged or stale keys on the stored lesson are not trusted
+    lesson['vocabulary'][0]['audioKey'] = 'history/someone/export.ndjson.gz'
+    del lesson['phrases'][0]['audioKey']
+    lessons.put_item(Item={'lessonId': 'l2', 'userId': 'u1', 'targetLanguage': 'Malay', 'lesson': lesson})
+    expired = lesson['vocabulary'][1]['audioKey']
+    aws.client('s3').delete_object(Bucket='media-bucket', Key=expired)
+    speech_cache._index.clear()
+
+    response = lesson_generator.get_lesson({'queryStringParameters': {'lessonId': 'l2', 'userId': 'u1'}})
+
+    urls = json.loads(response['body'])['audioUrls']
+    assert len(urls) == len(lesson['vocabulary']) + len(lesson['phrases']) - 1
+    assert all(key.startswith(speech_cache.KEY_PREFIX) for key in urls)
+    assert expired in urls
+    aws.client('s3').head_object(Bucket='media-bucket', Key=expired)
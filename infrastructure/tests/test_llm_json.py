@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+import llm_json
+from llm_json import LLMJSONError, extract_json, parse_with_repair, validate_lesson, validate_quiz
+
+
+def question(text='Apa khabar?', correct=0):
+    return {'question': text, 'options': ['a', 'b', 'c', "I don't know"], 'correct': correct}
+
+
+def lesson(**overrides):
+    value = {
+        'title': 'Greetings',
+        'content': 'Saying hello',
+        'grammar_focus': 'Word order',
+        'cultural_note': 'Salam',
+        'vocabulary': [{'word': f'w{i}', 'translation': f't{i}'} for i in range(9)],
+        'phrases': [{'phrase': f'p{i}', 'translation': f't{i}'} for i in range(5)],
+        'exercises': ['one', 'two', 'three', 'four'],
+    }
+    value.update(overrides)
+    return value
+
+
+def test_plain_object():
+    assert extract_json('{"a": 1}') == {'a': 1}
+
+
+def test_preamble_and_code_fence():
+    text = 'Sure! Here is the lesson:\n```json\n{"a": [1, 2]}\n```\nEnjoy.'
+    assert extract_json(text) == {'a': [1, 2]}
+
+
+def test_value_at_the_first_opener_is_used():
+    # A bracket in commentary is the first opener; validation then rejects it
+    assert extract_json('Here are [10] questions: [{"question": "q1"}]', '[') == [10]
+
+
+def test_unparseable_first_opener_raises():
+    with pytest.raises(LLMJSONError):
+        extract_json('Options [a, b] follow: [1, 2, 3]', '[')
+
+
+def test_malformed_outer_value_does_not_yield_an_inner_fragment():
+    text = '{"title": "Greetings" "vocabulary": [{"word": "a", "translation": "b"}]}'
+    with pytest.raises(LLMJSONError):
+        extract_json(text)
+
+
+def test_nested_openers_are_not_reparsed():
+    assert extract_json('{"a": {"b": [1]}}') == {'a': {'b': [1]}}
+
+
+def test_trailing_commas_and_raw_newlines():
+    text = '{"content": "line one\nline two", "items": [1, 2,],}'
+    assert extract_json(text) == {'content': 'line one\nline two', 'items': [1, 2]}
+
+
+def test_smart_quotes():
+    assert extract_json('{“a”: “b”}') == {'a': 'b'}
+
+
+def test_quotes_inside_strings_are_kept():
+    assert extract_json('{"a": "say “hi”", "b": “a "quoted" word”}') == {'a': 'say “hi”', 'b': 'a "quoted" word'}
+
+
+def test_truncated_output_is_closed_at_last_complete_member():
+    text = '{"vocabulary": [{"word": "a"}, {"word": "b"}, {"word": "c'
+    assert extract_json(text) == {'vocabulary': [{'word': 'a'}, {'word': 'b'}]}
+
+
+def test_no_json_raises():
+    with pytest.raises(LLMJSONError):
+        extract_json('I cannot help with that.')
+
+
+def test_validate_lesson_trims_and_accepts():
+    errors, value = validate_lesson(lesson())
+    assert errors == []
+    assert len(value['exercises']) == llm_json.LESSON_EXERCISES
+
+
+def test_validate_lesson_reports_missing_fields():
+    errors, _ = validate_lesson(lesson(title='', vocabulary=[{'word': 'x'}]))
+    assert any("'title'" in e for e in errors)
+    assert any("'vocabulary'" in e for e in errors)
+
+
+def test_validate_quiz_filters_bad_questions():
+    questions = [question(), question(correct=3), {'question': 'no options'}, question(correct='1')]
+    errors, valid = validate_quiz(questions, 2)
+    assert errors == []
+    assert [q['correct'] for q in valid] == [0, 1]
+
+
+def test_validate_quiz_unwraps_object_and_reports_shortfall():
+    errors, valid = validate_quiz({'questions': [question()]}, 3)
+    assert len(valid) == 1
+    assert errors == ['Expected 3 valid questions, got 1']
+
+
+def test_parse_with_repair_skips_repair_when_local_fix_works():
+    def repair(text, problem):
+        raise AssertionError('repair should not be called')
+
+    text = 'Here are the questions:\n```json\n[%s, %s,]\n```' % (
+        '{"question": "a", "options": ["1", "2", "3", "x"], "correct": 0}',
+        '{"question": "b", "options": ["1", "2", "3", "x"], "correct": 2}',
+    )
+    value = parse_with_repair(text, '[', lambda v: validate_quiz(v, 2), repair)
+    assert [q['question'] for q in value] == ['a', 'b']
+
+
+def test_malformed_lesson_goes_to_repair():
+    calls = []
+    broken = '{"title": "Greetings" "vocabulary": [{"word": "a", "translation": "b"}]}'
+
+    def repair(text, problem):
+        calls.append(text)
+        return json.dumps(lesson())
+
+    value = parse_with_repair(broken, '{', validate_lesson, repair)
+    assert value['title'] == 'Greetings'
+    assert calls == [broken]
+
+
+def test_parse_with_repair_calls_repair_once():
+    calls = []
+
+    def repair(text, problem):
+        calls.append(problem)
+        return '[{"question": "a", "options": ["1", "2", "3", "x"], "correct": 1}]'
+
+    value = parse_with_repair('no json here', '[', lambda v: validate_quiz(v, 1), repair)
+    assert value[0]['correct'] == 1
+    assert len(calls) == 1
+
+
+def test_parse_with_repair_without_repair_raises():
+    with pytest.raises(LLMJSONError):
+        parse_with_repair('[]', '[', lambda v: validate_quiz(v, 1))
@@ -0,0 +1,77 @@
+import base64
+
+import pytest
+
+import multipart
+
+BOUNDARY = '----FormBoundary7MA4YWxk'
+AUDIO = bytes(range(256)) + b'\r\n--not-a-boundary\r\n' + b'\x00' * 16
+
+
+def _body(*parts, closing=True):
+    chunks = []
+    for headers, data in parts:
+        chunks.append(f"--{BOUNDARY}\r\n{headers}\r\n\r\n".encode() + data + b'\r\n')
+    if closing:
+        chunks.append(f"--{BOUNDARY}--\r\n".encode())
+    return b''.join(chunks)
+
+
+BODY = _body(
+    ('Content-Disposition: form-data; name="userId"', 'u1'.encode()),
+    ('Content-Disposition: form-data; name="audio"; filename="clip.wav"\r\nContent-Type: audio/wav', AUDIO),
+    ('Content-Disposition: form-data; name="expectedText"', 'Selamat pagi ñ'.encode()),
+)
+
+
+def _event(body=BODY, base64_encoded=True, header='Content-Type'):
+    return {
+        'headers': {header: f'multipart/form-data; boundary="{BOUNDARY}"'},
+        'body': base64.b64encode(body).decode() if base64_encoded else body.decode('latin-1'),
+        'isBase64Encoded': base64_encoded,
+    }
+
+
+def test_fields_and_binary_file_survive_intact():
+    parts = multipart.parse_event(_event())
+
+    assert multipart.field_text(parts, 'userId') == 'u1'
+    assert multipart.field_text(parts, 'expectedText') == 'Selamat pagi ñ'
+    audio = multipart.first_file(parts)
+    assert audio.name == 'audio' and audio.filename == 'clip.wav' and audio.content_type == 'audio/wav'
+    assert bytes(audio.data) == AUDIO
+
+
+def test_parts_are_views_of_the_body():
+    parts = multipart.parse(BODY, f"multipart/form-data; boundary={BOUNDARY}")
+
+    assert isinstance(parts['audio'].data, memoryview)
+    assert parts['audio'].data.obj is BODY
+
+
+def test_header_lookup_is_case_insensitive():
+    event = _event(header='content-type')
+
+    assert multipart.is_multipart(event)
+    assert multipart.field_text(multipart.parse_event(event), 'userId') == 'u1'
+
+
+def test_missing_closing_delimiter_is_tolerated():
+    body = _body(('Content-Disposition: form-data; name="userId"', b'u1'), closing=False)
+
+    parts = multipart.parse(body, f"multipart/form-data; boundary={BOUNDARY}")
+
+    assert multipart.field_text(parts, 'userId') == 'u1'
+
+
+def test_missing_boundary_is_an_error():
+    with pytest.raises(ValueError):
+        multipart.parse(BODY, 'multipart/form-data')
+
+
+def test_missing_fields_fall_back_to_defaults():
+    parts = multipart.parse(BODY, f"multipart/form-data; boundary={BOUNDARY}")
+
+    assert multipart.field_text(parts, 'language') is None
+    assert multipart.field_text(parts, 'language', 'ms') == 'ms'
+    assert multipart.get_header({}, 'Content-Type', 'x') == 'x'
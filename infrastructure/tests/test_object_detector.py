@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import bedrock_invoke
+import deadlines
+import label_dictionary
+import model_router
+import object_detector
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Fake model_router: batch requests answer ``batch``, single-label ones ``single``"""
+    fake = {'calls': [], 'batch': {}, 'single': {}, 'error': None}
+
+    def converse(task, validate=None, deadline=None, messages=None, **kwargs):
+        fake['calls'].append(task)
+        if fake['error']:
+            raise fake['error']
+        prompt = messages[0]['content'][0]['text']
+        if task == 'label_translation':
+            reply = json.dumps(fake['batch'])
+        else:
+            label = prompt.split("'")[1]
+            reply = fake['single'].get(label, label)
+        return validate(reply, True), 'model'
+
+    monkeypatch.setattr(model_router, 'converse', converse)
+    monkeypatch.setattr(label_dictionary, '_loaded', {'ms': {'Cat': 'Kucing', 'Dog': 'Anjing'}})
+    return fake
+
+
+def test_labels_are_translated_in_one_request(model):
+    model['batch'] = {'Chair': 'Kerusi', 'Table': 'Meja', 'Lamp': 'Lampu'}
+
+    translations = object_detector.translate_labels_with_bedrock(['Chair', 'Table', 'Lamp', 'Chair'], 'Malay')
+
+    assert translations == {'Chair': 'Kerusi', 'Table': 'Meja', 'Lamp': 'Lampu'}
+    assert model['calls'] == ['label_translation']
+
+
+def test_dictionary_hits_skip_the_model(model):
+    translations = object_detector.translate_labels_with_bedrock(['Cat', 'Dog'], 'Malay')
+
+    assert translations == {'Cat': 'Kucing', 'Dog': 'Anjing'}
+    assert model['calls'] == []
+
+
+def test_only_dictionary_misses_are_sent(model, monkeypatch):
+    prompts = []
+    converse = model_router.converse
+
+    def record(task, **kwargs):
+        prompts.append(kwargs['messages'][0]['content'][0]['text'])
+        return converse(task, **kwargs)
+
+    monkeypatch.setattr(model_router, 'converse', record)
+    model['batch'] = {'Chair': 'Kerusi'}
+
+    translations = object_detector.translate_labels_with_bedrock(['Cat', 'Chair'], 'Malay')
+
+    assert translations == {'Cat': 'Kucing', 'Chair': 'Kerusi'}
+    assert '["Chair"]' in prompts[0]
+
+
+def test_labels_the_batch_missed_fall_back_per_label(model):
+    model['batch'] = {'Chair': 'Kerusi', 'Table': 'Meja'}
+    model['single'] = {'Lamp': 'Lampu'}
+
+    translations = object_detector.translate_labels_with_bedrock(['Chair', 'Table', 'Lamp'], 'Malay')
+
+    assert translations['Lamp'] == 'Lampu'
+    assert model['calls'] == ['label_translation', 'word_translation']
+
+
+def test_busy_model_keeps_dictionary_answers(model):
+    model['error'] = bedrock_invoke.BedrockUnavailable('busy')
+
+    translations = object_detector.translate_labels_with_bedrock(['Cat', 'Chair'], 'Malay')
+
+    assert translations == {'Cat': 'Kucing'}
+    assert model['calls'] == ['label_translation']
+
+
+def test_no_model_call_without_time_for_it(model):
+    deadline = deadlines.Deadline(object_detector.TRANSLATION_MIN_MS - 1000)
+
+    translations = object_detector.translate_labels_with_bedrock(['Cat', 'Chair'], 'Malay', deadline)
+
+    assert translations == {'Cat': 'Kucing'}
+    assert model['calls'] == []
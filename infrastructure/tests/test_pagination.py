@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+import pytest
+
+import pagination
+
+
+def test_cursor_round_trips_a_key():
+    key = {'userId': 'u1', 'wordId': 'abc', 'nextReviewAt': '2026-01-01T00:00:00', 'n': Decimal('3')}
+
+    cursor = pagination.encode_cursor(key)
+
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert pagination.decode_cursor(cursor, ('userId', 'u1')) == key
+
+
+def test_no_key_means_no_cursor():
+    assert pagination.encode_cursor(None) is None
+    assert pagination.encode_cursor({}) is None
+    assert pagination.decode_cursor(None) is None
+    assert pagination.decode_cursor('') is None
+
+
+def test_cursor_for_another_partition_is_rejected():
+    cursor = pagination.encode_cursor({'userId': 'u2', 'wordId': 'abc'})
+
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor, ('userId', 'u1'))
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', 'bnVsbA', 'W10', 'e30'])
+def test_malformed_cursors_are_rejected(cursor):
+    # 'bnVsbA' is null, 'W10' is [] and 'e30' is {}
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('value, expected', [(None, 20), ('', 20), ('5', 5), ('0', 1), ('-2', 1), ('9999', 100)])
+def test_parse_limit(value, expected):
+    assert pagination.parse_limit(value, 20, 100) == expected
+
+
+def test_parse_limit_rejects_non_integers():
+    with pytest.raises(ValueError):
+        pagination.parse_limit('ten', 20, 100)
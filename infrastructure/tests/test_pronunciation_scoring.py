@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+import pronunciation_scoring
+from pronunciation_scoring import score_utterance
+
+
+def _words(*pairs):
+    return [
+        {'content': content, 'confidence': confidence, 'startTime': i * 0.5, 'endTime': i * 0.5 + 0.4}
+        for i, (content, confidence) in enumerate(pairs)
+    ]
+
+
+def _levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def test_tokenize_folds_case_accents_and_punctuation():
+    assert pronunciation_scoring.tokenize("Café, s'il vous plaît! Apa-apa") == ['cafe', 'sil', 'vous', 'plait', 'apaapa']
+    assert pronunciation_scoring.tokenize(None) == []
+
+
+def test_vectorized_distance_matches_levenshtein():
+    expected = ['selamat', 'pagi', 'terima', 'kasih']
+    recognized = ['salamat', 'pagi', 'kasi', 'terimakasih', 'x']
+
+    costs = pronunciation_scoring.word_distance_matrix(expected, recognized)
+
+    for i, a in enumerate(expected):
+        for j, b in enumerate(recognized):
+            assert costs[i, j] == pytest.approx(_levenshtein(a, b) / max(len(a), len(b)))
+
+
+def test_alignment_marks_missing_and_inserted_words():
+    dropped = pronunciation_scoring.word_distance_matrix(['saya', 'suka', 'makan'], ['saya', 'makan'])
+    extra = pronunciation_scoring.word_distance_matrix(['apa', 'khabar'], ['apa', 'um', 'khabar'])
+
+    assert pronunciation_scoring.align_words(dropped) == [(0, 0), (1, None), (2, 1)]
+    assert pronunciation_scoring.align_words(extra) == [(0, 0), (None, 1), (1, 2)]
+
+
+def test_perfect_utterance():
+    result = score_utterance('Selamat pagi', _words(('selamat', 0.98), ('pagi', 0.95)))
+
+    assert [w['status'] for w in result['words']] == ['correct', 'correct']
+    assert result['accuracy'] == 1.0
+    assert result['completeness'] == 1.0
+    assert result['weakWords'] == []
+    assert result['overallScore'] == pytest.approx((0.98 + 0.95) / 2, abs=1e-3)
+
+
+def test_mispronounced_word_flags_its_sound_group():
+    result = score_utterance('terima kasih', _words(('terima', 0.95), ('kasi', 0.9)))
+
+    kasih = result['words'][1]
+    assert kasih['status'] == 'substituted'
+    assert kasih['score'] == pytest.approx(0.9 * 0.8, abs=1e-3)
+    assert result['weakWords'] == ['kasih']
+    # Of the two fricatives only the 's' was reproduced
+    assert result['phonemeGroups']['fricative'] == pytest.approx(0.9 / 2, abs=1e-3)
+    assert result['weakGroups'] == ['fricative']
+
+
+def test_low_confidence_match_is_unclear():
+    result = score_utterance('pagi', _words(('pagi', 0.5)))
+
+    assert result['words'][0]['status'] == 'unclear'
+    assert result['accuracy'] == 0.0
+
+
+def test_missing_word_lowers_completeness():
+    result = score_utterance('saya suka makan', _words(('saya', 1.0), ('makan', 1.0)))
+
+    assert [w['status'] for w in result['words']] == ['correct', 'missing', 'correct']
+    assert result['completeness'] == pytest.approx(2 / 3, abs=1e-3)
+    assert result['overallScore'] == pytest.approx(2 / 3, abs=1e-3)
+    assert result['weakWords'] == ['suka']
+
+
+def test_extra_word_dilutes_the_score():
+    result = score_utterance('apa khabar', _words(('apa', 1.0), ('um', 1.0), ('khabar', 1.0)))
+
+    assert [w['status'] for w in result['words']] == ['correct', 'inserted', 'correct']
+    assert result['completeness'] == 1.0
+    assert result['overallScore'] == pytest.approx(2 / 3, abs=1e-3)
+
+
+def test_digraphs_are_one_sound():
+    assert pronunciation_scoring.phoneme_units('nyanyi') == [
+        (0, 2, 'nasal'), (2, 3, 'vowel'), (3, 5, 'nasal'), (5, 6, 'vowel')
+    ]
+
+
+def test_nothing_recognized():
+    result = score_utterance('selamat pagi', [])
+
+    assert [w['status'] for w in result['words']] == ['missing', 'missing']
+    assert result['overallScore'] == 0.0
+    assert np.isfinite(result['completeness'])
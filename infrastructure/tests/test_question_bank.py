@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from conftest import create_table
+import question_bank
+import quiz_generator
+
+
+@pytest.fixture
+def bank_table(aws):
+    create_table(question_bank.QUESTION_BANK_TABLE, 'bankKey', 'questionId')
+
+
+def _questions(skill, count):
+    return [
+        {
+            'skill': skill,
+            'question': f"{skill} question {i}",
+            'options': [f"right {i}", f"wrong {i}", f"other {i}", question_bank.DONT_KNOW],
+            'correct': 0
+        }
+        for i in range(count)
+    ]
+
+
+def test_store_is_idempotent_by_content(bank_table):
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, _questions('grammar', 3))
+    question_bank.store(key, _questions('grammar', 3))
+
+    assert len(question_bank.load_pool(key)['grammar']) == 3
+
+
+def test_large_stratum_does_not_crowd_out_vocabulary(bank_table, monkeypatch):
+    # grammar# sorts before vocabulary#, so a capped partition-wide read
+    # would never reach the vocabulary questions
+    monkeypatch.setattr(question_bank, 'MAX_STRATUM_ITEMS', 4)
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, _questions('grammar', 10) + _questions('usage', 2) + _questions('vocabulary', 3))
+
+    pool = question_bank.load_pool(key)
+
+    assert len(pool['grammar']) == 4
+    assert len(pool['usage']) == 2
+    assert len(pool['vocabulary']) == 3
+    assert all(item['questionId'].startswith('vocabulary#') for item in pool['vocabulary'])
+
+
+def test_every_question_in_a_large_stratum_can_be_drawn(bank_table, monkeypatch):
+    monkeypatch.setattr(question_bank, 'MAX_STRATUM_ITEMS', 3)
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, _questions('grammar', 12))
+
+    seen = set()
+    for _ in range(40):
+        grammar = question_bank.load_pool(key)['grammar']
+        assert len(grammar) == 3
+        assert len({item['questionId'] for item in grammar}) == 3
+        seen.update(item['questionId'] for item in grammar)
+
+    assert len(seen) == 12
+
+
+def test_small_stratum_is_read_whole_from_any_start(bank_table):
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, _questions('usage', 7))
+
+    for _ in range(10):
+        assert len(question_bank.load_pool(key)['usage']) == 7
+
+
+@pytest.mark.parametrize('level, expected', [
+    ('beginner', 'beginner'),
+    ('Upper Intermediate', 'upper-intermediate'),
+    (' ADVANCED ', 'advanced'),
+])
+def test_level_is_normalized(level, expected):
+    assert question_bank.normalize_level(level) == expected
+    assert question_bank.bank_key('Malay', 'English', level).endswith(f"|{expected}")
+
+
+@pytest.mark.parametrize('level', ['', None, 'expert', 'beginner|x', 'x' * 500])
+def test_unknown_levels_never_make_a_bank_key(level):
+    with pytest.raises(ValueError):
+        question_bank.bank_key('Malay', 'English', level)
+
+
+def test_quiz_with_unknown_level_is_rejected(bank_table):
+    response = quiz_generator.handler(
+        {'body': json.dumps({'userId': 'u1', 'difficulty': 'wizard'})}, None
+    )
+
+    assert response['statusCode'] == 400
+
+
+def test_pool_is_per_bank_key(bank_table):
+    question_bank.store(question_bank.bank_key('Malay', 'English', 'beginner'), _questions('usage', 2))
+
+    pool = question_bank.load_pool(question_bank.bank_key('Malay', 'English', 'advanced'))
+
+    assert pool == {skill: [] for skill in question_bank.SKILLS}
+
+
+def test_sample_reports_shortfall():
+    pool = {'vocabulary': [{'questionId': 'v'}], 'grammar': [], 'usage': [{'questionId': 'u1'}, {'questionId': 'u2'}]}
+
+    picked, shortfall = question_bank.sample(pool, {'vocabulary': 2, 'grammar': 1, 'usage': 1})
+
+    assert len(picked) == 2
+    assert shortfall == {'vocabulary': 1, 'grammar': 1}
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, quiz_generator.DEFAULT_QUESTION_COUNT),
+    ('', quiz_generator.DEFAULT_QUESTION_COUNT),
+    (5, 5),
+    ('7', 7),
+    (0, 1),
+    (-3, 1),
+    (10_000, quiz_generator.MAX_QUESTION_COUNT),
+])
+def test_question_count_is_clamped(value, expected):
+    assert quiz_generator.parse_question_count(value) == expected
+
+
+@pytest.mark.parametrize('value', ['ten', [5], True])
+def test_question_count_must_be_an_integer(value):
+    with pytest.raises(ValueError):
+        quiz_generator.parse_question_count(value)
+
+
+def test_quiz_method_names_the_bank_and_the_model_used(bank_table, monkeypatch):
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, _questions('vocabulary', 4) + _questions('usage', 4))
+    fresh = _questions('grammar', question_bank.TOP_UP_BATCH)
+    monkeypatch.setattr(quiz_generator, 'generate_bedrock_quiz',
+                        lambda *args, **kwargs: (fresh, 'amazon.nova-lite-v1:0'))
+
+    quiz, method = quiz_generator.build_quiz('Malay', 'English', 'beginner', 6)
+
+    assert len(quiz) == 6
+    assert {q['skill'] for q in quiz} == set(question_bank.SKILLS)
+    assert method == 'question_bank+amazon.nova-lite-v1:0'
+
+
+def test_quiz_served_from_the_bank_alone(bank_table):
+    key = question_bank.bank_key('Malay', 'English', 'beginner')
+    question_bank.store(key, [q for skill in question_bank.SKILLS for q in _questions(skill, 3)])
+
+    quiz, method = quiz_generator.build_quiz('Malay', 'English', 'beginner', 6)
+
+    assert len(quiz) == 6
+    assert method == 'question_bank'
@@ -0,0 +1,66 @@
+import pytest
+
+import speech_cache
+
+BUCKET = 'media-bucket'
+
+
+@pytest.fixture
+def bucket(aws, monkeypatch):
+    monkeypatch.setattr(speech_cache, 'BUCKET_NAME', BUCKET)
+    monkeypatch.setattr(speech_cache, '_index', speech_cache.OrderedDict())
+    aws.client('s3').create_bucket(Bucket=BUCKET)
+    return aws.client('s3')
+
+
+def _synthesize(text='selamat pagi'):
+    return speech_cache.synthesize(text, 'Aditi', 'ms-MY')
+
+
+def test_audio_is_synthesized_once(bucket):
+    first = _synthesize()
+    second = _synthesize()
+
+    assert first['key'].startswith(speech_cache.KEY_PREFIX)
+    assert (first['cached'], second['cached']) == (False, True)
+    assert second['key'] == first['key']
+
+
+def test_expired_audio_is_synthesized_again(bucket):
+    key = _synthesize()['key']
+    bucket.delete_object(Bucket=BUCKET, Key=key)
+    # Another container never saw it
+    speech_cache._index.clear()
+
+    result = _synthesize()
+
+    assert result['cached'] is False
+    bucket.head_object(Bucket=BUCKET, Key=key)
+
+
+def test_old_audio_is_refreshed_on_a_hit(bucket, monkeypatch):
+    key = _synthesize()['key']
+    written = bucket.head_object(Bucket=BUCKET, Key=key)['LastModified']
+    speech_cache._index.clear()
+    copies = []
+    copy = bucket.copy_object
+    monkeypatch.setattr(bucket, 'copy_object', lambda **kwargs: copies.append(kwargs) or copy(**kwargs))
+    now = speech_cache.time.time() + speech_cache.REFRESH_AFTER_SECONDS + 1
+    monkeypatch.setattr(speech_cache.time, 'time', lambda: now)
+
+    assert _synthesize()['cached'] is True
+    assert _synthesize()['cached'] is True
+
+    # Copied in place once; the index then treats it as fresh
+    assert len(copies) == 1 and copies[0]['Key'] == key
+    head = bucket.head_object(Bucket=BUCKET, Key=key)
+    assert head['ContentType'] == 'audio/mpeg'
+    assert head['LastModified'] >= written
+
+
+def test_recent_audio_is_not_rewritten(bucket, monkeypatch):
+    _synthesize()
+    speech_cache._index.clear()
+    monkeypatch.setattr(bucket, 'copy_object', lambda **kwargs: pytest.fail('refreshed a recent object'))
+
+    assert _synthesize()['cached'] is True
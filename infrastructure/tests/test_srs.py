@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+import srs
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _review_sequence(qualities):
+    state = {}
+    for quality in qualities:
+        state = srs.schedule(state, quality, NOW)
+    return state
+
+
+def test_first_correct_answers_follow_sm2_intervals():
+    intervals = []
+    state = {}
+    for _ in range(4):
+        state = srs.schedule(state, 5, NOW)
+        intervals.append(state['intervalDays'])
+
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] > 6 and intervals[3] > intervals[2]
+    assert state['repetitions'] == 4
+    assert state['reviewCount'] == state['correctCount'] == 4
+
+
+def test_lapse_resets_the_streak_and_comes_back_soon():
+    state = srs.schedule(_review_sequence([5, 5, 5]), 1, NOW)
+
+    assert state['repetitions'] == 0
+    assert state['intervalDays'] == 0
+    assert state['masteryLevel'] == 1
+    assert state['nextReviewAt'] == (NOW + timedelta(minutes=srs.LAPSE_MINUTES)).isoformat()
+    assert state['reviewCount'] == 4 and state['correctCount'] == 3
+
+
+def test_ease_never_drops_below_the_minimum():
+    state = _review_sequence([0] * 20)
+
+    assert state['easeFactor'] == Decimal(str(srs.MIN_EASE))
+
+
+def test_interval_is_capped():
+    state = srs.schedule({'easeFactor': Decimal('2.5'), 'intervalDays': 300, 'repetitions': 8}, 5, NOW)
+
+    assert state['intervalDays'] == srs.MAX_INTERVAL_DAYS
+    assert state['masteryLevel'] == 5
+
+
+def test_values_are_dynamodb_safe():
+    state = srs.schedule({}, 4, NOW)
+
+    assert isinstance(state['easeFactor'], Decimal)
+    assert not any(isinstance(v, float) for v in state.values())
+
+
+@pytest.mark.parametrize('interval, level', [(0, 1), (1, 2), (5, 2), (6, 3), (21, 4), (60, 5), (365, 5)])
+def test_mastery_levels(interval, level):
+    assert srs.mastery_level(interval) == level
+
+
+@pytest.mark.parametrize('review, quality', [
+    ({'quality': 0}, 0), ({'quality': '5'}, 5),
+    ({'correct': True}, srs.CORRECT_QUALITY), ({'correct': False}, srs.INCORRECT_QUALITY),
+])
+def test_quality_from(review, quality):
+    assert srs.quality_from(review) == quality
+
+
+@pytest.mark.parametrize('review', [{'quality': 6}, {'quality': -1}, {'correct': 'yes'}, {}])
+def test_quality_from_rejects_bad_reviews(review):
+    with pytest.raises(ValueError):
+        srs.quality_from(review)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import streaming_json
+
+LESSON = {
+    'title': 'Salam {dan} "selamat"',
+    'vocabulary': [{'word': 'makan', 'translation': 'eat'}, {'word': 'minum', 'translation': 'drink'}],
+    'level': 2,
+    'tags': ['a', 3, True, None],
+    'exercises': [],
+    'done': False,
+}
+
+
+def _feed(text, size):
+    stream = streaming_json.SectionStream()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(stream.feed(text[i:i + size]))
+    return stream, events
+
+
+@pytest.mark.parametrize('size', [1, 3, 17, 10_000])
+def test_events_do_not_depend_on_chunking(size):
+    stream, events = _feed('```json\n' + json.dumps(LESSON) + '\n```', size)
+
+    assert stream.sections == LESSON
+    assert [e for e in events if e[0] == 'section'] == [('section', k, v) for k, v in LESSON.items()]
+    assert [e for e in events if e[0] == 'item'] == [
+        ('item', 'vocabulary', 0, LESSON['vocabulary'][0]),
+        ('item', 'vocabulary', 1, LESSON['vocabulary'][1]),
+        ('item', 'tags', 0, 'a'),
+        ('item', 'tags', 1, 3),
+        ('item', 'tags', 2, True),
+        ('item', 'tags', 3, None),
+    ]
+
+
+def test_items_arrive_before_their_section_closes():
+    stream = streaming_json.SectionStream()
+
+    events = stream.feed('{"vocabulary": [{"word": "makan"}, {"word": "mi')
+
+    assert events == [('item', 'vocabulary', 0, {'word': 'makan'})]
+    assert stream.sections == {}
+
+
+def test_truncated_stream_keeps_completed_sections():
+    stream, _ = _feed('{"title": "Pasar", "content": "Di pas', 5)
+
+    assert stream.sections == {'title': 'Pasar'}
+
+
+def test_text_after_the_object_is_ignored():
+    stream, events = _feed('{"a": 1} {"b": 2}', 4)
+
+    assert stream.sections == {'a': 1}
+    assert events == [('section', 'a', 1)]
@@ -0,0 +1,83 @@
+import pytest
+from botocore.stub import Stubber
+
+from conftest import create_table
+import transcription_jobs
+
+BUCKET = 'media-bucket'
+
+
+@pytest.fixture
+def jobs(aws, monkeypatch):
+    monkeypatch.setattr(transcription_jobs, 'BUCKET_NAME', BUCKET)
+    aws.client('s3').create_bucket(Bucket=BUCKET)
+    create_table(transcription_jobs.TABLE_NAME, 'jobId')
+    return aws
+
+
+def _record(job_id):
+    return transcription_jobs.dynamodb.Table(transcription_jobs.TABLE_NAME).get_item(
+        Key={'jobId': job_id}
+    ).get('Item')
+
+
+def _audio_keys(aws):
+    return [obj['Key'] for obj in aws.client('s3').list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+
+
+def test_job_is_recorded_before_it_starts(jobs, monkeypatch):
+    seen = {}
+    start = jobs.client('transcribe').start_transcription_job
+
+    def start_job(**kwargs):
+        # The completion event may arrive as soon as the job starts
+        seen['record'] = _record(kwargs['TranscriptionJobName'])
+        return start(**kwargs)
+
+    monkeypatch.setattr(jobs.client('transcribe'), 'start_transcription_job', start_job)
+
+    job_id = transcription_jobs.submit(b'audio', 'ms-MY', 'transcribe', 'user-1')
+
+    assert seen['record']['status'] == 'PENDING'
+    assert _record(job_id)['status'] == 'IN_PROGRESS'
+    assert _record(job_id)['userId'] == 'user-1'
+
+
+def test_quota_error_removes_record_and_audio(jobs):
+    with Stubber(jobs.client('transcribe')) as stubber:
+        stubber.add_client_error('start_transcription_job', 'LimitExceededException', 'Too many jobs')
+        with pytest.raises(transcription_jobs.JobQuotaExceeded):
+            transcription_jobs.submit(b'audio', 'ms-MY', 'transcribe', 'user-1')
+
+    assert jobs.resource('dynamodb').Table(transcription_jobs.TABLE_NAME).scan()['Items'] == []
+    assert _audio_keys(jobs) == []
+
+
+def test_start_error_marks_job_failed(jobs):
+    with Stubber(jobs.client('transcribe')) as stubber:
+        stubber.add_client_error('start_transcription_job', 'InternalFailureException', 'Boom')
+        with pytest.raises(Exception):
+            transcription_jobs.submit(b'audio', 'ms-MY', 'transcribe', 'user-1')
+
+    [item] = jobs.resource('dynamodb').Table(transcription_jobs.TABLE_NAME).scan()['Items']
+    assert item['status'] == 'FAILED'
+    assert 'Boom' in item['failureReason']
+    assert transcription_jobs.public_view(item)['error'] == item['failureReason']
+    assert _audio_keys(jobs) == []
+
+
+def test_summarize_transcript():
+    transcription, confidence, words = transcription_jobs.summarize_transcript({'results': {
+        'transcripts': [{'transcript': 'apa khabar'}],
+        'items': [
+            {'type': 'pronunciation', 'start_time': '0.1', 'end_time': '0.4',
+             'alternatives': [{'content': 'apa', 'confidence': '0.9'}]},
+            {'type': 'pronunciation', 'start_time': '0.5', 'end_time': '0.9',
+             'alternatives': [{'content': 'khabar', 'confidence': '0.7'}]},
+            {'type': 'punctuation', 'alternatives': [{'content': '?'}]},
+        ]
+    }})
+
+    assert transcription == 'apa khabar'
+    assert confidence == pytest.approx(0.8)
+    assert [w['content'] for w in words] == ['apa', 'khabar']
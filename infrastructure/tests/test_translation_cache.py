@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from conftest import create_table
+import translation_cache
+
+
+@pytest.fixture
+def cache_table(aws):
+    create_table(translation_cache.TABLE_NAME, 'cacheKey')
+    translation_cache.clear_local()
+    yield
+    translation_cache.clear_local()
+
+
+def test_cache_key_ignores_case_and_whitespace():
+    assert translation_cache.cache_key('Good  Morning', 'en', 'ms') == translation_cache.cache_key('good morning', 'en', 'ms')
+    assert translation_cache.cache_key('good morning', 'en', 'ms') != translation_cache.cache_key('good morning', 'ms', 'en')
+
+
+def test_dynamodb_hit_after_local_cache_is_cleared(cache_table):
+    translation_cache.put('Good morning', 'en', 'ms', 'Selamat pagi')
+    translation_cache.clear_local()
+
+    assert translation_cache.get('good morning', 'en', 'ms') == 'Selamat pagi'
+    # The hit is promoted to the in-memory tier
+    assert translation_cache._local_get(translation_cache.cache_key('good morning', 'en', 'ms')) == 'Selamat pagi'
+
+
+def test_expired_row_is_a_miss(cache_table):
+    key = translation_cache.cache_key('cat', 'en', 'ms')
+    translation_cache.dynamodb.Table(translation_cache.TABLE_NAME).put_item(Item={
+        'cacheKey': key,
+        'translation': 'kucing',
+        'expiresAt': int(time.time()) - 60
+    })
+
+    assert translation_cache.get('cat', 'en', 'ms') is None
+
+
+def test_miss_returns_none(cache_table):
+    assert translation_cache.get('dog', 'en', 'ms') is None
@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import create_table
+import bedrock_invoke
+import translation_cache
+import translator
+
+
+@pytest.fixture
+def cache_table(aws):
+    create_table(translation_cache.TABLE_NAME, 'cacheKey')
+    translation_cache.clear_local()
+    yield
+    translation_cache.clear_local()
+
+
+def test_method_is_the_model_that_answered_then_the_cache(cache_table, monkeypatch):
+    models = []
+
+    def invoke(operation, deadline=None, **request):
+        models.append(request['modelId'])
+        return {'output': {'message': {'content': [{'text': '"kucing"'}]}}}, request['modelId']
+
+    monkeypatch.setattr(bedrock_invoke, 'invoke', invoke)
+
+    assert translator.translate_with_bedrock('cat', 'English', 'Malay') == ('kucing', models[0])
+    assert translator.translate_with_bedrock('Cat', 'English', 'Malay') == ('kucing', 'translation_cache')
+    assert len(models) == 1
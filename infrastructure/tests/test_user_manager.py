@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from conftest import create_table
+import language_config
+import user_manager
+
+
+@pytest.fixture
+def users(aws):
+    language_config.clear_language_cache()
+    create_table(language_config.USERS_TABLE, 'userId')
+    yield aws.resource('dynamodb').Table(language_config.USERS_TABLE)
+    language_config.clear_language_cache()
+
+
+def _post(body):
+    return user_manager.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+
+
+def test_new_user_languages_are_stored_as_codes(users):
+    response = _post({'userId': 'u1', 'targetLanguage': 'Bahasa Melayu', 'nativeLanguage': 'English'})
+
+    assert response['statusCode'] == 201
+    item = users.get_item(Key={'userId': 'u1'})['Item']
+    assert (item['targetLanguage'], item['nativeLanguage']) == ('ms', 'en')
+
+
+def test_update_stores_the_normalized_language(users):
+    _post({'userId': 'u1', 'targetLanguage': 'ms', 'nativeLanguage': 'en'})
+
+    response = _post({'userId': 'u1', 'nativeLanguage': ' Malay '})
+
+    assert response['statusCode'] == 200
+    assert users.get_item(Key={'userId': 'u1'})['Item']['nativeLanguage'] == 'ms'
+    assert language_config.get_language_context('u1').native_language == 'ms'
+
+
+def test_unsupported_language_is_rejected(users):
+    _post({'userId': 'u1', 'targetLanguage': 'ms', 'nativeLanguage': 'en'})
+
+    response = _post({'userId': 'u1', 'targetLanguage': 'Klingon'})
+
+    assert response['statusCode'] == 400
+    assert users.get_item(Key={'userId': 'u1'})['Item']['targetLanguage'] == 'ms'
+
+
+def test_other_containers_see_changes_once_the_context_expires(users, monkeypatch):
+    users.put_item(Item={'userId': 'u1', 'targetLanguage': 'ms', 'nativeLanguage': 'en'})
+    assert language_config.get_language_context('u1').native_language == 'en'
+
+    # Written by another container, so this one's cache wasn't cleared
+    users.update_item(Key={'userId': 'u1'}, UpdateExpression='SET nativeLanguage = :ms',
+                      ExpressionAttributeValues={':ms': 'ms'})
+    assert language_config.get_language_context('u1').native_language == 'en'
+
+    now = language_config.time.monotonic()
+    monkeypatch.setattr(language_config.time, 'monotonic', lambda: now + language_config.CONTEXT_TTL_SECONDS + 1)
+    assert language_config.get_language_context('u1').native_language == 'ms'
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from conftest import create_table
+import deadlines
+import language_config
+import vocabulary_manager
+import vocabulary_search
+
+CTX = language_config.LanguageContext(
+    user_id='u1', native_language='en', target_language='ms',
+    native_language_name='English', target_language_name='Malay'
+)
+
+
+@pytest.fixture
+def tables(aws):
+    create_table(vocabulary_manager.VOCABULARY_TABLE, 'userId', 'wordId',
+                 indexes=[(vocabulary_manager.DUE_INDEX, 'userId', 'nextReviewAt')])
+    create_table(vocabulary_search.VOCABULARY_SEARCH_TABLE, 'userId', 'term')
+    return aws.resource('dynamodb')
+
+
+@pytest.fixture
+def index_calls(monkeypatch):
+    calls = []
+    index_words = vocabulary_search.index_words
+
+    def record(items, deadline=None):
+        calls.append([item['word'] for item in items])
+        return index_words(items, deadline)
+
+    monkeypatch.setattr(vocabulary_search, 'index_words', record)
+    return calls
+
+
+def _words(*words):
+    return [{'word': word, 'translation': f"{word} (en)", 'context': ''} for word in words]
+
+
+def test_add_words_counts_encounters_for_existing_words(tables, index_calls):
+    vocabulary_manager.add_words('u1', CTX, _words('makan', 'minum'))
+
+    items, added = vocabulary_manager.add_words('u1', CTX, _words('makan', 'Minum!', 'tidur', 'makan'))
+
+    assert added == 1
+    assert [item['word'] for item in items] == ['makan', 'minum', 'tidur']
+    assert [int(item['encounterCount']) for item in items] == [3, 2, 1]
+
+
+def test_add_words_indexes_search_rows_once_per_request(tables, index_calls):
+    vocabulary_manager.add_words('u1', CTX, _words('makan'))
+    index_calls.clear()
+
+    vocabulary_manager.add_words('u1', CTX, _words('makan', 'minum', 'tidur'))
+
+    assert index_calls == [['minum', 'tidur']]
+    assert [r['wordId'] for r in vocabulary_search.search('u1', 'mak')] == [
+        vocabulary_manager.word_id('makan', 'ms', 'en')
+    ]
+
+
+def test_single_word_is_indexed_only_when_it_is_new(tables, index_calls):
+    first = vocabulary_manager.upsert_word('u1', CTX, _words('makan')[0])
+    again = vocabulary_manager.upsert_word('u1', CTX, _words('Makan')[0])
+
+    assert index_calls == [['makan']]
+    assert int(first['encounterCount']) == 1 and int(again['encounterCount']) == 2
+    assert len(vocabulary_search.search('u1', 'mak')) == 1
+
+
+def test_add_words_stops_when_the_deadline_is_spent(tables):
+    vocabulary_manager.add_words('u1', CTX, _words('makan'))
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        vocabulary_manager.add_words('u1', CTX, _words('makan'), deadlines.Deadline(0))
+
+
+def test_single_word_add_returns_the_item(tables, monkeypatch):
+    monkeypatch.setattr(language_config, 'get_language_context', lambda user_id, deadline=None: CTX)
+    event = {'httpMethod': 'POST', 'body': json.dumps({'userId': 'u1', 'word': 'kucing', 'translation': 'cat'})}
+
+    response = vocabulary_manager.handler(event, None)
+
+    assert response['statusCode'] == 201
+    assert json.loads(response['body'])['word']['word'] == 'kucing'
+
+
+def _review(reviews, deadline=None):
+    response = vocabulary_manager.review_vocabulary('u1', reviews, deadline)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+
+def test_reviews_are_applied_and_missing_words_reported(tables):
+    items, _ = vocabulary_manager.add_words('u1', CTX, _words('makan', 'minum', 'tidur'))
+    ids = [item['wordId'] for item in items]
+
+    body = _review([
+        {'wordId': ids[0], 'correct': True},
+        {'wordId': ids[1], 'quality': 1},
+        {'wordId': 'not-in-bank', 'correct': True},
+        {'wordId': ids[0], 'correct': True},
+    ])
+
+    assert sorted(r['wordId'] for r in body['reviewed']) == sorted([ids[0], ids[0], ids[1]])
+    assert body['missing'] == ['not-in-bank']
+    assert body['skipped'] == [] and body['failed'] == []
+    # Repeat reviews of one word are applied one after the other
+    table = tables.Table(vocabulary_manager.VOCABULARY_TABLE)
+    assert table.get_item(Key={'userId': 'u1', 'wordId': ids[0]})['Item']['reviewCount'] == 2
+
+
+def test_reviews_left_when_time_runs_out_are_skipped(tables):
+    items, _ = vocabulary_manager.add_words('u1', CTX, _words('makan', 'minum'))
+    ids = [item['wordId'] for item in items]
+
+    body = _review([{'wordId': word_id, 'correct': True} for word_id in ids],
+                   deadlines.Deadline(vocabulary_manager.WORD_WRITE_MIN_MS - 100))
+
+    assert body['reviewed'] == []
+    assert sorted(body['skipped']) == sorted(ids)
+    table = tables.Table(vocabulary_manager.VOCABULARY_TABLE)
+    assert table.get_item(Key={'userId': 'u1', 'wordId': ids[0]})['Item']['reviewCount'] == 0
+
+
+@pytest.mark.parametrize('reviews', [[], [{'correct': True}], [{'wordId': 'w', 'quality': 9}]])
+def test_invalid_reviews_are_rejected(reviews):
+    assert vocabulary_manager.review_vocabulary('u1', reviews)['statusCode'] == 400
@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import create_table
+import vocabulary_search
+from vocabulary_search import fold, malay_stems
+
+
+@pytest.fixture
+def search_table(aws):
+    create_table(vocabulary_search.VOCABULARY_SEARCH_TABLE, 'userId', 'term')
+
+
+def _item(word_id, word, translation, user_id='u1'):
+    return {'userId': user_id, 'wordId': word_id, 'word': word, 'translation': translation,
+            'targetLanguage': 'Malay', 'nativeLanguage': 'English'}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Café', 'cafe'),
+    ('  Terima   KASIH! ', 'terima kasih'),
+    ('naïve_résumé', 'naive resume'),
+    ('Straße', 'strasse'),
+    (None, ''),
+])
+def test_fold(text, expected):
+    assert fold(text) == expected
+
+
+@pytest.mark.parametrize('word, root', [
+    ('memukul', 'pukul'),
+    ('memakan', 'makan'),
+    ('menulis', 'tulis'),
+    ('menyapu', 'sapu'),
+    ('mengajar', 'ajar'),
+    ('berjalan', 'jalan'),
+    ('makanan', 'makan'),
+    ('bukunya', 'buku'),
+    ('pembelajaran', 'belajar'),
+])
+def test_malay_stems_find_the_root(word, root):
+    assert root in malay_stems(word)
+
+
+def test_malay_stems_leave_short_roots_alone():
+    assert malay_stems('buku') == set()
+    assert all(len(stem) >= vocabulary_search.MIN_STEM_LENGTH for stem in malay_stems('dimakan'))
+
+
+def test_terms_rank_the_word_above_its_stems():
+    terms = vocabulary_search.terms_for(_item('w1', 'Membaca buku', 'Reading a book'))
+
+    assert terms['membaca buku'] == 'word'
+    assert terms['buku'] == 'word_token'
+    assert terms['baca'] == 'word_stem'
+    assert terms['reading a book'] == 'translation'
+    # English translations are not stemmed
+    assert not any(kind == 'translation_stem' for kind in terms.values())
+    assert len(terms) <= vocabulary_search.MAX_TERMS_PER_WORD
+
+
+def test_search_is_prefix_and_accent_insensitive(search_table):
+    vocabulary_search.index_words([
+        _item('w1', 'makan', 'to eat'),
+        _item('w2', 'makanan', 'food'),
+        _item('w3', 'kafé', 'café'),
+        _item('w4', 'makan', 'to eat', user_id='u2'),
+    ])
+
+    assert [hit['wordId'] for hit in vocabulary_search.search('u1', 'MAK')] == ['w1', 'w2']
+    assert [hit['wordId'] for hit in vocabulary_search.search('u1', 'cafe')] == ['w3']
+    assert vocabulary_search.search('u1', 'food')[0]['matched'] == 'translation'
+    assert vocabulary_search.search('u1', ' !') == []
+
+
+def test_exact_word_beats_stem_match(search_table):
+    vocabulary_search.index_words([_item('w1', 'memakan', 'eating'), _item('w2', 'makan', 'eat')])
+
+    hits = vocabulary_search.search('u1', 'makan')
+
+    assert [hit['wordId'] for hit in hits] == ['w2', 'w1']
+    assert hits[1]['matched'] == 'word_stem'
+
+
+def test_reindexing_does_not_duplicate_hits(search_table):
+    vocabulary_search.index_words([_item('w1', 'makan', 'eat')])
+    vocabulary_search.index_words([_item('w1', 'makan', 'eat')])
+
+    assert len(vocabulary_search.search('u1', 'mak', limit=5)) == 1
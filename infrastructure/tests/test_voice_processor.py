@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import speech_cache
+import voice_processor
+
+BUCKET = 'media-bucket'
+
+
+@pytest.fixture
+def bucket(aws, monkeypatch):
+    monkeypatch.setattr(speech_cache, 'BUCKET_NAME', BUCKET)
+    monkeypatch.setattr(speech_cache, '_index', speech_cache.OrderedDict())
+    aws.client('s3').create_bucket(Bucket=BUCKET)
+
+
+def _speak(accept=None, **body):
+    headers = {'Accept': accept} if accept else {}
+    return voice_processor.handler(
+        {'httpMethod': 'POST', 'headers': headers, 'body': json.dumps(dict({'text': 'Selamat pagi', 'language': 'ms'}, **body))},
+        None
+    )
+
+
+@pytest.mark.parametrize('accept', ['audio/mpeg', 'audio/*;q=0.9, */*;q=0.1', 'Audio/MPEG'])
+def test_binary_audio_for_clients_that_accept_it(bucket, accept):
+    response = _speak(accept)
+
+    assert response['headers']['Content-Type'] == 'audio/mpeg'
+    assert response['isBase64Encoded'] is True
+
+
+@pytest.mark.parametrize('accept', [None, 'application/json', '*/*', 'application/json, audio/mpeg'])
+def test_binary_request_without_a_binary_accept_is_redirected(bucket, accept):
+    # API Gateway would pass the base64 body through undecoded
+    response = _speak(accept, responseFormat='binary')
+
+    assert response['statusCode'] == 302
+    assert response['headers']['Location']
+
+
+def test_base64_json_by_default(bucket):
+    response = _speak('application/json')
+
+    body = json.loads(response['body'])
+    assert response['headers']['Content-Type'] == 'application/json'
+    assert 'audioData' in body and body['audioUrl']
+
+
+def test_long_text_is_redirected_even_when_binary_is_accepted(bucket):
+    response = _speak('audio/mpeg', text='kata ' * voice_processor.STREAM_TEXT_CHARS)
+
+    assert response['statusCode'] == 302
@@ -150,7 +150,7 @@ function getUserAttributes() {
 async function loadProgress() {
     try {
         const attributes = await getUserAttributes();
-        const response = await fetch(`${API_BASE_URL}/vocabulary?userId=${attributes.sub}`, {
+        const response = await fetch(`${API_BASE_URL}/vocabulary?userId=${attributes.sub}&select=count`, {
             headers: {
                 'Authorization': `Bearer ${currentToken}`
             }
@@ -158,8 +158,7 @@ async function loadProgress() {
         
         if (response.ok) {
             const data = await response.json();
-            const vocabularyCount = data.vocabulary ? data.vocabulary.length : 0;
-            document.getElementById('wordsLearned').textContent = vocabularyCount;
+            document.getElementById('wordsLearned').textContent = data.count || 0;
         }
     } catch (error) {
         console.error('Error loading progress:', error);
@@ -248,12 +247,14 @@ async function generateLesson() {
                 throw new Error('Incomplete lesson data received');
             }
             
+            wordSets.lesson = (lesson.vocabulary || []).map(word => ({ word: word.word, translation: word.translation }));
             resultDiv.innerHTML = `
                 <h4>${lesson.title}</h4>
                 <p><strong>Content:</strong> ${lesson.content}</p>
                 ${lesson.vocabulary && lesson.vocabulary.length > 0 ? `
                     <div style="margin-top: 15px;">
                         <strong>Vocabulary:</strong>
+                        <button onclick="saveWordSet('lesson')" class="btn" style="padding: 5px 10px; font-size: 12px;">Add All to My Words</button>
                         ${lesson.vocabulary.map(word => `
                             <div class="vocabulary-item">
                                 <span><strong>${word.word}</strong> - ${word.translation}</span>
@@ -359,6 +360,7 @@ async function captureImage() {
             const data = await response.json();
             
             if (data.objects && data.objects.length > 0) {
+                wordSets.scene = data.objects.map(obj => ({ word: obj.name, translation: obj.translation }));
                 resultDiv.innerHTML = `
                     <div style="background: #e8f5e8; padding: 15px; border-radius: 8px; margin-bottom: 15px;">
                         <p><strong>🤖 Powered by Amazon Rekognition + Nova Pro</strong></p>
@@ -377,6 +379,7 @@ async function captureImage() {
                         </div>
                     `).join('')}
                     <div style="text-align: center; margin-top: 15px;">
+                        <button onclick="saveWordSet('scene')" class="btn">📝 Save All</button>
                         <button onclick="captureImage()" class="btn">📷 Capture Another</button>
                     </div>
                 `;
@@ -1458,12 +1461,18 @@ function generateFallbackQuestions(quizType = 'vocabulary', difficulty = 'beginn
 }
 
 // Vocabulary Management
-async function loadVocabulary() {
+let vocabularyCursor = null;
+
+async function loadVocabulary(append = false) {
     const vocabularyDiv = document.getElementById('vocabularyList');
     
     try {
         const attributes = await getUserAttributes();
-        const response = await fetch(`${API_BASE_URL}/vocabulary?userId=${attributes.sub}`, {
+        let url = `${API_BASE_URL}/vocabulary?userId=${attributes.sub}&fields=list&limit=50`;
+        if (append && vocabularyCursor) {
+            url += `&cursor=${encodeURIComponent(vocabularyCursor)}`;
+        }
+        const response = await fetch(url, {
             headers: {
                 'Authorization': `Bearer ${currentToken}`
             }
@@ -1472,11 +1481,17 @@ async function loadVocabulary() {
         if (response.ok) {
             const data = await response.json();
             const vocabulary = data.vocabulary || [];
+            vocabularyCursor = data.nextCursor || null;
+            
+            const moreButton = document.getElementById('loadMoreVocabulary');
+            if (moreButton) {
+                moreButton.remove();
+            }
             
-            if (vocabulary.length === 0) {
+            if (vocabulary.length === 0 && !append) {
                 vocabularyDiv.innerHTML = '<p>No vocabulary words yet. Start learning to build your collection!</p>';
             } else {
-                vocabularyDiv.innerHTML = vocabulary.map(word => `
+                const rows = vocabulary.map(word => `
                     <div class="vocabulary-item">
                         <div>
                             <div style="display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 5px;">
@@ -1484,11 +1499,15 @@ async function loadVocabulary() {
                                     <strong>${word.word}</strong> <span style="color: #666;">→</span> ${word.translation}
                                 </div>
                             </div>
-                            ${word.context ? `<small style="color: #888;">Context: ${word.context}</small><br>` : ''}
-                            <small style="color: #999;">${new Date(word.addedAt).toLocaleDateString()}</small>
+                            <small style="color: #999;">Mastery: ${word.masteryLevel || 1}</small>
                         </div>
                     </div>
                 `).join('');
+                vocabularyDiv.innerHTML = (append ? vocabularyDiv.innerHTML : '') + rows;
+                if (vocabularyCursor) {
+                    vocabularyDiv.insertAdjacentHTML('beforeend',
+                        '<button id="loadMoreVocabulary" onclick="loadVocabulary(true)" class="btn">Load more</button>');
+                }
             }
         } else {
             throw new Error('Failed to load vocabulary');
@@ -1498,6 +1517,42 @@ async function loadVocabulary() {
     }
 }
 
+let vocabularySearchTimer = null;
+
+function searchVocabulary(query) {
+    clearTimeout(vocabularySearchTimer);
+    if (!query.trim()) {
+        loadVocabulary();
+        return;
+    }
+    // Wait for a pause in typing so each keystroke isn't a request
+    vocabularySearchTimer = setTimeout(async () => {
+        const vocabularyDiv = document.getElementById('vocabularyList');
+        try {
+            const attributes = await getUserAttributes();
+            const response = await fetch(`${API_BASE_URL}/vocabulary?userId=${attributes.sub}&search=${encodeURIComponent(query)}&limit=20`, {
+                headers: {
+                    'Authorization': `Bearer ${currentToken}`
+                }
+            });
+            if (!response.ok) {
+                throw new Error('Search failed');
+            }
+            const data = await response.json();
+            const results = data.results || [];
+            vocabularyDiv.innerHTML = results.length === 0
+                ? '<p>No matching words.</p>'
+                : results.map(word => `
+                    <div class="vocabulary-item">
+                        <strong>${word.word}</strong> <span style="color: #666;">→</span> ${word.translation}
+                    </div>
+                `).join('');
+        } catch (error) {
+            vocabularyDiv.innerHTML = `<div style="color: #dc3545;">Error searching vocabulary: ${error.message}</div>`;
+        }
+    }, 250);
+}
+
 async function addToVocabulary(word, translation, context = '') {
     try {
         const attributes = await getUserAttributes();
@@ -1533,6 +1588,43 @@ async function addToVocabulary(word, translation, context = '') {
     }
 }
 
+// Words from the last lesson or camera scene, saved together in one request
+const wordSets = { lesson: [], scene: [] };
+
+async function saveWordSet(name) {
+    const words = wordSets[name] || [];
+    if (words.length === 0) {
+        return;
+    }
+    try {
+        const attributes = await getUserAttributes();
+        
+        const response = await fetch(`${API_BASE_URL}/vocabulary`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${currentToken}`
+            },
+            body: JSON.stringify({
+                userId: attributes.sub,
+                words: words
+            })
+        });
+        
+        if (response.ok) {
+            const data = await response.json();
+            alert(data.message || 'Words added to vocabulary!');
+            loadVocabulary();
+            loadProgress(); // Update word count
+        } else {
+            throw new Error('Failed to add vocabulary');
+        }
+    } catch (error) {
+        console.error('Error adding vocabulary:', error);
+        alert('Error adding words to vocabulary');
+    }
+}
+
 // Close modals when clicking outside
 window.onclick = function(event) {
     const modals = document.querySelectorAll('.modal');